@@ -2,7 +2,7 @@
 分析阶段封装模块
 """
 import logging
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from llm_agent import LLMAgent
 from excel_handler import validate_analysis_result
 from contact_verifier import ContactVerifier
@@ -17,7 +17,8 @@ class AnalysisStageManager:
         self.current_row_index = None
         self._cleaned = False  # 添加清理标志
         
-    def analyze_text_complete(self, text: str, row_index: int) -> Tuple[bool, Dict, str]:
+    def analyze_text_complete(self, text: str, row_index: int,
+                              stage_results: Optional[Dict[str, Optional[Dict]]] = None) -> Tuple[bool, Dict, str]:
         """
         完整的三阶段文本分析
         现在支持部分成功：即使某个阶段失败，也会继续执行后续阶段并保存已完成的结果
@@ -25,15 +26,19 @@ class AnalysisStageManager:
         Args:
             text: 待分析的文本内容
             row_index: 当前处理的行索引
+            stage_results: 批量分析已得到的各阶段LLM结果 {"stage1": 结果或None, ...}，
+                           缺失的阶段会单独调用LLM
             
         Returns:
             Tuple[bool, Dict, str]: (是否完全成功, 结果字典(包含部分结果), 错误信息)
         """
         self.current_row_index = row_index
-        logger.info(f"开始对行 {row_index} 进行三阶段分析")
+        logger.info("开始对行 %s 进行三阶段分析", row_index)
         
         # 重置对话保存标志，确保新的行可以保存对话记录
         self.llm_agent.conversation_saved = False
+        self.llm_agent.set_row_text(text, row_index)
+        stage_results = stage_results or {}
         
         try:
             # 合并所有分析结果
@@ -43,36 +48,36 @@ class AnalysisStageManager:
             
             # 阶段1：英文基本信息提取
             logger.info("执行阶段1分析...")
-            success, stage1_result, error = self._execute_stage1(text)
+            success, stage1_result, error = self._execute_stage1(text, stage_results.get("stage1"))
             if success:
                 final_result.update(stage1_result)
                 completed_stages.append("阶段1(英文基本信息)")
                 logger.info("阶段1分析成功")
             else:
                 failed_stages.append(f"阶段1失败: {error}")
-                logger.error(f"阶段1分析失败: {error}")
+                logger.error("阶段1分析失败: %s", error)
             
             # 阶段2：类型和方向分析
             logger.info("执行阶段2分析...")
-            success, stage2_result, error = self._execute_stage2(text)
+            success, stage2_result, error = self._execute_stage2(text, stage_results.get("stage2"))
             if success:
                 final_result.update(stage2_result)
                 completed_stages.append("阶段2(类型和方向)")
                 logger.info("阶段2分析成功")
             else:
                 failed_stages.append(f"阶段2失败: {error}")
-                logger.error(f"阶段2分析失败: {error}")
+                logger.error("阶段2分析失败: %s", error)
             
             # 阶段3：中文字段提取
             logger.info("执行阶段3分析...")
-            success, stage3_result, error = self._execute_stage3(text)
+            success, stage3_result, error = self._execute_stage3(text, stage_results.get("stage3"))
             if success:
                 final_result.update(stage3_result)
                 completed_stages.append("阶段3(中文信息)")
                 logger.info("阶段3分析成功")
             else:
                 failed_stages.append(f"阶段3失败: {error}")
-                logger.error(f"阶段3分析失败: {error}")
+                logger.error("阶段3分析失败: %s", error)
             
             # 后处理：数据格式化和验证（只对已获得的结果进行处理）
             if final_result:
@@ -95,13 +100,13 @@ class AnalysisStageManager:
             
             logger.info(status_msg)
             if error_msg:
-                logger.warning(f"部分阶段失败: {error_msg}")
+                logger.warning("部分阶段失败: %s", error_msg)
             
             # 总是保存对话记录
             try:
                 self.llm_agent.save_conversation_log(row_index)
             except Exception as save_error:
-                logger.warning(f"保存对话记录失败: {save_error}")
+                logger.warning("保存对话记录失败: %s", save_error)
             
             # 返回结果：如果有任何成功的结果就返回True和结果，错误信息用于记录到Error列
             return has_partial_results, final_result, error_msg
@@ -113,10 +118,52 @@ class AnalysisStageManager:
             try:
                 self.llm_agent.save_conversation_log(row_index)
             except Exception as save_error:
-                logger.error(f"保存对话记录失败: {save_error}")
+                logger.error("保存对话记录失败: %s", save_error)
             return False, {}, error_msg
     
-    def _execute_stage1(self, text: str) -> Tuple[bool, Dict, str]:
+    def analyze_texts_batch(self, contents: List[str], row_indices: List[int]) -> Dict[int, Tuple[bool, Dict, str]]:
+        """
+        批量三阶段分析：每个阶段把多行文本合并为一次LLM调用，再按行做验证和后处理
+        
+        整批结果无法解析或某行结果缺失时，该行对应阶段回退到单行分析
+        
+        Args:
+            contents: 各行的待分析文本
+            row_indices: 对应的行索引
+            
+        Returns:
+            Dict[int, Tuple[bool, Dict, str]]: {行索引: analyze_text_complete 的返回值}
+        """
+        texts = dict(zip(row_indices, contents))
+        logger.info("开始对行 %s 进行批量三阶段分析", row_indices)
+        
+        # 批量调用的对话记录保存在该批第一行的记录文件中
+        self.llm_agent.conversation_saved = False
+        self.llm_agent.set_row_text(None, row_indices[0])
+        
+        batch_results = {}
+        for stage in ("stage1", "stage2", "stage3"):
+            try:
+                stage_results = self.llm_agent.analyze_texts_batch(stage, texts)
+            except Exception as e:
+                logger.error("批量分析%s异常: %s", stage, e)
+                stage_results = None
+            if stage_results is None:
+                logger.warning("批量分析%s失败，将回退到逐行分析", stage)
+            batch_results[stage] = stage_results or {}
+        
+        try:
+            self.llm_agent.save_conversation_log(row_indices[0])
+        except Exception as save_error:
+            logger.warning("保存批量对话记录失败: %s", save_error)
+        
+        outcomes = {}
+        for row_index, text in texts.items():
+            row_stage_results = {stage: results.get(row_index) for stage, results in batch_results.items()}
+            outcomes[row_index] = self.analyze_text_complete(text, row_index, row_stage_results)
+        return outcomes
+    
+    def _execute_stage1(self, text: str, llm_result: Optional[Dict] = None) -> Tuple[bool, Dict, str]:
         """执行阶段1分析（包含联系人验证）"""
         logger.info("执行英文分析阶段1（含联系人验证）")
         
@@ -124,9 +171,9 @@ class AnalysisStageManager:
             # 重置上下文
             self.llm_agent.reset_context()
             
-            # 步骤1：基本信息提取
+            # 步骤1：基本信息提取（批量分析已有结果时直接使用）
             logger.info("步骤1: 基本信息提取")
-            result = self.llm_agent.analyze_text_stage1(text)
+            result = llm_result if llm_result is not None else self.llm_agent.analyze_text_stage1(text)
             
             if not result:
                 return False, {}, "LLM返回空结果"
@@ -181,26 +228,26 @@ class AnalysisStageManager:
             # 记录验证详情
             verification_performed = verification_result.get('verification_performed', False)
             if verification_performed:
-                logger.info(f"验证原因: {verification_result.get('verification_reason', '')}")
-                logger.info(f"验证详情: {verification_result.get('verification_details', '')}")
+                logger.info("验证原因: %s", verification_result.get('verification_reason', ''))
+                logger.info("验证详情: %s", verification_result.get('verification_details', ''))
             else:
-                logger.info(f"跳过验证: {verification_result.get('verification_reason', '')}")
+                logger.info("跳过验证: %s", verification_result.get('verification_reason', ''))
             
             # 更新联系人姓名（只有在验证后有变化时才更新）
             if verification_result.get('Contact_Name') != contact_name:
                 updated_fields['Contact_Name'] = verification_result['Contact_Name']
-                logger.info(f"联系人姓名已更新: {contact_name} -> {verification_result['Contact_Name']}")
+                logger.info("联系人姓名已更新: %s -> %s", contact_name, verification_result['Contact_Name'])
             # 如果验证被跳过（第一阶段已有Dr.前缀），保持原样，不做任何格式化
             
             # 更新联系邮箱（如果验证后有变化）
             if verification_result.get('Contact_Email') != contact_email:
                 updated_fields['Contact_Email'] = verification_result['Contact_Email']
-                logger.info(f"联系邮箱已更新: {contact_email} -> {verification_result['Contact_Email']}")
+                logger.info("联系邮箱已更新: %s -> %s", contact_email, verification_result['Contact_Email'])
             
             return updated_fields if updated_fields else None
             
         except Exception as e:
-            logger.error(f"联系人验证失败: {e}")
+            logger.error("联系人验证失败: %s", e)
             return None
     
     def cleanup(self):
@@ -213,7 +260,7 @@ class AnalysisStageManager:
             try:
                 self.contact_verifier.cleanup()
             except Exception as e:
-                logger.warning(f"清理联系人验证器资源失败: {e}")
+                logger.warning("清理联系人验证器资源失败: %s", e)
             finally:
                 self.contact_verifier = None
         
@@ -223,7 +270,7 @@ class AnalysisStageManager:
         """析构函数，确保资源被清理"""
         self.cleanup()
     
-    def _execute_stage2(self, text: str) -> Tuple[bool, Dict, str]:
+    def _execute_stage2(self, text: str, llm_result: Optional[Dict] = None) -> Tuple[bool, Dict, str]:
         """执行阶段2分析"""
         logger.info("执行英文分析阶段2")
         
@@ -231,8 +278,8 @@ class AnalysisStageManager:
             # 重置上下文
             self.llm_agent.reset_context()
             
-            # 调用LLM分析
-            result = self.llm_agent.analyze_text_stage2(text)
+            # 调用LLM分析（批量分析已有结果时直接使用）
+            result = llm_result if llm_result is not None else self.llm_agent.analyze_text_stage2(text)
             
             if not result:
                 return False, {}, "LLM返回空结果"
@@ -252,7 +299,7 @@ class AnalysisStageManager:
             elif len(marked_fields) > 5:
                 return False, {}, f"标记了{len(marked_fields)}个专业方向，超过最大限制5个"
             
-            logger.info(f"阶段2分析成功，返回 {len(result)} 个字段: {list(result.keys())}")
+            logger.info("阶段2分析成功，返回 %s 个字段: %s", len(result), list(result.keys()))
             return True, result, ""
             
         except Exception as e:
@@ -260,7 +307,7 @@ class AnalysisStageManager:
             logger.error(error_msg)
             return False, {}, error_msg
     
-    def _execute_stage3(self, text: str) -> Tuple[bool, Dict, str]:
+    def _execute_stage3(self, text: str, llm_result: Optional[Dict] = None) -> Tuple[bool, Dict, str]:
         """执行阶段3分析"""
         logger.info("执行中文分析阶段")
         
@@ -268,8 +315,8 @@ class AnalysisStageManager:
             # 重置上下文
             self.llm_agent.reset_context()
             
-            # 调用LLM分析
-            result = self.llm_agent.analyze_text_stage3(text)
+            # 调用LLM分析（批量分析已有结果时直接使用）
+            result = llm_result if llm_result is not None else self.llm_agent.analyze_text_stage3(text)
             
             if not result:
                 return False, {}, "LLM返回空结果"
@@ -319,7 +366,7 @@ class AnalysisStageManager:
         try:
             results = self._apply_business_rules(results)
         except Exception as e:
-            logger.warning(f"业务规则应用失败（部分结果可能导致）: {e}")
+            logger.warning("业务规则应用失败（部分结果可能导致）: %s", e)
             # 对于部分结果，业务规则失败不应该阻止处理
         
         logger.info("结果后处理完成")
@@ -342,7 +389,7 @@ class AnalysisStageManager:
             cleaned_email = clean_email_format(original_email)
             if cleaned_email != original_email:
                 results['Contact_Email'] = cleaned_email
-                logger.info(f"邮箱格式已清理: {original_email} -> {cleaned_email}")
+                logger.info("邮箱格式已清理: %s -> %s", original_email, cleaned_email)
         
         # 处理Number_Places字段
         if 'Number_Places' in results:
@@ -437,12 +484,12 @@ def test_analysis_stage():
         if success:
             logger.info("分析成功！")
             for key, value in results.items():
-                logger.info(f"{key}: {value}")
+                logger.info("%s: %s", key, value)
         else:
-            logger.error(f"分析失败: {error}")
+            logger.error("分析失败: %s", error)
         
     except Exception as e:
-        logger.error(f"测试失败: {e}")
+        logger.error("测试失败: %s", e)
 
 if __name__ == "__main__":
     # 设置日志
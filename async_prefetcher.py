@@ -0,0 +1,97 @@
+"""
+异步网页预取模块 - 在后台事件循环中并发获取后续行的网页HTML
+
+LLM分析当前行时，后续若干行的网页已在后台下载，获取内容阶段可直接使用预取结果。
+只预取普通网页；PDF、Google Docs/Drive及需要Playwright的网站仍走同步流程。
+"""
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Optional, Dict
+
+from config import REQUEST_TIMEOUT, PREFETCH_WINDOW
+from net import DEFAULT_USER_AGENT
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+class AsyncPrefetcher:
+    """在后台线程中运行asyncio事件循环，用信号量限制并发的网页预取器"""
+
+    def __init__(self, concurrency: int = PREFETCH_WINDOW, timeout: int = REQUEST_TIMEOUT):
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = None
+        self._session = None
+        self._thread = threading.Thread(target=self._run_loop, daemon=True, name="async-prefetcher")
+        self._thread.start()
+
+    def _run_loop(self):
+        """后台线程：运行事件循环"""
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    async def _get_session(self) -> "aiohttp.ClientSession":
+        """按需创建共享的ClientSession（连接池 + DNS缓存）"""
+        if self._session is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            connector = aiohttp.TCPConnector(limit=self.concurrency * 2, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={'User-Agent': DEFAULT_USER_AGENT},
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def _fetch(self, url: str) -> Optional[Dict]:
+        """获取单个URL，返回 {'content_type': str, 'text': Optional[str]}，失败返回None"""
+        session = await self._get_session()
+        async with self._semaphore:
+            try:
+                async with session.get(url, allow_redirects=True) as response:
+                    response.raise_for_status()
+                    content_type = response.headers.get('content-type', '')
+                    # PDF等非网页内容不在此下载，交由同步流程处理
+                    if 'html' not in content_type.lower() and 'text' not in content_type.lower():
+                        return {'content_type': content_type, 'text': None}
+                    text = await response.text(errors='replace')
+                    logger.debug(f"预取完成: {url} ({len(text)} 字符)")
+                    return {'content_type': content_type, 'text': text}
+            except Exception as e:
+                logger.debug(f"预取失败: {url}: {e}")
+                return None
+
+    def request(self, url: str) -> Future:
+        """提交预取请求，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(self._fetch(url), self._loop)
+
+    def close(self):
+        """关闭会话并停止事件循环"""
+        async def _close_session():
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(_close_session(), self._loop).result(timeout=5)
+        except Exception as e:
+            logger.debug(f"关闭预取会话失败: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+
+def create_prefetcher(window: int = PREFETCH_WINDOW) -> Optional[AsyncPrefetcher]:
+    """创建预取器；窗口为0或未安装aiohttp时返回None"""
+    if window <= 0:
+        return None
+    if not AIOHTTP_AVAILABLE:
+        logger.info("未安装aiohttp，跳过网页预取")
+        return None
+    logger.info(f"✅ 网页预取已启用（窗口: {window} 行）")
+    return AsyncPrefetcher(concurrency=window)
@@ -234,7 +234,7 @@ class BrowserSearcher:
             while scroll_count < MAX_SCROLLS:
                 # 滚动到下一个位置
                 current_position += SCROLL_STEP
-                page.evaluate(f"window.scrollTo(0, {current_position})")
+                page.evaluate("y => window.scrollTo(0, y)", current_position)
                 
                 # 等待内容加载
                 page.wait_for_timeout(SCROLL_DELAY)
@@ -0,0 +1,182 @@
+"""
+响应缓存模块 - 基于SQLite的持久化缓存
+
+按URL缓存获取到的页面内容，按内容+提示词版本缓存LLM分析结果，
+中断后重新运行或多行使用相同链接时可跳过已完成的网络请求和LLM调用。
+"""
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Tuple
+
+from config import RESPONSE_CACHE_FILE, USE_RESPONSE_CACHE, RENDER_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """基于SQLite（WAL模式）的键值缓存，线程安全"""
+
+    def __init__(self, db_path: Path = RESPONSE_CACHE_FILE, enabled: bool = USE_RESPONSE_CACHE):
+        self.db_path = Path(db_path)
+        self.enabled = enabled
+        self._conn = None
+        self._lock = threading.Lock()
+        self._prompt_version = None
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """按需打开数据库连接，失败时禁用缓存"""
+        if self._conn is None and self.enabled:
+            try:
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+                )
+                conn.commit()
+                self._conn = conn
+                logger.info(f"✅ 响应缓存已启用: {self.db_path}")
+            except Exception as e:
+                logger.warning(f"⚠️ 响应缓存打开失败，已禁用: {e}")
+                self.enabled = False
+        return self._conn
+
+    def get(self, key: str, max_age: Optional[float] = None) -> Optional[str]:
+        """读取缓存值，未命中或超过max_age秒时返回None"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+                if row is None or (max_age is not None and time.time() - row[1] > max_age):
+                    return None
+                return row[0]
+            except Exception as e:
+                logger.warning(f"读取缓存失败: {e}")
+                return None
+
+    def put(self, key: str, value: str):
+        """写入缓存值"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)",
+                    (key, value, time.time())
+                )
+                conn.commit()
+            except Exception as e:
+                logger.warning(f"写入缓存失败: {e}")
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _get_prompt_version(self, model_info: Dict) -> str:
+        """根据模型与提示词/模式计算版本号，模型或提示词变化时分析缓存自动失效"""
+        if self._prompt_version is None:
+            from llm_agent import STAGE_PROMPTS, STAGE_SCHEMAS, BATCH_INSTRUCTIONS
+
+            payload = json.dumps(
+                [STAGE_PROMPTS, STAGE_SCHEMAS, BATCH_INSTRUCTIONS],
+                ensure_ascii=False, sort_keys=True
+            )
+            self._prompt_version = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+        models = json.dumps([model_info.get('model'), model_info.get('stage_models')], sort_keys=True)
+        return f"{self._prompt_version}:{models}"
+
+    # ---- 页面内容缓存 ----
+
+    def get_content(self, url: str) -> Optional[str]:
+        """获取URL对应的未过期缓存内容（页面可能被修改，超过 RENDER_CACHE_TTL 后重新获取）"""
+        if not self.enabled:
+            return None
+        return self.get(_content_key(url), max_age=RENDER_CACHE_TTL)
+
+    def put_content(self, url: str, content: str):
+        """缓存URL对应的内容"""
+        if self.enabled and content:
+            self.put(_content_key(url), content)
+
+    # ---- LLM分析结果缓存 ----
+
+    def get_analysis(self, content: str, model_info: Dict) -> Optional[Tuple[bool, Dict, str]]:
+        """获取内容对应的缓存分析结果 (has_results, results, error_msg)"""
+        if not self.enabled:
+            return None
+        value = self.get(_analysis_key(content, self._get_prompt_version(model_info)))
+        if value is None:
+            return None
+        try:
+            return True, json.loads(value), ""
+        except json.JSONDecodeError:
+            return None
+
+    def put_analysis(self, content: str, model_info: Dict, results: Dict):
+        """缓存完全成功的分析结果"""
+        if self.enabled and results:
+            key = _analysis_key(content, self._get_prompt_version(model_info))
+            self.put(key, json.dumps(results, ensure_ascii=False))
+
+    # ---- Playwright渲染结果缓存 ----
+
+    def get_render(self, url: str, scroll_enabled: bool, screenshot_mode: bool) -> Optional[Dict]:
+        """获取未过期的Playwright渲染结果；截图模式下截图文件已被清理时视为未命中"""
+        if not self.enabled:
+            return None
+        value = self.get(_render_key(url, scroll_enabled, screenshot_mode), max_age=RENDER_CACHE_TTL)
+        if value is None:
+            return None
+        try:
+            result = json.loads(value)
+        except json.JSONDecodeError:
+            return None
+        if screenshot_mode and not all(Path(p).exists() for p in result.get('screenshots') or []):
+            return None
+        return result
+
+    def put_render(self, url: str, scroll_enabled: bool, screenshot_mode: bool, result: Dict):
+        """缓存Playwright渲染结果"""
+        if self.enabled and result:
+            self.put(_render_key(url, scroll_enabled, screenshot_mode), json.dumps(result, ensure_ascii=False))
+
+def _content_key(url: str) -> str:
+    """内容缓存键：sha256(url)"""
+    return "content:" + hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+def _render_key(url: str, scroll_enabled: bool, screenshot_mode: bool) -> str:
+    """渲染缓存键：blake2b(url|滚动|截图模式)"""
+    digest = hashlib.blake2b(f"{url}|{scroll_enabled}|{screenshot_mode}".encode('utf-8'), digest_size=16).hexdigest()
+    return "render:" + digest
+
+def _analysis_key(content: str, prompt_version: str) -> str:
+    """分析缓存键：sha256(内容 + 提示词版本)"""
+    digest = hashlib.sha256((content + "\x00" + prompt_version).encode('utf-8')).hexdigest()
+    return "analysis:" + digest
+
+# 全局单例
+_response_cache = None
+
+def get_response_cache() -> ResponseCache:
+    """获取响应缓存单例"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
+
+def disable_response_cache():
+    """禁用响应缓存（命令行 --no-cache）"""
+    get_response_cache().enabled = False
@@ -102,6 +102,8 @@ def main():
     # 可选依赖
     optional_deps: Dict[str, Tuple[str, str]] = {
         'opencv-python': ('opencv-python', 'cv2'),
+        'selectolax': ('selectolax', 'selectolax'),
+        'orjson': ('orjson', 'orjson'),
     }
     
     # 外部工具
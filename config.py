@@ -2,7 +2,10 @@
 项目配置文件
 """
 import os
+import queue
+import atexit
 import logging
+import logging.handlers
 from pathlib import Path
 
 # 项目根目录
@@ -23,6 +26,10 @@ GOOGLE_SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 CACHE_DIR = PROJECT_ROOT / "cache"
 PDF_CACHE_DIR = CACHE_DIR / "pdf"
 SCREENSHOT_CACHE_DIR = CACHE_DIR / "screenshots"
+PLAYWRIGHT_HANDOFF_DIR = CACHE_DIR / "playwright_handoff"  # Playwright工作进程向主进程传递页面文本的临时文件目录
+RESPONSE_CACHE_FILE = CACHE_DIR / "responses.sqlite3"  # 内容与LLM分析结果的持久化缓存
+USE_RESPONSE_CACHE = True  # 是否启用响应缓存（可通过命令行 --no-cache 关闭）
+RENDER_CACHE_TTL = 7 * 24 * 3600  # 页面内容与Playwright截图结果（截图路径）的缓存有效期（秒）
 
 # 日志配置
 LOG_DIR = PROJECT_ROOT / "logs"
@@ -31,21 +38,29 @@ RUN_LOG_FILE = LOG_DIR / "run.log"
 
 # 滚动加载配置
 SCROLL_STEP = 500  # 每次滚动的像素数
-SCROLL_DELAY = 1000  # 每次滚动后的等待时间（毫秒）
+SCROLL_DELAY = 1000  # 每次滚动后的最长等待时间（毫秒）
+SCROLL_IDLE_MS = 300  # 滚动后DOM连续多少毫秒无变化即视为新内容加载完成
 MAX_SCROLLS = 50  # 最大滚动次数
 NO_NEW_CONTENT_THRESHOLD = 3  # 连续无新内容次数阈值
+SCROLL_GROWTH_WINDOW = 8  # 最近N次滚动中页面高度都未增长时停止（位掩码判断）
 SCROLL_BUFFER = 1000  # 页面底部缓冲像素数
 
 # Playwright配置
 USE_PLAYWRIGHT = True  # 是否使用Playwright（通过独立进程，无异步冲突）
 PLAYWRIGHT_TIMEOUT = 60  # Playwright页面加载超时时间（秒）
 PLAYWRIGHT_SCROLL_ENABLED = True  # 是否启用滚动加载
+PLAYWRIGHT_PERSISTENT_WORKER = True  # 是否使用常驻Playwright进程（浏览器只启动一次，按请求创建上下文）
+PLAYWRIGHT_WORKER_PROCESSES = 2  # 常驻Playwright进程数量，并行处理多行时各自使用空闲进程（按需启动）
+PLAYWRIGHT_BLOCK_RESOURCES = True  # 提取文本时拦截图片、媒体、字体、样式表和广告追踪请求（截图模式不拦截）
+PLAYWRIGHT_RENDER_SHORT_PAGES = True  # 普通网页的HTTP请求文本过短（JS渲染的空壳）时改用Playwright渲染
+BROWSER_DOMAIN_CACHE_SIZE = 256  # 按域名记住需要浏览器渲染的网站（下次直接使用Playwright）的最大数量
 
 # 智能页面加载配置
 USE_SMART_PAGE_LOADER = True  # 是否使用智能页面加载检测
-SMART_LOAD_INITIAL_WAIT = 15  # 智能检测前的初始等待时间（秒），给页面足够时间加载
+SMART_LOAD_INITIAL_WAIT = 15  # 等待页面请求空闲的最长时间（秒），空闲后立即继续
+SMART_LOAD_IDLE_WINDOW_MS = 500  # 无进行中请求持续多久（毫秒）视为网络空闲
 SMART_LOAD_MAX_WAIT = 60  # 智能加载最大等待时间（秒）
-SMART_LOAD_STABILITY_INTERVAL = 1.0  # 内容稳定性检查间隔（秒）
+SMART_LOAD_STABILITY_INTERVAL = 1.0  # 稳定性检查基准间隔（秒），轮询间隔从200ms起自适应，最长为其3倍
 SMART_LOAD_STABILITY_THRESHOLD = 3  # 内容稳定性阈值（连续N次无变化）
 SMART_LOAD_MIN_CONTENT_LENGTH = 500  # 最小内容长度阈值
 SMART_LOAD_MAX_RETRIES = 2  # 加载失败时的最大重试次数
@@ -53,15 +68,49 @@ SMART_LOAD_MAX_RETRIES = 2  # 加载失败时的最大重试次数
 # 截图OCR配置
 USE_SCREENSHOT_OCR = True  # 是否启用截图OCR作为fallback
 OCR_LANGUAGE = 'eng+chi_sim'  # OCR语言设置 (eng=英文, chi_sim=简体中文)
-SCREENSHOT_QUALITY = 100  # 截图质量 (1-100, 注意: PNG格式不使用此参数)
+SCREENSHOT_FORMAT = 'jpeg'  # 截图格式 ('jpeg' 编码更快、文件更小; 'png' 无损)
+SCREENSHOT_QUALITY = 90  # 截图质量 (1-100, 仅JPEG格式使用)
 SCREENSHOT_MAX_PAGES = 10  # 长页面最大截图页数
 SCREENSHOT_CLEANUP_AFTER_USE = True  # 使用后是否自动清理截图
+OCR_TESSERACT_CONFIG = '--oem 1 --psm 3'  # Tesseract参数 (oem 1=仅LSTM引擎; psm 3=全自动页面分割, psm 6=统一文本块)
+OCR_WORKERS = 4  # 并行OCR的线程数（每张截图一个Tesseract子进程，1为顺序处理）
+OCR_TIMEOUT = 60  # 单张截图OCR的超时时间（秒），超时后终止Tesseract进程
+OCR_DOWNSCALE_WIDTH = 2400  # 宽度超过该值（像素）的截图在OCR前缩小一半，0为不缩放
+OCR_BLANK_VARIANCE = 25  # 灰度方差低于该值的截图视为空白页，跳过OCR（0为不跳过）
 
 # LLM 配置
 OPENAI_MODEL = "gpt-5-chat-latest"
 OPENAI_BASE_URL = "https://oneapi.gisphere.info/v1"
 OLLAMA_BASE_URL = "http://localhost:11434"
 OLLAMA_MODEL = "qwen3:14b"
+OLLAMA_KEEP_ALIVE = "30m"  # Ollama模型在显存中的驻留时间，避免空闲后重新加载
+OLLAMA_NUM_CTX = 8192  # Ollama上下文长度（输入与输出共用，超出部分会从开头被截断）
+OLLAMA_AVAILABILITY_TTL = 30  # Ollama可用性检测结果的缓存时间（秒）
+OPENAI_SMALL_MODEL = OPENAI_MODEL  # 用于分类/关键词提取等简单阶段的小模型（默认与主模型相同，确认网关提供后可改为如"gpt-4o-mini"）
+OLLAMA_SMALL_MODEL = OLLAMA_MODEL  # Ollama小模型（默认与主模型相同，确认已pull后可改为如"qwen2.5:3b"）
+# 各分析阶段使用的模型：阶段1为自由抽取，使用主模型；阶段2/3为分类与关键词，使用小模型
+STAGE_MODELS = {
+    "stage1": OPENAI_MODEL,
+    "stage2": OPENAI_SMALL_MODEL,
+    "stage3": OPENAI_SMALL_MODEL
+}
+OLLAMA_STAGE_MODELS = {
+    "stage1": OLLAMA_MODEL,
+    "stage2": OLLAMA_SMALL_MODEL,
+    "stage3": OLLAMA_SMALL_MODEL
+}
+LLM_BATCH_SIZE = 1  # 每次LLM调用合并分析的行数（可通过命令行 --batch-size 覆盖，1为逐行分析）
+LLM_BATCH_MAX_INPUT_TOKENS = 12000  # 批量分析单次调用的最大输入token数，超出时按顺序拆分为多次调用（Ollama另受 OLLAMA_NUM_CTX 限制）
+# 各分析阶段的最大输出token数（按输出JSON大小设定，防止失控生成）
+STAGE_MAX_TOKENS = {
+    "stage1": 256,
+    "stage2": 200,
+    "stage3": 200
+}
+LLM_STRUCTURED_OUTPUT = True  # 是否使用结构化输出（OpenAI json_schema / Ollama format=json）
+LLM_MAX_INPUT_TOKENS = 4000  # 待分析文本的最大token数，超出部分截断
+LLM_MAX_RETRIES = 5  # LLM请求最大尝试次数（限流/服务端错误/网络错误时指数退避重试）
+LLM_RETRY_MAX_WAIT = 30  # 指数退避的最大等待时间（秒）
 
 # Excel 列名配置
 EXCEL_COLUMNS = {
@@ -109,10 +158,20 @@ EXCEL_COLUMNS = {
     'Error': 'Error'
 }
 
+# 并行处理配置
+MAX_WORKERS = 1  # 并行处理行的工作线程数（可通过命令行 --workers 覆盖，1为顺序处理）
+PIPELINE_FETCH_WORKERS = 8  # 流水线模式（--pipeline）下获取内容的线程数，LLM分析线程数由 --workers 指定
+PREFETCH_WINDOW = 4  # 顺序处理时后台并发预取后续N行的网页（需安装aiohttp，0为关闭）
+
+# 结果保存配置
+SAVE_EVERY_N_ROWS = 10  # 每处理N行保存一次结果（处理结束或中断时也会保存）
+
 # 请求配置
 REQUEST_TIMEOUT = 30
 MAX_RETRIES = 3
 PDF_DOWNLOAD_TIMEOUT = 60
+HTTP_POOL_MAXSIZE = 32  # 共享HTTP连接池中每个主机保持的最大连接数
+HTTP_KEEPALIVE_EXPIRY = 60  # 空闲长连接的保持时间（秒）
 
 # 联系人验证配置
 CONTACT_VERIFICATION_ENABLED = True
@@ -124,27 +183,44 @@ MAX_PAGES_TO_ANALYZE = 3
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_LEVEL = logging.INFO
 
+# 后台日志输出线程（setup_logging 首次调用时创建）
+_log_listener = None
+
 def setup_logging():
     """设置日志配置"""
     # 确保日志目录存在
     LOG_DIR.mkdir(exist_ok=True)
     LLM_LOG_DIR.mkdir(exist_ok=True)
     
-    # 配置根日志
-    logging.basicConfig(
-        level=LOG_LEVEL,
-        format=LOG_FORMAT,
-        handlers=[
+    # 文件和控制台输出由后台 QueueListener 线程完成，各工作线程记录日志时只需入队，
+    # 不会因为磁盘/终端I/O在日志锁上互相等待
+    global _log_listener
+    if _log_listener is None:
+        formatter = logging.Formatter(LOG_FORMAT)
+        output_handlers = [
             logging.FileHandler(RUN_LOG_FILE, encoding='utf-8'),
             logging.StreamHandler()
         ]
-    )
+        for handler in output_handlers:
+            handler.setFormatter(formatter)
+        
+        log_queue = queue.Queue(-1)
+        _log_listener = logging.handlers.QueueListener(log_queue, *output_handlers, respect_handler_level=True)
+        _log_listener.start()
+        atexit.register(_log_listener.stop)  # 退出时输出队列中剩余的日志
+        
+        # 配置根日志
+        logging.basicConfig(
+            level=LOG_LEVEL,
+            format='%(message)s',  # 入队时只合并消息参数，最终格式由输出处理器决定
+            handlers=[logging.handlers.QueueHandler(log_queue)]
+        )
     
     return logging.getLogger(__name__)
 
 def ensure_directories():
     """确保所有必要目录存在"""
-    directories = [CACHE_DIR, PDF_CACHE_DIR, SCREENSHOT_CACHE_DIR, LOG_DIR, LLM_LOG_DIR]
+    directories = [CACHE_DIR, PDF_CACHE_DIR, SCREENSHOT_CACHE_DIR, PLAYWRIGHT_HANDOFF_DIR, LOG_DIR, LLM_LOG_DIR]
     for directory in directories:
         directory.mkdir(parents=True, exist_ok=True)
 
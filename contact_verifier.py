@@ -13,6 +13,7 @@ from bs4 import BeautifulSoup
 from config import (REQUEST_TIMEOUT, MAX_RETRIES, CONTACT_VERIFICATION_ENABLED, 
                      CONTACT_SEARCH_TIMEOUT, MAX_SEARCH_RESULTS, MAX_PAGES_TO_ANALYZE)
 from utils import normalize_text, is_valid_url
+from net import get_shared_session
 
 logger = logging.getLogger(__name__)
 
@@ -25,10 +26,7 @@ class ContactVerifier:
             llm_agent: LLM代理实例，用于分析搜索结果
         """
         self.llm_agent = llm_agent
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        })
+        self.session = get_shared_session()  # 进程内共享的连接池
         self._cleaned = False  # 添加清理标志
         
         # 尝试初始化Playwright浏览器（可选）
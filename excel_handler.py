@@ -4,7 +4,7 @@ Excel文件处理模块 - 现已集成Google Sheets支持
 import pandas as pd
 import logging
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Iterator
 import numpy as np
 
 from config import EXCEL_FILE, SHEET_NAME, EXCEL_COLUMNS, check_google_credentials
@@ -60,8 +60,8 @@ class ExcelHandler:
                 logger.error(f"Excel文件不存在: {self.excel_file}")
                 return False
             
-            # 读取Excel文件
-            self.df = pd.read_excel(self.excel_file, sheet_name=self.sheet_name)
+            # 读取Excel文件（openpyxl只读模式流式读取）
+            self.df = self._read_sheet_streaming()
             self.original_df = self.df.copy()
             
             logger.info(f"成功加载Excel文件: {self.excel_file}")
@@ -94,6 +94,40 @@ class ExcelHandler:
             logger.error(f"加载Excel文件失败: {e}")
             return False
     
+    def _read_sheet_streaming(self) -> pd.DataFrame:
+        """
+        以openpyxl只读模式逐行读取工作表并构建DataFrame
+        
+        与 pd.read_excel 一致：首行为列名，去掉每行末尾的空单元格和表尾的空行。
+        """
+        from openpyxl import load_workbook
+        
+        workbook = load_workbook(self.excel_file, read_only=True, data_only=True)
+        try:
+            rows = workbook[self.sheet_name].iter_rows(values_only=True)
+            headers = list(next(rows, ()))
+            data = []
+            for row in rows:
+                row = list(row)
+                while row and row[-1] is None:
+                    row.pop()
+                data.append(row)
+        finally:
+            workbook.close()
+        
+        while data and not data[-1]:
+            data.pop()
+        while headers and headers[-1] is None:
+            headers.pop()
+        
+        width = max([len(headers)] + [len(row) for row in data])
+        columns = [
+            headers[i] if i < len(headers) and headers[i] is not None else f"Unnamed: {i}"
+            for i in range(width)
+        ]
+        data = [row + [None] * (width - len(row)) for row in data]
+        return pd.DataFrame(data, columns=columns)
+    
     def get_unfilled_rows(self) -> List[int]:
         """获取需要处理的行索引（Verifier和Error都为空的行）"""
         if self.use_google_sheets and self.google_handler:
@@ -103,17 +137,25 @@ class ExcelHandler:
             logger.error("数据未加载")
             return []
         
-        # 筛选Verifier和Error都为空的行
-        condition = (
-            (self.df['Verifier'].isna() | (self.df['Verifier'] == '')) &
-            (self.df['Error'].isna() | (self.df['Error'] == ''))
-        )
+        # 筛选Verifier和Error都为空的行（只取两列的掩码，直接在索引上筛选，不复制整行数据）
+        markers = self.df[['Verifier', 'Error']]
+        condition = (markers.isna() | (markers == '')).all(axis=1)
         
-        unfilled_indices = self.df[condition].index.tolist()
+        unfilled_indices = self.df.index[condition].tolist()
         logger.info(f"找到 {len(unfilled_indices)} 行需要处理")
         
         return unfilled_indices
     
+    def iter_unfilled_rows(self) -> Iterator[int]:
+        """逐个产出需要处理的行索引（Verifier和Error都为空），只需第一行时无需扫描全表"""
+        df = self.google_handler.df if self.use_google_sheets and self.google_handler else self.df
+        if df is None:
+            return
+        
+        for row_index, verifier, error in zip(df.index, df['Verifier'], df['Error']):
+            if (pd.isna(verifier) or verifier == '') and (pd.isna(error) or error == ''):
+                yield row_index
+    
     def get_row_data(self, row_index: int) -> Optional[Dict]:
         """获取指定行的数据"""
         if self.use_google_sheets and self.google_handler:
@@ -291,14 +333,10 @@ class ExcelHandler:
                             if sheet_name != self.sheet_name:  # 不读取我们要更新的sheet
                                 existing_sheets[sheet_name] = pd.read_excel(xls, sheet_name=sheet_name)
                 
-                # 重新写入文件
-                with pd.ExcelWriter(self.excel_file, engine='openpyxl') as writer:
-                    # 写入更新后的数据
-                    self.df.to_excel(writer, sheet_name=self.sheet_name, index=False)
-                    
-                    # 写入其他现有的sheet
-                    for sheet_name, sheet_df in existing_sheets.items():
-                        sheet_df.to_excel(writer, sheet_name=sheet_name, index=False)
+                # 重新写入文件：更新后的数据在前，其他现有的sheet在后
+                sheets = {self.sheet_name: self.df}
+                sheets.update(existing_sheets)
+                self._write_workbook(sheets)
                 
                 logger.info(f"数据已保存到: {self.excel_file}")
                 return True
@@ -308,8 +346,7 @@ class ExcelHandler:
                 
                 # 方法2：简单覆盖保存
                 try:
-                    with pd.ExcelWriter(self.excel_file, engine='openpyxl') as writer:
-                        self.df.to_excel(writer, sheet_name=self.sheet_name, index=False)
+                    self._write_workbook({self.sheet_name: self.df})
                     
                     logger.info(f"数据已保存到: {self.excel_file} (仅{self.sheet_name}工作表)")
                     return True
@@ -322,6 +359,22 @@ class ExcelHandler:
             logger.error(f"保存数据失败: {e}")
             return False
     
+    def _write_workbook(self, sheets: Dict[str, pd.DataFrame]):
+        """使用openpyxl只写模式整体写出工作簿，比 DataFrame.to_excel 快得多"""
+        from openpyxl import Workbook
+        
+        workbook = Workbook(write_only=True)
+        for sheet_name, sheet_df in sheets.items():
+            worksheet = workbook.create_sheet(title=sheet_name)
+            worksheet.append([str(column) for column in sheet_df.columns])
+            
+            # NaN/NaT 写为空单元格
+            values = sheet_df.astype(object).where(sheet_df.notna(), None)
+            for row in values.itertuples(index=False, name=None):
+                worksheet.append(row)
+        
+        workbook.save(self.excel_file)
+    
     def get_statistics(self) -> Dict:
         """获取处理统计信息"""
         if self.use_google_sheets and self.google_handler:
@@ -330,9 +383,10 @@ class ExcelHandler:
         if self.df is None:
             return {}
         
+        # 只对Verifier/Error两列求布尔掩码并计数，不复制整行数据
         total_rows = len(self.df)
-        filled_rows = len(self.df[self.df['Verifier'].notna() & (self.df['Verifier'] != '')])
-        error_rows = len(self.df[self.df['Error'].notna() & (self.df['Error'] != '')])
+        filled_rows = int((self.df['Verifier'].notna() & (self.df['Verifier'] != '')).sum())
+        error_rows = int((self.df['Error'].notna() & (self.df['Error'] != '')).sum())
         pending_rows = total_rows - filled_rows - error_rows
         
         stats = {
@@ -11,11 +11,16 @@ import hashlib
 import time
 import re
 import io
-from typing import Optional
+from typing import Optional, Iterator
 import sys
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
 
-from config import PDF_CACHE_DIR, REQUEST_TIMEOUT, PDF_DOWNLOAD_TIMEOUT, MAX_RETRIES
-from utils import (is_pdf_url, sanitize_filename, normalize_text, 
+from config import (PDF_CACHE_DIR, REQUEST_TIMEOUT, PDF_DOWNLOAD_TIMEOUT, MAX_RETRIES,
+                    PLAYWRIGHT_RENDER_SHORT_PAGES, BROWSER_DOMAIN_CACHE_SIZE, SMART_LOAD_MIN_CONTENT_LENGTH)
+from net import get_shared_session
+from utils import (is_pdf_url, sanitize_filename, normalize_text, extract_visible_text, WEB_STRIP_TAGS,
                    is_google_drive_url, convert_google_drive_to_download, extract_google_drive_file_id,
                    is_google_docs_url, convert_google_docs_to_export, extract_google_docs_document_id)
 
@@ -23,10 +28,7 @@ logger = logging.getLogger(__name__)
 
 class ContentFetcher:
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        })
+        self.session = get_shared_session()  # 进程内共享的连接池
         
         # 确保缓存目录存在
         PDF_CACHE_DIR.mkdir(parents=True, exist_ok=True)
@@ -44,8 +46,12 @@ class ContentFetcher:
         except Exception as e:
             logger.warning(f"Playwright进程管理器初始化失败，将使用基础HTTP请求: {e}")
         
-        # 存储当前处理的PDF文件路径，用于后续清理
-        self.current_pdf_file = None
+        # 普通网页先用HTTP请求获取，JS渲染的空壳才启动浏览器；按域名记住需要浏览器的网站（LRU淘汰）
+        self._browser_domains = OrderedDict()
+        self._browser_domains_lock = threading.Lock()
+        
+        # 当前处理的PDF文件路径按线程存储，用于后续清理（见 current_pdf_file 属性）
+        self._local = threading.local()
         
         # 初始化截图OCR提取器
         self.screenshot_ocr_fetcher = None
@@ -60,8 +66,42 @@ class ContentFetcher:
         except Exception as e:
             logger.warning(f"截图OCR提取器初始化失败: {e}")
     
-    def fetch_content(self, url: str) -> Optional[str]:
-        """根据URL类型获取内容"""
+    @property
+    def current_pdf_file(self) -> Optional[Path]:
+        """当前线程正在处理的PDF缓存文件"""
+        return getattr(self._local, 'current_pdf_file', None)
+    
+    @current_pdf_file.setter
+    def current_pdf_file(self, path: Optional[Path]):
+        self._local.current_pdf_file = path
+    
+    @contextmanager
+    def fetch(self, url: str, prefetched: Optional[dict] = None) -> Iterator[Optional[str]]:
+        """
+        获取内容的上下文管理器，退出时自动删除本次下载的PDF缓存文件
+        
+        用法: with fetcher.fetch(url) as content: ...
+        """
+        try:
+            yield self.fetch_content(url, prefetched=prefetched)
+        finally:
+            self.delete_current_pdf()
+    
+    def should_prefetch(self, url: str) -> bool:
+        """判断URL是否适合异步预取（仅普通网页；PDF、Google文档及需Playwright的网站除外）"""
+        if not url or is_google_docs_url(url) or is_google_drive_url(url) or is_pdf_url(url):
+            return False
+        return not (self._is_javascript_heavy_site(url) and self.playwright_manager)
+    
+    def fetch_content(self, url: str, prefetched: Optional[dict] = None) -> Optional[str]:
+        """
+        根据URL类型获取内容
+        
+        Args:
+            url: 要获取的URL
+            prefetched: 异步预取的响应 {'content_type': str, 'text': Optional[str]}，
+                        提供时跳过Content-Type检查和网页下载
+        """
         if not url:
             logger.error("URL为空")
             return None
@@ -85,8 +125,12 @@ class ContentFetcher:
                 return self._fetch_pdf_content(url)
             else:
                 # 对于不确定的URL，先尝试获取响应头来判断
-                logger.info("URL类型不明确，检查内容类型...")
-                content_type = self._check_content_type(url)
+                if prefetched is not None:
+                    logger.info("使用预取的响应判断内容类型")
+                    content_type = prefetched.get('content_type')
+                else:
+                    logger.info("URL类型不明确，检查内容类型...")
+                    content_type = self._check_content_type(url)
                 
                 if content_type and 'pdf' in content_type.lower():
                     logger.info(f"根据Content-Type判断为PDF: {content_type}")
@@ -94,12 +138,17 @@ class ContentFetcher:
                 else:
                     logger.info(f"根据Content-Type判断为网页: {content_type}")
                     
-                    # 对于已知的JavaScript-heavy网站，优先使用Playwright
+                    # 对于已知的JavaScript-heavy网站（或之前需要浏览器渲染的域名），优先使用Playwright
                     if self._is_javascript_heavy_site(url) and self.playwright_manager:
                         logger.info("检测到JavaScript-heavy网站，使用Playwright获取内容")
                         content = self._fetch_web_content_with_playwright(url)
+                    elif self._needs_browser(url) and self.playwright_manager:
+                        logger.info("该域名的页面需要JavaScript渲染，使用Playwright获取内容")
+                        content = self._fetch_web_content_with_playwright(url)
                     else:
-                        content = self._fetch_web_content(url)
+                        html = prefetched.get('text') if prefetched else None
+                        content = self._fetch_web_content(url, html=html)
+                        content = self._render_short_page(url, content)
                     
                     # 对网页内容也进行基本验证
                     if content:
@@ -959,7 +1008,7 @@ class ContentFetcher:
         text = self._fix_encoding_issues(text)
         
         # 移除多余的空白字符
-        text = re.sub(r'\s+', ' ', text)
+        text = normalize_text(text)
         
         # 移除页码和页眉页脚模式
         text = self._remove_page_artifacts(text)
@@ -1026,34 +1075,24 @@ class ContentFetcher:
         
         return text
     
-    def _fetch_web_content(self, url: str) -> Optional[str]:
-        """获取网页文本内容"""
+    def _fetch_web_content(self, url: str, html: Optional[str] = None) -> Optional[str]:
+        """获取网页文本内容（html 为预取到的页面源码时不再下载）"""
         logger.info(f"开始获取网页内容: {url}")
         
         try:
-            response = self._download_with_retry(url, REQUEST_TIMEOUT)
-            if not response:
-                return None
-            
-            # 检测编码
-            response.encoding = response.apparent_encoding or 'utf-8'
-            
-            # 解析HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 移除脚本和样式元素
-            for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
-                script.decompose()
-            
-            # 提取文本内容
-            text = soup.get_text()
-            
-            # 清理文本
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
+            if html is None:
+                response = self._download_with_retry(url, REQUEST_TIMEOUT)
+                if not response:
+                    return None
+                
+                # 检测编码
+                response.encoding = response.apparent_encoding or 'utf-8'
+                html = response.text
+            else:
+                logger.info("使用预取的网页源码")
             
-            text = normalize_text(text)
+            # 移除脚本、样式、导航和侧边栏等标签后提取文本内容
+            text = extract_visible_text(html, strip_tags=WEB_STRIP_TAGS)
             
             if not text:
                 logger.warning("网页中未找到文本内容")
@@ -1066,6 +1105,51 @@ class ContentFetcher:
             logger.error(f"网页内容获取失败: {e}")
             return None
     
+    def _render_short_page(self, url: str, content: Optional[str]) -> Optional[str]:
+        """
+        HTTP请求得到的文本过短（可能是JS渲染的空壳）时改用Playwright渲染
+        
+        渲染结果更长时使用渲染结果，并记住该域名需要浏览器，之后直接使用Playwright
+        """
+        if not (PLAYWRIGHT_RENDER_SHORT_PAGES and self.playwright_manager):
+            return content
+        if content and len(content) >= SMART_LOAD_MIN_CONTENT_LENGTH:
+            return content
+        
+        logger.info(f"网页文本过短（{len(content) if content else 0} 字符），尝试Playwright渲染")
+        try:
+            from config import PLAYWRIGHT_TIMEOUT, PLAYWRIGHT_SCROLL_ENABLED
+            rendered = self.playwright_manager.get_page_content(
+                url,
+                scroll_enabled=PLAYWRIGHT_SCROLL_ENABLED,
+                timeout=PLAYWRIGHT_TIMEOUT
+            )
+        except Exception as e:
+            logger.warning(f"Playwright渲染失败: {e}")
+            return content
+        if rendered and len(rendered) > len(content or ''):
+            self._remember_browser_domain(url)
+            return rendered
+        return content
+    
+    def _needs_browser(self, url: str) -> bool:
+        """该URL的域名之前是否需要浏览器渲染"""
+        domain = urlparse(url).netloc.lower()
+        with self._browser_domains_lock:
+            if domain not in self._browser_domains:
+                return False
+            self._browser_domains.move_to_end(domain)
+            return True
+    
+    def _remember_browser_domain(self, url: str):
+        """记住该URL的域名需要浏览器渲染"""
+        domain = urlparse(url).netloc.lower()
+        with self._browser_domains_lock:
+            self._browser_domains[domain] = True
+            self._browser_domains.move_to_end(domain)
+            while len(self._browser_domains) > BROWSER_DOMAIN_CACHE_SIZE:
+                self._browser_domains.popitem(last=False)
+    
     def _is_javascript_heavy_site(self, url: str) -> bool:
         """判断是否为JavaScript-heavy网站"""
         javascript_heavy_domains = [
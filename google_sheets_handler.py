@@ -40,6 +40,7 @@ class GoogleSheetsHandler:
         self.df = None
         self.original_df = None
         self.sheet_id = None  # 用于批量操作
+        self._dirty_rows = set()  # 自上次保存后被修改的行索引
         
     def authorize_credentials(self):
         """授权Google API凭据"""
@@ -155,6 +156,7 @@ class GoogleSheetsHandler:
             
             self.df = pd.DataFrame(adjusted_rows, columns=headers)
             self.original_df = self.df.copy()
+            self._dirty_rows.clear()
             
             logger.info(f"成功加载Google表格数据")
             logger.info(f"数据行数: {len(self.df)}")
@@ -192,13 +194,11 @@ class GoogleSheetsHandler:
             logger.error("数据未加载")
             return []
         
-        # 筛选Verifier和Error都为空的行
-        condition = (
-            (self.df['Verifier'].isna() | (self.df['Verifier'] == '')) &
-            (self.df['Error'].isna() | (self.df['Error'] == ''))
-        )
+        # 筛选Verifier和Error都为空的行（只取两列的掩码，直接在索引上筛选，不复制整行数据）
+        markers = self.df[['Verifier', 'Error']]
+        condition = (markers.isna() | (markers == '')).all(axis=1)
         
-        unfilled_indices = self.df[condition].index.tolist()
+        unfilled_indices = self.df.index[condition].tolist()
         logger.info(f"找到 {len(unfilled_indices)} 行需要处理")
         
         return unfilled_indices
@@ -276,6 +276,7 @@ class GoogleSheetsHandler:
                     self.df['Verifier'] = self.df['Verifier'].astype('object')
                 self.df.loc[row_index, 'Verifier'] = verifier
             
+            self._dirty_rows.add(row_index)
             logger.info(f"成功更新行 {row_index} 的数据")
             return True
             
@@ -296,6 +297,7 @@ class GoogleSheetsHandler:
                     self.df['Error'] = self.df['Error'].astype('object')
                 self.df.loc[row_index, 'Error'] = error_message
             
+            self._dirty_rows.add(row_index)
             logger.info(f"更新行 {row_index} 错误信息: {error_message}")
             return True
             
@@ -304,14 +306,25 @@ class GoogleSheetsHandler:
             return False
     
     def save_data(self) -> bool:
-        """保存数据到Google表格"""
+        """保存数据到Google表格（仅提交修改过的行，失败时回退为整表更新）"""
         try:
             if self.df is None:
                 logger.error("没有数据需要保存")
                 return False
             
+            if not self._dirty_rows:
+                logger.info("没有需要保存的修改")
+                return True
+            
             self._initialize_service()
             
+            try:
+                self.update_rows_in_sheet(sorted(self._dirty_rows))
+                self._dirty_rows.clear()
+                return True
+            except Exception as e:
+                logger.warning(f"批量更新修改行失败，回退为整表更新: {e}")
+            
             # 准备数据：包含标题行
             headers = self.df.columns.tolist()
             data_rows = self.df.fillna('').values.tolist()  # 将NaN替换为空字符串
@@ -320,6 +333,7 @@ class GoogleSheetsHandler:
             # 更新整个工作表
             range_name = f"{self.sheet_name}"
             self.update_data_in_sheet(range_name, all_data)
+            self._dirty_rows.clear()
             
             logger.info(f"数据已保存到Google表格: {self.spreadsheet_id}")
             return True
@@ -349,6 +363,33 @@ class GoogleSheetsHandler:
             logger.error(f"更新数据失败: {e}")
             raise
     
+    def update_rows_in_sheet(self, row_indices: List[int]):
+        """通过一次 values.batchUpdate 调用写回指定的数据行"""
+        self._initialize_service()
+        
+        try:
+            rows = self.df.loc[row_indices].fillna('')
+            data = []
+            for row_index, values in zip(row_indices, rows.values.tolist()):
+                # 表格行号从1开始，且第1行为标题行
+                data.append({
+                    'range': f"'{self.sheet_name}'!A{row_index + 2}",
+                    'values': [values]
+                })
+            
+            body = {'valueInputOption': 'USER_ENTERED', 'data': data}
+            result = self.service.spreadsheets().values().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body=body
+            ).execute()
+            
+            updated_rows = result.get('totalUpdatedRows', 0)
+            logger.info(f"{updated_rows} 行已更新（批量）")
+            
+        except Exception as e:
+            logger.error(f"批量更新数据失败: {e}")
+            raise
+    
     def append_data_to_sheet(self, range_name: str, data: List[List]):
         """向Google表格添加数据"""
         self._initialize_service()
@@ -416,9 +457,10 @@ class GoogleSheetsHandler:
         if self.df is None:
             return {}
         
+        # 只对Verifier/Error两列求布尔掩码并计数，不复制整行数据
         total_rows = len(self.df)
-        filled_rows = len(self.df[self.df['Verifier'].notna() & (self.df['Verifier'] != '')])
-        error_rows = len(self.df[self.df['Error'].notna() & (self.df['Error'] != '')])
+        filled_rows = int((self.df['Verifier'].notna() & (self.df['Verifier'] != '')).sum())
+        error_rows = int((self.df['Error'].notna() & (self.df['Error'] != '')).sum())
         pending_rows = total_rows - filled_rows - error_rows
         
         stats = {
@@ -3,182 +3,68 @@ LLM调用模块，支持OpenAI API和Ollama本地模型
 """
 import json
 import logging
+import functools
+import random
 import requests
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Callable, Tuple, List
 import time
 
-from config import OPENAI_MODEL, OPENAI_BASE_URL, OLLAMA_BASE_URL, OLLAMA_MODEL, check_openai_key
-from utils import validate_json_response, save_llm_conversation, check_ollama_availability
+from config import (OPENAI_MODEL, OPENAI_BASE_URL, OLLAMA_BASE_URL, OLLAMA_MODEL,
+                    STAGE_MODELS, OLLAMA_STAGE_MODELS, OLLAMA_KEEP_ALIVE, OLLAMA_NUM_CTX, STAGE_MAX_TOKENS,
+                    LLM_STRUCTURED_OUTPUT, LLM_MAX_INPUT_TOKENS, LLM_MAX_RETRIES,
+                    LLM_RETRY_MAX_WAIT, LLM_BATCH_MAX_INPUT_TOKENS, check_openai_key)
+from utils import validate_json_response, check_ollama_availability, LLMConversationLog
+from net import get_shared_session, create_openai_http_client
 
 logger = logging.getLogger(__name__)
 
-class LLMAgent:
-    def __init__(self):
-        self.use_openai = False
-        self.openai_client = None
-        self.conversation_history = []
-        self.conversation_saved = False  # 添加标志位，避免重复保存
-        
-        # 检查LLM可用性
-        self._initialize_llm()
-    
-    def _initialize_llm(self):
-        """初始化LLM"""
-        # 优先尝试OpenAI
-        openai_key = check_openai_key()
-        if openai_key:
-            try:
-                import openai
-                self.openai_client = openai.OpenAI(
-                    api_key=openai_key,
-                    base_url=OPENAI_BASE_URL
-                )
-                self.use_openai = True
-                logger.info(f"✅ OpenAI API 初始化成功 (Base URL: {OPENAI_BASE_URL})")
-                return
-            except Exception as e:
-                logger.warning(f"OpenAI API 初始化失败: {e}")
-        
-        # 尝试Ollama
-        if check_ollama_availability():
-            self.use_openai = False
-            logger.info("✅ Ollama 本地模型初始化成功")
-        else:
-            logger.error("❌ 无可用的LLM服务")
-            raise RuntimeError("无可用的LLM服务，请检查OpenAI API Key或Ollama服务")
-    
-    def reset_context(self):
-        """重置对话上下文（但保留conversation_history用于日志记录）"""
-        if self.use_openai:
-            # OpenAI API每次调用都是独立的，无需特殊处理
-            pass
-        else:
-            # Ollama需要清理上下文
-            try:
-                self._reset_ollama_context()
-            except Exception as e:
-                logger.warning(f"重置Ollama上下文失败: {e}")
-        
-        # 注意：不清空conversation_history，保留用于最终的日志记录
-        # 但重置保存标志，允许新的对话记录保存
-        self.conversation_saved = False
-        logger.info("LLM对话上下文已重置")
-    
-    def _reset_ollama_context(self):
-        """重置Ollama模型上下文"""
-        try:
-            # 通过发送一个特殊的重置请求来清空上下文
-            reset_url = f"{OLLAMA_BASE_URL}/api/generate"
-            reset_data = {
-                "model": OLLAMA_MODEL,
-                "prompt": "[RESET]",
-                "stream": False,
-                "options": {
-                    "num_ctx": 4096,
-                    "temperature": 0.1,
-                    "top_p": 0.001,
-                    "repetition_penalty": 1.05
-                }
-            }
-            
-            response = requests.post(reset_url, json=reset_data, timeout=10)
-            if response.status_code == 200:
-                logger.info("Ollama上下文重置成功")
-            else:
-                logger.warning(f"Ollama上下文重置失败: {response.status_code}")
-                
-        except Exception as e:
-            logger.warning(f"Ollama上下文重置异常: {e}")
-    
-    def call_llm(self, prompt: str, system_prompt: str = None) -> Optional[str]:
-        """调用LLM获取响应"""
-        try:
-            if self.use_openai:
-                return self._call_openai(prompt, system_prompt)
-            else:
-                return self._call_ollama(prompt, system_prompt)
-        except Exception as e:
-            logger.error(f"LLM调用失败: {e}")
-            return None
-    
-    def _call_openai(self, prompt: str, system_prompt: str = None) -> Optional[str]:
-        """调用OpenAI API"""
-        try:
-            messages = []
-            
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            
-            messages.append({"role": "user", "content": prompt})
-            
-            logger.info("调用OpenAI API...")
-            
-            response = self.openai_client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=messages,
-                temperature=0.1,
-                max_tokens=3000
-            )
-            
-            result = response.choices[0].message.content
-            
-            logger.info("OpenAI API调用成功")
-            return result
-            
-        except Exception as e:
-            logger.error(f"OpenAI API调用失败: {e}")
-            return None
-    
-    def _call_ollama(self, prompt: str, system_prompt: str = None) -> Optional[str]:
-        """调用Ollama本地模型"""
-        try:
-            # 为qwen3模型特别优化prompt格式
-            if system_prompt:
-                full_prompt = f"<|im_start|>system\n{system_prompt}<|im_end|>\n<|im_start|>user\n{prompt}<|im_end|>\n<|im_start|>assistant\n"
-            else:
-                full_prompt = f"<|im_start|>user\n{prompt}<|im_end|>\n<|im_start|>assistant\n"
-            
-            url = f"{OLLAMA_BASE_URL}/api/generate"
-            data = {
-                "model": OLLAMA_MODEL,
-                "prompt": full_prompt,
-                "stream": False,
-                "options": {
-                    "num_ctx": 8192,  # 增加上下文长度
-                    "temperature": 0.1,
-                    "top_p": 0.1,  # 稍微增加一点创造性
-                    "repetition_penalty": 1.05,
-                    "stop": ["<|im_end|>", "<|im_start|>"]  # 设置停止词
-                }
-            }
-            
-            logger.info("调用Ollama API...")
-            
-            response = requests.post(url, json=data, timeout=180)  # 增加超时时间
-            response.raise_for_status()
-            
-            result_data = response.json()
-            result = result_data.get('response', '')
-            
-            logger.info("Ollama API调用成功")
-            return result
-            
-        except Exception as e:
-            logger.error(f"Ollama API调用失败: {e}")
-            return None
-    
-    def analyze_text_stage1(self, text: str) -> Optional[Dict]:
-        """英文分析阶段1：基本信息提取"""
-        logger.info("开始英文分析阶段1")
-        
-        system_prompt = """You are an expert at extracting academic and research position information from text. You need to analyze the provided text and extract specific information in JSON format. 
+# 各阶段输出的JSON Schema（用于结构化输出，保证返回合法JSON）
+STAGE1_SCHEMA = {
+    "type": "object",
+    "properties": {
+        field: {"type": "string"}
+        for field in ["Deadline", "Number_Places", "Direction", "University_EN",
+                      "Contact_Name", "Contact_Email"]
+    },
+    "required": ["Deadline", "Number_Places", "Direction", "University_EN",
+                 "Contact_Name", "Contact_Email"],
+    "additionalProperties": False
+}
 
-IMPORTANT: Respond ONLY with the JSON object. Do not include any explanation, reasoning, or additional text. Just return the pure JSON response."""
-        
-        prompt = f"""
-TEXT TO ANALYZE:
-{text}
+# 阶段2只返回值为"1"的字段，字段均为可选，因此不能使用strict模式（strict要求所有字段必填）
+STAGE2_SCHEMA = {
+    "type": "object",
+    "properties": {
+        field: {"type": "string", "enum": ["1"]}
+        for field in ["Master Student", "Doctoral Student", "PostDoc", "Research Assistant",
+                      "Competition", "Summer School", "Conference", "Workshop",
+                      "Physical_Geo", "Human_Geo", "Urban", "GIS", "RS", "GNSS"]
+    },
+    "additionalProperties": False
+}
+
+STAGE3_SCHEMA = {
+    "type": "object",
+    "properties": {
+        field: {"type": "string"}
+        for field in ["University_CN", "Country_CN", "WX_Label1", "WX_Label2",
+                      "WX_Label3", "WX_Label4", "WX_Label5"]
+    },
+    "required": ["University_CN", "Country_CN", "WX_Label1", "WX_Label2",
+                 "WX_Label3", "WX_Label4", "WX_Label5"],
+    "additionalProperties": False
+}
+
+STAGE_SCHEMAS = {
+    "stage1": (STAGE1_SCHEMA, True),
+    "stage2": (STAGE2_SCHEMA, False),
+    "stage3": (STAGE3_SCHEMA, True),
+}
+
+# 各阶段的系统提示词与分析指令（待分析文本插入在指令之前，见 _build_stage_prompt）
+STAGE1_SYSTEM_PROMPT = """You are an expert at extracting academic and research position information from text. You need to analyze the provided text and extract specific information in JSON format."""
 
+STAGE1_INSTRUCTIONS = """
 EXTRACTION INSTRUCTIONS:
 CRITICAL RULE: 
 - You MUST ONLY extract information that is EXPLICITLY stated in the provided text. 
@@ -221,46 +107,21 @@ CRITICAL RULE:
    - Always output the email in standard format with "@" and "." symbols
 
 REQUIRED JSON FORMAT (EXAMPLE ONLY - DO NOT COPY THESE VALUES):
-{{
+{
   "Deadline": "2024-03-15",
   "Number_Places": "3",
   "Direction": "Machine learning for environmental monitoring",
   "University_EN": "University of Cambridge",
   "Contact_Name": "Dr. John Smith",
   "Contact_Email": "j.smith@cam.ac.uk"
-}}
+}
 
 IMPORTANT: Extract actual information from the text above, not the example values.
 """
-        
-        response = self.call_llm(prompt, system_prompt)
-        if not response:
-            logger.error("LLM返回空响应")
-            return None
-        
-        # 记录对话到历史
-        self._add_to_conversation_history("stage1", prompt, response, text)
-        
-        result = validate_json_response(response)
-        if result:
-            logger.info("英文分析阶段1完成")
-        else:
-            logger.error("英文分析阶段1结果格式错误")
-        
-        return result
-    
-    def analyze_text_stage2(self, text: str) -> Optional[Dict]:
-        """英文分析阶段2：类型和方向分析"""
-        logger.info("开始英文分析阶段2")
-        
-        system_prompt = """You are an expert at categorizing academic positions and research fields. Analyze the text and identify relevant categories.
 
-IMPORTANT: Respond ONLY with the JSON object. Do not include any explanation, reasoning, or additional text. Just return the pure JSON response."""
-        
-        prompt = f"""
-TEXT TO ANALYZE:
-{text}
+STAGE2_SYSTEM_PROMPT = """You are an expert at categorizing academic positions and research fields. Analyze the text and identify relevant categories."""
 
+STAGE2_INSTRUCTIONS = """
 CATEGORIZATION INSTRUCTIONS:
 CRITICAL RULE: 
 - You MUST ONLY categorize based on information that is stated in the provided text. 
@@ -286,7 +147,7 @@ Research Fields (mark "1" if the text content is related to the following catego
 - "GNSS": Global Navigation Satellite Systems, GPS, Surveying and Mapping, Geodesy, Precision Positioning, Navigation Systems, Satellite Navigation, Location Services, Geolocation Technology, Positioning Systems, etc.
 
 REQUIRED JSON FORMAT (ALL fields shown below for reference - but ONLY include fields with value "1" in your actual response):
-{{
+{
   "Master Student": "1",
   "Doctoral Student": "1",
   "PostDoc": "1",
@@ -301,47 +162,22 @@ REQUIRED JSON FORMAT (ALL fields shown below for reference - but ONLY include fi
   "GIS": "1",
   "RS": "1",
   "GNSS": "1"
-}}
+}
 
 EXAMPLE RESPONSE (only fields that apply):
-{{
+{
   "Master Student": "1",
   "Doctoral Student": "1",
   "Physical_Geo": "1",
   "GIS": "1"
-}}
+}
 
 IMPORTANT: Analyze the actual text content to determine which categories apply. ONLY return the fields that have value "1".
 """
-        
-        response = self.call_llm(prompt, system_prompt)
-        if not response:
-            logger.error("LLM返回空响应")
-            return None
-        
-        # 记录对话到历史
-        self._add_to_conversation_history("stage2", prompt, response, text)
-        
-        result = validate_json_response(response)
-        if result:
-            logger.info("英文分析阶段2完成")
-        else:
-            logger.error("英文分析阶段2结果格式错误")
-        
-        return result
-    
-    def analyze_text_stage3(self, text: str) -> Optional[Dict]:
-        """中文分析阶段：中文字段提取"""
-        logger.info("开始中文分析阶段")
-        
-        system_prompt = """你是一个专业的学术信息提取专家。请分析提供的文本，并用标准简体中文提取所需信息。
 
-重要说明：只需要返回JSON对象，不要包含任何解释、推理过程或其他文本。只返回纯JSON格式的回答。"""
-        
-        prompt = f"""
-要分析的文本：
-{text}
+STAGE3_SYSTEM_PROMPT = """你是一个专业的学术信息提取专家。请分析提供的文本，并用标准简体中文提取所需信息。"""
 
+STAGE3_INSTRUCTIONS = """
 提取指令：
 关键规则：
 - 您只能提取文本中提到的信息。如果找不到信息或不能确定，请留空。
@@ -365,7 +201,7 @@ IMPORTANT: Analyze the actual text content to determine which categories apply.
 - 在WX_Label1-5中所有填写的单个内容不得超过6个字
 
 要求的JSON格式（仅为示例，请勿复制示例数值）：
-{{
+{
   "University_CN": "剑桥大学",
   "Country_CN": "英国",
   "WX_Label1": "数据科学",
@@ -373,18 +209,448 @@ IMPORTANT: Analyze the actual text content to determine which categories apply.
   "WX_Label3": "机器学习",
   "WX_Label4": "统计分析",
   "WX_Label5": "算法优化"
-}}
+}
 
 重要提醒：请从上述文本中提取真实信息，而不是使用示例中的值。
 """
+
+STAGE_PROMPTS = {
+    "stage1": (STAGE1_SYSTEM_PROMPT, "TEXT TO ANALYZE:", STAGE1_INSTRUCTIONS),
+    "stage2": (STAGE2_SYSTEM_PROMPT, "TEXT TO ANALYZE:", STAGE2_INSTRUCTIONS),
+    "stage3": (STAGE3_SYSTEM_PROMPT, "要分析的文本：", STAGE3_INSTRUCTIONS),
+}
+
+# 批量分析的附加指令：多行文本以 "### ROW <行号>" 分隔，要求按行号返回结果
+_BATCH_INSTRUCTIONS_EN = """
+BATCH MODE:
+The text above contains several independent documents, each starting with a line "### ROW <id>". Apply the instructions above to EACH document separately and return ONE JSON object whose keys are the row ids (e.g. "12") and whose values are the JSON objects described above for the corresponding document.
+"""
+
+_BATCH_INSTRUCTIONS_CN = """
+批量模式：
+上述文本包含多个相互独立的文档，每个文档以"### ROW <编号>"开头。请对每个文档分别按上述指令提取信息，并返回一个JSON对象，其键为行编号（如"12"），值为该文档对应的上述JSON对象。
+"""
+
+BATCH_INSTRUCTIONS = {
+    "stage1": _BATCH_INSTRUCTIONS_EN,
+    "stage2": _BATCH_INSTRUCTIONS_EN,
+    "stage3": _BATCH_INSTRUCTIONS_CN,
+}
+
+def _build_stage_prompt(stage: str, text: str) -> Tuple[str, str]:
+    """构建指定阶段的 (系统提示词, 用户提示词)"""
+    system_prompt, text_header, instructions = STAGE_PROMPTS[stage]
+    return system_prompt, f"\n{text_header}\n{text}\n{instructions}"
+
+def _build_batch_prompt(stage: str, texts: Dict[int, str]) -> Tuple[str, str]:
+    """构建批量分析的 (系统提示词, 用户提示词)，每行文本以 "### ROW <行号>" 开头"""
+    system_prompt, text_header, instructions = STAGE_PROMPTS[stage]
+    blocks = "\n".join(f"### ROW {row_index}\n{text}\n" for row_index, text in texts.items())
+    return system_prompt, f"\n{text_header}\n{blocks}\n{instructions}{BATCH_INSTRUCTIONS[stage]}"
+
+def _build_batch_schema(stage: str, row_indices: List[int]) -> Tuple[Dict, bool]:
+    """构建批量分析的JSON Schema：以行号为键，值为该阶段的单行Schema"""
+    schema, strict = STAGE_SCHEMAS[stage]
+    keys = [str(row_index) for row_index in row_indices]
+    batch_schema = {
+        "type": "object",
+        "properties": {key: schema for key in keys},
+        "required": keys,
+        "additionalProperties": False
+    }
+    return batch_schema, strict
+
+@functools.lru_cache(maxsize=None)
+def _static_prompt_tokens(stage: str, batch: bool = False) -> int:
+    """阶段提示词中固定部分（系统提示词、标题、说明）的token数，每个阶段只计算一次"""
+    system_prompt, text_header, instructions = STAGE_PROMPTS[stage]
+    static_text = f"{system_prompt}\n{text_header}\n{instructions}"
+    if batch:
+        static_text += BATCH_INSTRUCTIONS[stage]
+    return _count_tokens(static_text)
+
+# tiktoken编码器（延迟加载，未安装时为None）
+_encoding = None
+_encoding_loaded = False
+
+def _get_encoding():
+    """获取tiktoken编码器，未安装或加载失败时返回None"""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except ImportError:
+            logger.warning("tiktoken未安装，将按字符估算token数进行截断")
+        except Exception as e:
+            logger.warning("tiktoken编码器加载失败，将按字符估算token数: %s", e)
+    return _encoding
+
+def _estimate_cut_index(text: str, max_tokens: int) -> int:
+    """按字符估算token数（ASCII约4字符/token，其他字符约1字符/token），返回截断位置"""
+    tokens = 0.0
+    for i, char in enumerate(text):
+        tokens += 0.25 if ord(char) < 128 else 1.0
+        if tokens > max_tokens:
+            return i
+    return len(text)
+
+@functools.lru_cache(maxsize=32)
+def _count_tokens(text: str) -> int:
+    """计算文本的token数（tiktoken不可用时按字符估算；近期文本的结果会缓存）"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return int(sum(0.25 if ord(char) < 128 else 1.0 for char in text)) + 1
+
+@functools.lru_cache(maxsize=32)
+def _trim_text(text: str, max_tokens: int = LLM_MAX_INPUT_TOKENS) -> str:
+    """
+    将待分析文本截断到token预算以内，避免超长输入拖慢推理或超出上下文
+    
+    同一行文本会在三个阶段各截断一次，结果按 (文本, 预算) 缓存，只需编码一次
+    """
+    # 只有ASCII文本才满足"每个字符至多一个token"；中文等字符在cl100k下可能占多个token，需实际编码
+    if not text or (len(text) <= max_tokens and text.isascii()):
+        return text
+    
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        trimmed = encoding.decode(tokens[:max_tokens])
+    else:
+        cut_index = _estimate_cut_index(text, max_tokens)
+        if cut_index >= len(text):
+            return text
+        trimmed = text[:cut_index]
+    
+    logger.info("待分析文本超出token预算，已截断: %s → %s 字符", len(text), len(trimmed))
+    return trimmed
+
+def _preload_ollama_models():
+    """预加载Ollama模型并设置驻留时间，避免首次调用时的冷启动加载"""
+    for model in dict.fromkeys(OLLAMA_STAGE_MODELS.values()):
+        try:
+            # 不带prompt的generate请求只加载模型，不进行推理
+            response = get_shared_session().post(
+                f"{OLLAMA_BASE_URL}/api/generate",
+                json={"model": model, "keep_alive": OLLAMA_KEEP_ALIVE},
+                timeout=120
+            )
+            if response.status_code == 200:
+                logger.info("Ollama模型已预加载: %s (驻留 %s)", model, OLLAMA_KEEP_ALIVE)
+            else:
+                logger.warning("Ollama模型预加载失败: %s (%s)", model, response.status_code)
+        except Exception as e:
+            logger.warning("Ollama模型预加载异常: %s (%s)", model, e)
+
+@functools.lru_cache(maxsize=1)
+def _detect_backend() -> Tuple[bool, Any]:
+    """
+    检测可用的LLM后端，结果在进程内缓存，避免每次创建LLMAgent都探测一次
+    
+    Returns:
+        Tuple[bool, Any]: (是否使用OpenAI, OpenAI客户端或None)
+    """
+    # 优先尝试OpenAI
+    openai_key = check_openai_key()
+    if openai_key:
+        try:
+            import openai
+            openai_client = openai.OpenAI(
+                api_key=openai_key,
+                base_url=OPENAI_BASE_URL,
+                max_retries=0,  # 重试由 _request_with_retry 统一处理
+                http_client=create_openai_http_client()  # 长连接池，避免每次调用重新握手
+            )
+            logger.info("✅ OpenAI API 初始化成功 (Base URL: %s)", OPENAI_BASE_URL)
+            return True, openai_client
+        except Exception as e:
+            logger.warning("OpenAI API 初始化失败: %s", e)
+    
+    # 尝试Ollama
+    if check_ollama_availability():
+        logger.info("✅ Ollama 本地模型初始化成功")
+        _preload_ollama_models()
+        return False, None
+    
+    logger.error("❌ 无可用的LLM服务")
+    raise RuntimeError("无可用的LLM服务，请检查OpenAI API Key或Ollama服务")
+
+class LLMAgent:
+    def __init__(self):
+        self.use_openai = False
+        self.openai_client = None
+        self.conversation_saved = False  # 添加标志位，避免重复保存
+        self._row_text: Optional[str] = None  # 当前行的原始文本（每行只保存一份，各阶段共用）
+        self._row_index: Optional[int] = None
+        self._conversation_log: Optional[LLMConversationLog] = None  # 当前行的对话记录文件（逐轮追加写入）
         
-        response = self.call_llm(prompt, system_prompt)
+        # 检查LLM可用性
+        self._initialize_llm()
+    
+    def _initialize_llm(self):
+        """初始化LLM（后端检测结果在进程内缓存，见 _detect_backend）"""
+        self.use_openai, self.openai_client = _detect_backend()
+    
+    @staticmethod
+    def refresh_backend():
+        """清除后端检测缓存，下次创建LLMAgent时重新检测（用于测试或切换服务后）"""
+        _detect_backend.cache_clear()
+    
+    def set_row_text(self, text: Optional[str], row_index: Optional[int] = None):
+        """设置当前行的原始文本和行号，用于对话记录（每行调用一次）"""
+        if self._conversation_log is not None:
+            # 上一行的记录未正常保存（例如中途异常），先落盘
+            try:
+                self._conversation_log.close()
+            except Exception as e:
+                logger.warning("关闭上一行对话记录失败: %s", e)
+            self._conversation_log = None
+        self._row_text = text
+        self._row_index = row_index
+    
+    def reset_context(self):
+        """
+        重置对话上下文（不影响当前行的对话记录文件）
+        
+        OpenAI API与Ollama的/api/generate（不传context参数时）每次调用都是无状态的，
+        因此无需向模型发送额外的重置请求
+        """
+        # 重置保存标志，允许新的对话记录保存
+        self.conversation_saved = False
+        logger.info("LLM对话上下文已重置")
+    
+    def _is_retryable_error(self, error: Exception) -> bool:
+        """判断错误是否值得重试：限流(429)、服务端错误(5xx)、网络连接/超时错误"""
+        status_code = getattr(error, 'status_code', None)
+        if status_code is None:
+            status_code = getattr(getattr(error, 'response', None), 'status_code', None)
+        if status_code is not None:
+            return status_code == 429 or status_code >= 500
+        
+        retryable_types = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+        if self.use_openai:
+            import openai
+            retryable_types += (openai.APIConnectionError,)
+        return isinstance(error, retryable_types)
+    
+    def _get_retry_after(self, error: Exception) -> Optional[float]:
+        """读取响应头中的Retry-After（秒），不存在或无法解析时返回None"""
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+        if not headers:
+            return None
+        try:
+            return max(0.0, float(headers.get('Retry-After')))
+        except (TypeError, ValueError):
+            return None
+    
+    def _request_with_retry(self, send: Callable, service_name: str):
+        """带指数退避的LLM请求，仅对可重试的错误进行重试，其他错误直接抛出"""
+        for attempt in range(LLM_MAX_RETRIES):
+            try:
+                return send()
+            except Exception as e:
+                if attempt >= LLM_MAX_RETRIES - 1 or not self._is_retryable_error(e):
+                    raise
+                
+                wait_time = self._get_retry_after(e)
+                if wait_time is None:
+                    wait_time = min(LLM_RETRY_MAX_WAIT, 2 ** attempt) + random.uniform(0, 1)  # 指数退避+抖动
+                logger.warning("%s请求失败 (第%s次): %s，等待 %.1f 秒后重试...", service_name, attempt + 1, e, wait_time)
+                time.sleep(wait_time)
+    
+    def get_stage_model(self, stage: str) -> str:
+        """获取指定分析阶段使用的模型名称"""
+        if self.use_openai:
+            return STAGE_MODELS.get(stage, OPENAI_MODEL)
+        return OLLAMA_STAGE_MODELS.get(stage, OLLAMA_MODEL)
+    
+    def call_llm(self, prompt: str, system_prompt: str = None, schema_name: str = None,
+                 *, model: str = None, max_tokens: int = 3000, schema: Tuple[Dict, bool] = None) -> Optional[str]:
+        """
+        调用LLM获取响应
+        
+        Args:
+            prompt: 用户提示词
+            system_prompt: 系统提示词
+            schema_name: 结构化输出使用的Schema名称（stage1/stage2/stage3），为None时返回自由文本
+            model: 使用的模型名称，为None时使用当前后端的主模型
+            max_tokens: 最大输出token数
+            schema: 自定义的 (JSON Schema, 是否strict)，为None时按schema_name查找阶段Schema
+        """
+        response_schema = None
+        if schema_name and LLM_STRUCTURED_OUTPUT:
+            schema_dict, strict = schema or STAGE_SCHEMAS[schema_name]
+            response_schema = (schema_name, schema_dict, strict)
+        
+        try:
+            if self.use_openai:
+                return self._call_openai(prompt, system_prompt, response_schema, model or OPENAI_MODEL, max_tokens)
+            else:
+                return self._call_ollama(prompt, system_prompt, response_schema, model or OLLAMA_MODEL, max_tokens)
+        except Exception as e:
+            logger.error("LLM调用失败: %s", e)
+            return None
+    
+    def _call_openai(self, prompt: str, system_prompt: str = None, response_schema: Tuple[str, Dict, bool] = None,
+                     model: str = OPENAI_MODEL, max_tokens: int = 3000) -> Optional[str]:
+        """调用OpenAI API"""
+        try:
+            messages = []
+            
+            if system_prompt:
+                messages.append({"role": "system", "content": system_prompt})
+            
+            messages.append({"role": "user", "content": prompt})
+            
+            logger.info("调用OpenAI API (%s)...", model)
+            
+            request_kwargs = {}
+            if response_schema:
+                schema_name, schema, strict = response_schema
+                request_kwargs["response_format"] = {
+                    "type": "json_schema",
+                    "json_schema": {"name": schema_name, "schema": schema, "strict": strict}
+                }
+            
+            response = self._request_with_retry(
+                lambda: self.openai_client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.1,
+                    max_tokens=max_tokens,
+                    **request_kwargs
+                ),
+                "OpenAI API"
+            )
+            
+            result = response.choices[0].message.content
+            
+            logger.info("OpenAI API调用成功")
+            return result
+            
+        except Exception as e:
+            logger.error("OpenAI API调用失败: %s", e)
+            return None
+    
+    def _call_ollama(self, prompt: str, system_prompt: str = None, response_schema: Tuple[str, Dict, bool] = None,
+                     model: str = OLLAMA_MODEL, max_tokens: int = 3000) -> Optional[str]:
+        """调用Ollama本地模型"""
+        try:
+            # 为qwen3模型特别优化prompt格式
+            if system_prompt:
+                full_prompt = f"<|im_start|>system\n{system_prompt}<|im_end|>\n<|im_start|>user\n{prompt}<|im_end|>\n<|im_start|>assistant\n"
+            else:
+                full_prompt = f"<|im_start|>user\n{prompt}<|im_end|>\n<|im_start|>assistant\n"
+            
+            url = f"{OLLAMA_BASE_URL}/api/generate"
+            data = {
+                "model": model,
+                "prompt": full_prompt,
+                "stream": False,
+                "keep_alive": OLLAMA_KEEP_ALIVE,
+                "options": {
+                    "num_ctx": OLLAMA_NUM_CTX,  # 增加上下文长度
+                    "temperature": 0.1,
+                    "top_p": 0.1,  # 稍微增加一点创造性
+                    "repetition_penalty": 1.05,
+                    "num_predict": max_tokens,  # 最大输出token数
+                    "stop": ["<|im_end|>", "<|im_start|>"]  # 设置停止词
+                }
+            }
+            if response_schema:
+                data["format"] = "json"  # 约束输出为合法JSON
+            
+            logger.info("调用Ollama API (%s)...", model)
+            
+            def send():
+                response = get_shared_session().post(url, json=data, timeout=180)  # 增加超时时间
+                response.raise_for_status()
+                return response
+            
+            response = self._request_with_retry(send, "Ollama API")
+            
+            result_data = response.json()
+            result = result_data.get('response', '')
+            
+            logger.info("Ollama API调用成功")
+            return result
+            
+        except Exception as e:
+            logger.error("Ollama API调用失败: %s", e)
+            return None
+    
+    def analyze_text_stage1(self, text: str) -> Optional[Dict]:
+        """英文分析阶段1：基本信息提取"""
+        logger.info("开始英文分析阶段1")
+        text = _trim_text(text)
+        
+        system_prompt, prompt = _build_stage_prompt("stage1", text)
+        
+        model = self.get_stage_model("stage1")
+        response = self.call_llm(prompt, system_prompt, schema_name="stage1", model=model,
+                                 max_tokens=STAGE_MAX_TOKENS["stage1"])
+        if not response:
+            logger.error("LLM返回空响应")
+            return None
+        
+        # 记录对话到历史
+        self._add_to_conversation_history("stage1", prompt, response, model)
+        
+        result = validate_json_response(response)
+        if result:
+            logger.info("英文分析阶段1完成")
+        else:
+            logger.error("英文分析阶段1结果格式错误")
+        
+        return result
+    
+    def analyze_text_stage2(self, text: str) -> Optional[Dict]:
+        """英文分析阶段2：类型和方向分析"""
+        logger.info("开始英文分析阶段2")
+        text = _trim_text(text)
+        
+        system_prompt, prompt = _build_stage_prompt("stage2", text)
+        
+        model = self.get_stage_model("stage2")
+        response = self.call_llm(prompt, system_prompt, schema_name="stage2", model=model,
+                                 max_tokens=STAGE_MAX_TOKENS["stage2"])
+        if not response:
+            logger.error("LLM返回空响应")
+            return None
+        
+        # 记录对话到历史
+        self._add_to_conversation_history("stage2", prompt, response, model)
+        
+        result = validate_json_response(response)
+        if result:
+            logger.info("英文分析阶段2完成")
+        else:
+            logger.error("英文分析阶段2结果格式错误")
+        
+        return result
+    
+    def analyze_text_stage3(self, text: str) -> Optional[Dict]:
+        """中文分析阶段：中文字段提取"""
+        logger.info("开始中文分析阶段")
+        text = _trim_text(text)
+        
+        system_prompt, prompt = _build_stage_prompt("stage3", text)
+        
+        model = self.get_stage_model("stage3")
+        response = self.call_llm(prompt, system_prompt, schema_name="stage3", model=model,
+                                 max_tokens=STAGE_MAX_TOKENS["stage3"])
         if not response:
             logger.error("LLM返回空响应")
             return None
         
         # 记录对话到历史
-        self._add_to_conversation_history("stage3", prompt, response, text)
+        self._add_to_conversation_history("stage3", prompt, response, model)
         
         result = validate_json_response(response)
         if result:
@@ -394,41 +660,132 @@ IMPORTANT: Analyze the actual text content to determine which categories apply.
         
         return result
     
-    def _add_to_conversation_history(self, stage: str, prompt: str, response: str, original_text: str = None):
-        """添加对话到历史记录"""
+    def analyze_texts_batch(self, stage: str, texts: Dict[int, str]) -> Optional[Dict[int, Optional[Dict]]]:
+        """
+        批量分析多行文本：同一阶段的多行合并为一次LLM调用
+        
+        输入token数超过 LLM_BATCH_MAX_INPUT_TOKENS（Ollama另受 OLLAMA_NUM_CTX 限制）时按顺序贪心拆分为多次调用
+        
+        Args:
+            stage: 分析阶段（stage1/stage2/stage3）
+            texts: {行号: 待分析文本}
+            
+        Returns:
+            {行号: 结果字典，该行缺失或格式错误时为None}，所有调用均失败时返回None
+        """
+        trimmed_texts = {row_index: _trim_text(text) for row_index, text in texts.items()}
+        
+        results = {}
+        any_success = False
+        for group in self._split_batch(stage, trimmed_texts):
+            group_results = self._analyze_batch_group(stage, group)
+            if group_results is not None:
+                any_success = True
+                results.update(group_results)
+        
+        return results if any_success else None
+    
+    def _split_batch(self, stage: str, texts: Dict[int, str]) -> List[Dict[int, str]]:
+        """
+        按token预算将批量文本顺序拆分为多组（预算扣除提示词固定部分的token数）
+        
+        Ollama的输入与输出共用 num_ctx，超出时会从开头截断（丢失系统提示词和前几行），
+        因此预算同时不超过 OLLAMA_NUM_CTX，并为组内每行预留该阶段的最大输出token数
+        """
+        static_tokens = _static_prompt_tokens(stage, batch=True)
+        budget = LLM_BATCH_MAX_INPUT_TOKENS - static_tokens
+        output_tokens = 0
+        if not self.use_openai:
+            budget = min(budget, OLLAMA_NUM_CTX - static_tokens)
+            output_tokens = STAGE_MAX_TOKENS[stage]
+        groups = []
+        current, current_tokens = {}, 0
+        for row_index, text in texts.items():
+            tokens = _count_tokens(text) + output_tokens
+            if current and current_tokens + tokens > budget:
+                groups.append(current)
+                current, current_tokens = {}, 0
+            current[row_index] = text
+            current_tokens += tokens
+        if current:
+            groups.append(current)
+        return groups
+    
+    def _analyze_batch_group(self, stage: str, texts: Dict[int, str]) -> Optional[Dict[int, Optional[Dict]]]:
+        """对一组行执行一次批量LLM调用并按行号拆分结果"""
+        row_label = ",".join(str(row_index) for row_index in texts)
+        logger.info("开始批量分析%s (行: %s)", stage, row_label)
+        
+        system_prompt, prompt = _build_batch_prompt(stage, texts)
+        model = self.get_stage_model(stage)
+        response = self.call_llm(prompt, system_prompt, schema_name=f"{stage}_batch", model=model,
+                                 max_tokens=STAGE_MAX_TOKENS[stage] * len(texts),
+                                 schema=_build_batch_schema(stage, list(texts)))
+        if not response:
+            logger.error("LLM返回空响应")
+            return None
+        
+        # 记录对话到历史
+        self._add_to_conversation_history(f"{stage}[batch:{row_label}]", prompt, response, model)
+        
+        parsed = validate_json_response(response)
+        if not isinstance(parsed, dict):
+            logger.error("批量分析%s结果格式错误", stage)
+            return None
+        
+        results = {}
+        for row_index in texts:
+            row_result = parsed.get(str(row_index))
+            results[row_index] = row_result if isinstance(row_result, dict) else None
+        
+        found = sum(1 for row_result in results.values() if row_result is not None)
+        logger.info("批量分析%s完成，获得 %s/%s 行结果", stage, found, len(texts))
+        return results
+    
+    def _add_to_conversation_history(self, stage: str, prompt: str, response: str, model: str = None):
+        """将一轮对话追加写入当前行的对话记录文件（原始文本在行级别保存一份，见 set_row_text）"""
         conversation = {
             "stage": stage,
             "timestamp": time.time(),
             "prompt": prompt,
             "response": response,
-            "original_text": original_text,  # 添加原始文本内容
-            "model": OPENAI_MODEL if self.use_openai else OLLAMA_MODEL
+            "model": model or self.get_stage_model(stage)  # 记录实际使用的模型
         }
-        self.conversation_history.append(conversation)
-        logger.info(f"已记录{stage}阶段对话")
+        try:
+            if self._conversation_log is None:
+                self._conversation_log = LLMConversationLog(self._row_index, self._row_text)
+            self._conversation_log.append_turn(conversation)
+            logger.info("已记录%s阶段对话", stage)
+        except Exception as e:
+            logger.warning("记录%s阶段对话失败: %s", stage, e)
     
     def save_conversation_log(self, row_index: int):
-        """保存对话记录"""
+        """保存对话记录（关闭并重命名当前行的对话记录文件）"""
         # 检查是否已经保存过
         if self.conversation_saved:
-            logger.info(f"行 {row_index} 的对话记录已经保存过，跳过重复保存")
+            logger.info("行 %s 的对话记录已经保存过，跳过重复保存", row_index)
             return
         
-        if self.conversation_history:
-            save_llm_conversation(row_index, self.conversation_history)
-            logger.info(f"已保存行{row_index}的{len(self.conversation_history)}条对话记录")
+        if self._conversation_log is not None:
+            turn_count = self._conversation_log.turn_count
+            log_file = self._conversation_log.close(row_index)
+            logger.info("已保存行%s的%s条对话记录: %s", row_index, turn_count, log_file)
             # 标记为已保存
             self.conversation_saved = True
-            # 清空对话历史，为下一行处理准备
-            self.conversation_history = []
+            # 清空当前行状态，为下一行处理准备
+            self._conversation_log = None
+            self._row_text = None
+            self._row_index = None
         else:
-            logger.warning(f"行 {row_index} 没有对话记录可保存")
+            # 批量分析时各阶段结果可能已由批量调用得到，此时该行没有单独的对话
+            logger.info("行 %s 没有对话记录可保存", row_index)
     
     def get_model_info(self) -> Dict[str, Any]:
         """获取当前使用的模型信息"""
         return {
             "use_openai": self.use_openai,
             "model": OPENAI_MODEL if self.use_openai else OLLAMA_MODEL,
+            "stage_models": dict(STAGE_MODELS if self.use_openai else OLLAMA_STAGE_MODELS),
             "api_url": OPENAI_BASE_URL if self.use_openai else OLLAMA_BASE_URL
         }
 
@@ -450,26 +807,27 @@ def test_llm_agent():
         """
         
         logger.info("测试LLM分析功能...")
+        agent.set_row_text(test_text, 9999)  # 测试行号
         
         # 测试三个分析阶段
         logger.info("\n=== 测试阶段1 ===")
         result1 = agent.analyze_text_stage1(test_text)
         if result1:
-            logger.info(f"阶段1结果: {json.dumps(result1, ensure_ascii=False, indent=2)}")
+            logger.info("阶段1结果: %s", json.dumps(result1, ensure_ascii=False, indent=2))
         
         agent.reset_context()
         
         logger.info("\n=== 测试阶段2 ===")
         result2 = agent.analyze_text_stage2(test_text)
         if result2:
-            logger.info(f"阶段2结果: {json.dumps(result2, ensure_ascii=False, indent=2)}")
+            logger.info("阶段2结果: %s", json.dumps(result2, ensure_ascii=False, indent=2))
         
         agent.reset_context()
         
         logger.info("\n=== 测试阶段3 ===")
         result3 = agent.analyze_text_stage3(test_text)
         if result3:
-            logger.info(f"阶段3结果: {json.dumps(result3, ensure_ascii=False, indent=2)}")
+            logger.info("阶段3结果: %s", json.dumps(result3, ensure_ascii=False, indent=2))
         
         # 保存测试对话记录
         agent.save_conversation_log(9999)  # 测试行号
@@ -477,7 +835,7 @@ def test_llm_agent():
         logger.info("\nLLM代理测试完成")
         
     except Exception as e:
-        logger.error(f"LLM代理测试失败: {e}")
+        logger.error("LLM代理测试失败: %s", e)
 
 if __name__ == "__main__":
     # 设置日志
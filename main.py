@@ -4,39 +4,115 @@
 """
 import os
 import socket
+import threading
+import time
+import ipaddress
 
 # 强制使用IPv4连接（解决macOS等系统上的IPv6连接问题）
 _FORCE_IPV4 = os.getenv('FORCE_IPV4', 'true').lower() == 'true'
 
 if _FORCE_IPV4:
     _real_getaddrinfo = socket.getaddrinfo
+    
+    # DNS解析结果缓存：(host, port, type, proto, flags) -> (结果, 解析时间)
+    _DNS_CACHE_TTL = 60  # 秒
+    _DNS_CACHE_MAX_SIZE = 1024
+    _dns_cache = {}
+    _dns_cache_lock = threading.Lock()
+    
+    def _is_ip_literal(host) -> bool:
+        """判断主机名是否为IP地址字面量（无需DNS解析，也无需缓存）"""
+        try:
+            ipaddress.ip_address(host.decode() if isinstance(host, bytes) else host)
+            return True
+        except (ValueError, AttributeError, UnicodeDecodeError):
+            return False
+    
     def ipv4_only_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
-        return _real_getaddrinfo(host, port, socket.AF_INET, type, proto, flags)
+        if host is None or _is_ip_literal(host):
+            return _real_getaddrinfo(host, port, socket.AF_INET, type, proto, flags)
+        
+        key = (host, port, type, proto, flags)
+        now = time.monotonic()
+        with _dns_cache_lock:
+            cached = _dns_cache.get(key)
+        if cached and now - cached[1] < _DNS_CACHE_TTL:
+            return cached[0]
+        
+        result = _real_getaddrinfo(host, port, socket.AF_INET, type, proto, flags)
+        with _dns_cache_lock:
+            if len(_dns_cache) >= _DNS_CACHE_MAX_SIZE:
+                _dns_cache.clear()
+            _dns_cache[key] = (result, now)
+        return result
     socket.getaddrinfo = ipv4_only_getaddrinfo
 
 import sys
+import queue
 import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from tqdm import tqdm
-import time
+from typing import TYPE_CHECKING, Tuple
 
 # 导入项目模块
-from config import setup_logging, ensure_directories, GOOGLE_SPREADSHEET_ID, check_google_credentials
+from config import setup_logging, ensure_directories, GOOGLE_SPREADSHEET_ID, check_google_credentials, MAX_WORKERS, LLM_BATCH_SIZE, SAVE_EVERY_N_ROWS, PREFETCH_WINDOW, REQUEST_TIMEOUT, PIPELINE_FETCH_WORKERS
 from utils import check_dependencies
-from excel_handler import ExcelHandler
-from fetch_text import ContentFetcher
-from analysis_stage import AnalysisStageManager
+from cache import get_response_cache, disable_response_cache
+
+# 表格、网页获取、LLM分析等重量级模块（pandas、openpyxl、Playwright、openai等）在使用时才导入，
+# 使 --help 和出错退出等路径无需承担这些导入开销
+if TYPE_CHECKING:
+    from fetch_text import ContentFetcher
+    from analysis_stage import AnalysisStageManager
 
 logger = logging.getLogger(__name__)
 
-class LLMAnalysisSystem:
+class _Stats:
+    """线程安全的处理计数器：只用一把小锁保护计数，不占用表格数据锁"""
+    
     def __init__(self):
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.success = 0
+        self.error = 0
+    
+    def inc(self, success: bool) -> Tuple[int, int, int]:
+        """记录一行的处理结果，返回更新后的 (已处理, 成功, 失败) 快照"""
+        with self._lock:
+            if success:
+                self.success += 1
+            else:
+                self.error += 1
+            self.processed += 1
+            return self.processed, self.success, self.error
+
+class LLMAnalysisSystem:
+    def __init__(self, workers: int = MAX_WORKERS, batch_size: int = LLM_BATCH_SIZE, pipeline: bool = False):
+        from excel_handler import ExcelHandler
+        from fetch_text import ContentFetcher
+        from analysis_stage import AnalysisStageManager
+        
         self.excel_handler = ExcelHandler()
         self.content_fetcher = ContentFetcher()
         self.analysis_manager = AnalysisStageManager()
-        self.processed_count = 0
-        self.error_count = 0
-        self.success_count = 0
+        self.response_cache = get_response_cache()
+        self.stats = _Stats()
+        
+        # 并行处理：表格数据和计数器由锁保护，每个工作线程使用独立的内容获取器和分析管理器
+        # （分析管理器内的浏览器搜索依赖同步Playwright，只能在创建它的线程中使用）
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)  # 每次LLM调用合并分析的行数
+        self.pipeline = pipeline  # 流水线模式：获取内容、LLM分析、保存结果分别由不同线程承担
+        self._data_lock = threading.RLock()
+        self._stop_event = threading.Event()
+        
+        # 顺序处理时在后台预取后续行的网页（URL -> Future）
+        self.prefetcher = None
+        self._prefetched = {}
+        
+        # 本次新获取的页面内容（行号 -> (URL, 内容)），该行处理成功后才写入内容缓存
+        self._fresh_content = {}
         
     def initialize(self) -> bool:
         """初始化系统"""
@@ -58,11 +134,11 @@ class LLMAnalysisSystem:
         
         # 3. 显示模型信息
         model_info = self.analysis_manager.get_model_info()
-        logger.info(f"3. LLM模型信息:")
-        logger.info(f"   使用OpenAI: {model_info['use_openai']}")
-        logger.info(f"   模型: {model_info['model']}")
+        logger.info("3. LLM模型信息:")
+        logger.info("   使用OpenAI: %s", model_info['use_openai'])
+        logger.info("   模型: %s", model_info['model'])
         if model_info['api_url']:
-            logger.info(f"   API地址: {model_info['api_url']}")
+            logger.info("   API地址: %s", model_info['api_url'])
         
         # 4. 显示待处理数据统计
         logger.info("4. 数据统计:")
@@ -88,7 +164,7 @@ class LLMAnalysisSystem:
             logger.info("📄 将使用本地Excel模式")
             from config import EXCEL_FILE
             if not EXCEL_FILE.exists():
-                logger.error(f"Excel文件不存在: {EXCEL_FILE}")
+                logger.error("Excel文件不存在: %s", EXCEL_FILE)
                 return False
         
         logger.info("环境检查通过")
@@ -108,31 +184,38 @@ class LLMAnalysisSystem:
                 logger.info("没有需要处理的行")
                 return True
             
-            logger.info(f"开始处理 {len(unfilled_rows)} 行数据")
+            logger.info("开始处理 %s 行数据（工作线程数: %s，批量大小: %s）", len(unfilled_rows), self.workers, self.batch_size)
             logger.info("=" * 60)
             
-            # 使用进度条处理每一行
-            with tqdm(unfilled_rows, desc="处理进度", unit="行") as pbar:
-                for row_index in pbar:
-                    pbar.set_description(f"处理第 {row_index} 行")
-                    
-                    success = self._process_single_row(row_index)
-                    
-                    if success:
-                        self.success_count += 1
-                        pbar.set_postfix({"成功": self.success_count, "失败": self.error_count})
-                    else:
-                        self.error_count += 1
-                        pbar.set_postfix({"成功": self.success_count, "失败": self.error_count})
-                    
-                    self.processed_count += 1
-                    
-                    # 立即保存每行的处理结果
-                    self.excel_handler.save_data()
-                    logger.info(f"已保存第 {row_index} 行的处理结果")
+            from tqdm import tqdm
+            
+            if self.workers == 1 and not self.pipeline:
+                from async_prefetcher import create_prefetcher
+                self.prefetcher = create_prefetcher()
+            
+            if self.pipeline:
+                self._run_pipeline(unfilled_rows)
+            elif self.workers == 1 and self.batch_size == 1:
+                # 使用进度条顺序处理每一行
+                with tqdm(unfilled_rows, desc="处理进度", unit="行", mininterval=0.5) as pbar:
+                    for position, row_index in enumerate(pbar):
+                        self._schedule_prefetch(unfilled_rows[position:position + PREFETCH_WINDOW + 1])
+                        
+                        success = self._process_single_row(row_index)
+                        self._on_row_done(row_index, success, pbar)
+            elif self.workers == 1:
+                # 顺序处理，每批多行合并进行LLM分析
+                with tqdm(total=len(unfilled_rows), desc="处理进度", unit="行", mininterval=0.5) as pbar:
+                    for batch_number, rows in enumerate(self._make_batches(unfilled_rows)):
+                        start = batch_number * self.batch_size
+                        self._schedule_prefetch(unfilled_rows[start:start + self.batch_size + PREFETCH_WINDOW])
+                        self._process_work_item(rows, self.content_fetcher, self.analysis_manager, pbar)
+            else:
+                self._run_parallel(unfilled_rows)
             
             # 最终保存
-            self.excel_handler.save_data()
+            with self._data_lock:
+                self.excel_handler.save_data()
             
             # 显示最终统计
             self._print_final_statistics()
@@ -147,36 +230,421 @@ class LLMAnalysisSystem:
             
         except KeyboardInterrupt:
             logger.warning("用户中断处理")
-            self.excel_handler.save_data()
+            self._stop_event.set()
+            with self._data_lock:
+                self.excel_handler.save_data()
             logger.info("已保存当前进度")
             return False
         except Exception as e:
-            logger.error(f"处理过程发生异常: {e}")
-            self.excel_handler.save_data()
+            logger.error("处理过程发生异常: %s", e)
+            self._stop_event.set()
+            with self._data_lock:
+                self.excel_handler.save_data()
             self._cleanup_resources()
             return False
     
+    @property
+    def processed_count(self) -> int:
+        return self.stats.processed
+    
+    @property
+    def success_count(self) -> int:
+        return self.stats.success
+    
+    @property
+    def error_count(self) -> int:
+        return self.stats.error
+    
+    def _on_row_done(self, row_index: int, success: bool, pbar):
+        """单行处理完成后更新计数、进度条并保存结果（线程安全）"""
+        processed, success_count, error_count = self.stats.inc(success)
+        
+        # 只缓存分析成功的行的内容，避免把"拒绝访问"等临时页面长期复用
+        fresh = self._fresh_content.pop(row_index, None)
+        if fresh is not None and success:
+            self.response_cache.put_content(*fresh)
+        # 不立即重绘，由tqdm按 mininterval 节流刷新
+        pbar.set_postfix_str(f"成功={success_count}, 失败={error_count}", refresh=False)
+        
+        # 每处理N行保存一次结果（只有保存时才占用表格数据锁），处理结束或中断时会做最终保存
+        if processed % SAVE_EVERY_N_ROWS == 0:
+            with self._data_lock:
+                self.excel_handler.save_data()
+            logger.info("已保存前 %s 行的处理结果（最新为第 %s 行）", processed, row_index)
+    
+    def _run_parallel(self, unfilled_rows):
+        """
+        使用线程池并行处理多行
+        
+        每个工作线程持有独立的内容获取器和分析管理器，从有界队列中领取行号，
+        主线程按需投放行号，避免一次性提交全部任务
+        """
+        from tqdm import tqdm
+        
+        row_queue = queue.Queue(maxsize=self.workers * 2)
+        
+        with tqdm(total=len(unfilled_rows), desc="处理进度", unit="行", mininterval=0.5) as pbar, \
+                ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="row-worker") as executor:
+            futures = [executor.submit(self._worker_loop, row_queue, pbar) for _ in range(self.workers)]
+            
+            try:
+                for rows in self._make_batches(unfilled_rows):
+                    row_queue.put(rows)
+            except BaseException:
+                # 先置中断标志，工作线程会跳过队列中剩余的行，下面投放退出信号时不会长时间阻塞
+                self._stop_event.set()
+                raise
+            finally:
+                # 无论是否中断，都通知每个工作线程退出
+                for _ in range(self.workers):
+                    row_queue.put(None)
+            
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error("工作线程异常退出: %s", e)
+    
+    def _run_pipeline(self, unfilled_rows):
+        """
+        流水线处理：获取内容 → LLM分析 → 保存结果
+        
+        获取线程池（PIPELINE_FETCH_WORKERS）、LLM线程池（--workers）和单个写入线程之间
+        通过有界队列传递 (行索引, 数据)，各阶段同时工作；None 作为结束信号逐级传递。
+        """
+        fetch_workers = max(1, PIPELINE_FETCH_WORKERS)
+        row_queue = queue.Queue(maxsize=fetch_workers * 2)
+        llm_queue = queue.Queue(maxsize=self.workers * 2)
+        write_queue = queue.Queue()
+        
+        from tqdm import tqdm
+        
+        logger.info("流水线模式：获取线程 %s 个，LLM线程 %s 个，写入线程 1 个", fetch_workers, self.workers)
+        
+        with tqdm(total=len(unfilled_rows), desc="处理进度", unit="行", mininterval=0.5) as pbar, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer") as writer_pool, \
+                ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="llm-worker") as llm_pool, \
+                ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix="fetch-worker") as fetch_pool:
+            writer = writer_pool.submit(self._pipeline_writer, write_queue, pbar)
+            llm_futures = [llm_pool.submit(self._pipeline_llm_worker, llm_queue, write_queue)
+                           for _ in range(self.workers)]
+            fetch_futures = [fetch_pool.submit(self._pipeline_fetch_worker, row_queue, llm_queue, write_queue)
+                             for _ in range(fetch_workers)]
+            
+            try:
+                for row_index in unfilled_rows:
+                    row_queue.put(row_index)
+            except BaseException:
+                # 先置中断标志，各阶段跳过剩余的行，结束信号才能尽快逐级传递
+                self._stop_event.set()
+                raise
+            finally:
+                # 无论是否中断，都逐级发送结束信号，让各阶段处理完队列后退出
+                for _ in range(fetch_workers):
+                    row_queue.put(None)
+                self._wait_stage(fetch_futures, "获取")
+                for _ in range(self.workers):
+                    llm_queue.put(None)
+                self._wait_stage(llm_futures, "LLM")
+                write_queue.put(None)
+                self._wait_stage([writer], "写入")
+    
+    def _wait_stage(self, futures, stage_name: str):
+        """等待流水线某一阶段的所有线程结束"""
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.error("%s线程异常退出: %s", stage_name, e)
+    
+    def _pipeline_fetch_worker(self, row_queue: queue.Queue, llm_queue: queue.Queue, write_queue: queue.Queue):
+        """流水线获取阶段：获取行内容，成功的交给LLM阶段，失败的直接交给写入阶段"""
+        from fetch_text import ContentFetcher
+        
+        content_fetcher = ContentFetcher()
+        while True:
+            row_index = row_queue.get()
+            if row_index is None:
+                break
+            if self._stop_event.is_set():
+                continue  # 已中断，跳过剩余行直到收到结束信号
+            
+            logger.info("\n开始处理第 %s 行（流水线）", row_index)
+            try:
+                content, used_notes = self._fetch_row_content(row_index, content_fetcher)
+            except Exception as e:
+                error_msg = f"处理异常: {str(e)}"
+                logger.error(error_msg)
+                with self._data_lock:
+                    self.excel_handler.update_row_error(row_index, error_msg)
+                content, used_notes = None, False
+            
+            if content is None:
+                write_queue.put((row_index, False))
+            else:
+                llm_queue.put((row_index, (content, used_notes)))
+    
+    def _pipeline_llm_worker(self, llm_queue: queue.Queue, write_queue: queue.Queue):
+        """流水线LLM阶段：分析内容并写回表格数据，结果交给写入阶段"""
+        from analysis_stage import AnalysisStageManager
+        
+        analysis_manager = AnalysisStageManager()
+        try:
+            while True:
+                item = llm_queue.get()
+                if item is None:
+                    break
+                row_index, (content, used_notes) = item
+                if self._stop_event.is_set():
+                    continue
+                
+                try:
+                    has_results, results, error_msg = self._analyze_content(row_index, content, analysis_manager)
+                    success = self._apply_analysis_result(row_index, used_notes, has_results, results, error_msg)
+                except Exception as e:
+                    error_msg = f"处理异常: {str(e)}"
+                    logger.error(error_msg)
+                    with self._data_lock:
+                        self.excel_handler.update_row_error(row_index, error_msg)
+                    try:
+                        analysis_manager.llm_agent.save_conversation_log(row_index)
+                    except Exception as save_error:
+                        logger.warning("保存对话记录失败: %s", save_error)
+                    success = False
+                write_queue.put((row_index, success))
+        finally:
+            try:
+                analysis_manager.cleanup()
+            except Exception as e:
+                logger.warning("清理LLM线程资源失败: %s", e)
+    
+    def _pipeline_writer(self, write_queue: queue.Queue, pbar):
+        """流水线写入阶段：更新计数和进度，并按 SAVE_EVERY_N_ROWS 定期保存"""
+        while True:
+            item = write_queue.get()
+            if item is None:
+                break
+            row_index, success = item
+            self._on_row_done(row_index, success, pbar)
+            pbar.update(1)
+    
+    def _worker_loop(self, row_queue: queue.Queue, pbar):
+        """工作线程主循环：创建本线程的组件，处理队列中的行（每项为一批行号），退出前清理"""
+        from fetch_text import ContentFetcher
+        from analysis_stage import AnalysisStageManager
+        
+        content_fetcher = ContentFetcher()
+        analysis_manager = AnalysisStageManager()
+        try:
+            while True:
+                rows = row_queue.get()
+                if rows is None:
+                    break
+                if self._stop_event.is_set():
+                    continue  # 已中断，跳过剩余行直到收到退出信号
+                
+                self._process_work_item(rows, content_fetcher, analysis_manager, pbar)
+        finally:
+            try:
+                analysis_manager.cleanup()
+            except Exception as e:
+                logger.warning("清理工作线程资源失败: %s", e)
+    
     def _cleanup_resources(self):
         """清理系统资源"""
         try:
             if hasattr(self, 'analysis_manager') and self.analysis_manager:
                 self.analysis_manager.cleanup()
                 logger.info("分析管理器资源已清理")
+            self.response_cache.close()
+            if self.prefetcher:
+                self.prefetcher.close()
+                self.prefetcher = None
         except Exception as e:
-            logger.warning(f"清理资源失败: {e}")
+            logger.warning("清理资源失败: %s", e)
+    
+    def _schedule_prefetch(self, rows):
+        """为即将处理的行提交网页预取请求（已缓存或不适合预取的链接跳过）"""
+        if not self.prefetcher:
+            return
+        for row_index in rows:
+            with self._data_lock:
+                row_data = self.excel_handler.get_row_data(row_index)
+                url, _ = self.excel_handler.extract_link_from_row(row_data) if row_data else (None, False)
+            if (not url or url in self._prefetched
+                    or not self.content_fetcher.should_prefetch(url)
+                    or self.response_cache.get_content(url)):
+                continue
+            self._prefetched[url] = self.prefetcher.request(url)
     
-    def _process_single_row(self, row_index: int) -> bool:
-        """处理单行数据"""
+    def _take_prefetched(self, url: str):
+        """取出URL的预取结果（等待尚未完成的请求），没有预取或预取失败返回None"""
+        future = self._prefetched.pop(url, None)
+        if future is None:
+            return None
         try:
-            logger.info(f"\n开始处理第 {row_index} 行")
+            return future.result(timeout=REQUEST_TIMEOUT)
+        except Exception as e:
+            logger.debug("等待预取结果失败: %s", e)
+            return None
+    
+    def _make_batches(self, rows):
+        """按批量大小切分行号列表"""
+        return [rows[i:i + self.batch_size] for i in range(0, len(rows), self.batch_size)]
+    
+    def _process_work_item(self, rows, content_fetcher, analysis_manager, pbar):
+        """处理一批行（单行时走单行流程），并逐行更新计数和进度"""
+        if len(rows) == 1:
+            outcomes = {rows[0]: self._process_single_row(rows[0], content_fetcher, analysis_manager)}
+        else:
+            outcomes = self._process_row_batch(rows, content_fetcher, analysis_manager)
+        
+        for row_index in rows:
+            self._on_row_done(row_index, outcomes.get(row_index, False), pbar)
+            pbar.update(1)
+    
+    def _process_single_row(self, row_index: int, content_fetcher: "ContentFetcher" = None,
+                            analysis_manager: "AnalysisStageManager" = None) -> bool:
+        """
+        处理单行数据
+        
+        Args:
+            row_index: 行索引
+            content_fetcher: 内容获取器，默认使用系统实例的（多线程时传入本线程的实例）
+            analysis_manager: 分析管理器，默认使用系统实例的（多线程时传入本线程的实例）
+        """
+        content_fetcher = content_fetcher or self.content_fetcher
+        analysis_manager = analysis_manager or self.analysis_manager
+        try:
+            logger.info("\n开始处理第 %s 行", row_index)
+            
+            # 1-3. 获取行数据、提取链接、获取内容
+            content, used_notes = self._fetch_row_content(row_index, content_fetcher)
+            if content is None:
+                return False
             
-            # 1. 获取行数据
+            # 4. 分析内容
+            has_results, results, error_msg = self._analyze_content(row_index, content, analysis_manager)
+            
+            # 5-6. 处理分析结果
+            return self._apply_analysis_result(row_index, used_notes, has_results, results, error_msg)
+            
+        except Exception as e:
+            error_msg = f"处理异常: {str(e)}"
+            logger.error(error_msg)
+            with self._data_lock:
+                self.excel_handler.update_row_error(row_index, error_msg)
+            # 即使发生异常也尝试保存对话记录（如果有的话）
+            try:
+                analysis_manager.llm_agent.save_conversation_log(row_index)
+            except Exception as save_error:
+                logger.warning("保存对话记录失败: %s", save_error)
+            return False
+    
+    def _analyze_content(self, row_index: int, content: str, analysis_manager: "AnalysisStageManager"):
+        """分析单行内容，优先使用缓存的分析结果；完全成功的结果写入缓存"""
+        model_info = analysis_manager.llm_agent.get_model_info()
+        cached = self.response_cache.get_analysis(content, model_info)
+        if cached:
+            logger.info("命中分析缓存，跳过LLM分析")
+            return cached
+        
+        logger.info("开始LLM分析...")
+        has_results, results, error_msg = analysis_manager.analyze_text_complete(content, row_index)
+        if has_results and not error_msg:
+            self.response_cache.put_analysis(content, model_info, results)
+        return has_results, results, error_msg
+    
+    def _process_row_batch(self, rows, content_fetcher: "ContentFetcher",
+                           analysis_manager: "AnalysisStageManager") -> dict:
+        """
+        批量处理多行：逐行获取内容后，合并为批量LLM调用分析，再逐行写回结果
+        
+        Returns:
+            dict: {行索引: 是否成功}
+        """
+        outcomes = {}
+        fetched_rows, contents, used_notes_map = [], [], {}
+        
+        for row_index in rows:
+            logger.info("\n开始处理第 %s 行（批量）", row_index)
+            try:
+                content, used_notes = self._fetch_row_content(row_index, content_fetcher)
+            except Exception as e:
+                error_msg = f"处理异常: {str(e)}"
+                logger.error(error_msg)
+                with self._data_lock:
+                    self.excel_handler.update_row_error(row_index, error_msg)
+                content, used_notes = None, False
+            
+            if content is None:
+                outcomes[row_index] = False
+                continue
+            fetched_rows.append(row_index)
+            contents.append(content)
+            used_notes_map[row_index] = used_notes
+        
+        if not fetched_rows:
+            return outcomes
+        
+        # 已缓存分析结果的行不再参与批量LLM调用
+        model_info = analysis_manager.llm_agent.get_model_info()
+        analysis_outcomes = {}
+        pending_rows, pending_contents = [], []
+        for row_index, content in zip(fetched_rows, contents):
+            cached = self.response_cache.get_analysis(content, model_info)
+            if cached:
+                logger.info("第 %s 行命中分析缓存，跳过LLM分析", row_index)
+                analysis_outcomes[row_index] = cached
+            else:
+                pending_rows.append(row_index)
+                pending_contents.append(content)
+        
+        if pending_rows:
+            logger.info("开始批量LLM分析（%s 行）...", len(pending_rows))
+            try:
+                batch_outcomes = analysis_manager.analyze_texts_batch(pending_contents, pending_rows)
+            except Exception as e:
+                error_msg = f"处理异常: {str(e)}"
+                logger.error(error_msg)
+                batch_outcomes = {row_index: (False, {}, error_msg) for row_index in pending_rows}
+            
+            for row_index, content in zip(pending_rows, pending_contents):
+                has_results, results, error_msg = batch_outcomes[row_index]
+                if has_results and not error_msg:
+                    self.response_cache.put_analysis(content, model_info, results)
+            analysis_outcomes.update(batch_outcomes)
+        
+        for row_index in fetched_rows:
+            has_results, results, error_msg = analysis_outcomes[row_index]
+            try:
+                outcomes[row_index] = self._apply_analysis_result(
+                    row_index, used_notes_map[row_index], has_results, results, error_msg
+                )
+            except Exception as e:
+                error_msg = f"处理异常: {str(e)}"
+                logger.error(error_msg)
+                with self._data_lock:
+                    self.excel_handler.update_row_error(row_index, error_msg)
+                outcomes[row_index] = False
+        
+        return outcomes
+    
+    def _fetch_row_content(self, row_index: int, content_fetcher: "ContentFetcher"):
+        """
+        获取行数据、提取链接并获取内容，失败时在Error列记录原因
+        
+        Returns:
+            Tuple[Optional[str], bool]: (内容文本，失败时为None, 是否使用了Notes中的链接)
+        """
+        # 1. 获取行数据
+        with self._data_lock:
             row_data = self.excel_handler.get_row_data(row_index)
             if not row_data:
                 error_msg = "无法获取行数据"
                 logger.error(error_msg)
                 self.excel_handler.update_row_error(row_index, error_msg)
-                return False
+                return None, False
             
             # 2. 提取链接
             url, used_notes = self.excel_handler.extract_link_from_row(row_data)
@@ -184,94 +652,81 @@ class LLMAnalysisSystem:
                 error_msg = "未找到有效链接"
                 logger.warning(error_msg)
                 self.excel_handler.update_row_error(row_index, error_msg)
-                return False
-            
-            # 3. 获取内容
-            logger.info(f"获取内容: {url}")
-            content = self.content_fetcher.fetch_content(url)
-            if not content:
-                error_msg = "内容获取失败"
-                logger.error(error_msg)
+                return None, False
+        
+        # 3. 获取内容（优先使用缓存的内容）
+        content = self.response_cache.get_content(url)
+        if content:
+            logger.info("命中内容缓存: %s", url)
+        else:
+            logger.info("获取内容: %s", url)
+            # 内容提取为文本后即删除本次下载的PDF缓存文件
+            with content_fetcher.fetch(url, prefetched=self._take_prefetched(url)) as fetched:
+                content = fetched
+            if content:
+                self._fresh_content[row_index] = (url, content)
+        if not content:
+            error_msg = "内容获取失败"
+            logger.error(error_msg)
+            with self._data_lock:
                 self.excel_handler.update_row_error(row_index, error_msg)
-                # 如果处理的是PDF文件，删除缓存的PDF文件
-                self.content_fetcher.delete_current_pdf()
-                return False
-            
-            logger.info(f"内容获取成功，长度: {len(content)} 字符")
-            
-            # 4. 分析内容
-            logger.info("开始LLM分析...")
-            has_results, results, error_msg = self.analysis_manager.analyze_text_complete(content, row_index)
-            
-            # 处理分析结果
-            if has_results:
-                # 有结果（完全成功或部分成功）
-                logger.info(f"分析获得结果，更新数据...")
-                
-                # 5. 根据是否有错误决定Verifier字段
-                verifier = "LLM" if not error_msg else ""  # 只有完全成功才设置Verifier为LLM
-                
-                # 6. 如果使用了Notes中的链接且Verifier设置为LLM，需要在Error列中填写"需转换链接"
-                final_error_msg = error_msg
-                if used_notes and verifier == "LLM":
-                    if final_error_msg:
-                        final_error_msg = f"{final_error_msg}; 需转换链接"
-                    else:
-                        final_error_msg = "需转换链接"
-                    logger.info(f"使用了Notes中的链接，将在Error列中填写'需转换链接'")
-                
-                # 同时更新结果和错误信息（如果有）
-                update_success = self.excel_handler.update_row_data_with_error(row_index, results, final_error_msg, verifier)
-                if not update_success:
-                    final_error_msg = f"结果更新失败{'; ' + final_error_msg if final_error_msg else ''}"
-                    logger.error("结果更新失败")
-                    self.excel_handler.update_row_error(row_index, final_error_msg)
-                    # 如果处理的是PDF文件，删除缓存的PDF文件
-                    self.content_fetcher.delete_current_pdf()
-                    return False
-                
-                if final_error_msg:
-                    logger.info(f"第 {row_index} 行部分成功（Verifier未设置，Error列记录失败信息）")
-                else:
-                    logger.info(f"第 {row_index} 行完全成功（Verifier设置为LLM）")
-                
-            else:
-                # 没有任何结果（完全失败）
-                logger.error(f"分析完全失败: {error_msg}")
+            return None, used_notes
+        
+        logger.info("内容获取成功，长度: %s 字符", len(content))
+        return content, used_notes
+    
+    def _apply_analysis_result(self, row_index: int, used_notes: bool, has_results: bool,
+                               results: dict, error_msg: str) -> bool:
+        """将分析结果写回表格，返回该行是否处理成功"""
+        if not has_results:
+            # 没有任何结果（完全失败）
+            logger.error("分析完全失败: %s", error_msg)
+            with self._data_lock:
                 self.excel_handler.update_row_error(row_index, error_msg)
-                # 如果处理的是PDF文件，删除缓存的PDF文件
-                self.content_fetcher.delete_current_pdf()
-                return False
-            
-            # 6. 处理成功后，删除缓存的PDF文件
-            self.content_fetcher.delete_current_pdf()
-            
-            return True
-            
-        except Exception as e:
-            error_msg = f"处理异常: {str(e)}"
-            logger.error(error_msg)
-            self.excel_handler.update_row_error(row_index, error_msg)
-            # 如果处理的是PDF文件，删除缓存的PDF文件
-            self.content_fetcher.delete_current_pdf()
-            # 即使发生异常也尝试保存对话记录（如果有的话）
-            try:
-                self.analysis_manager.llm_agent.save_conversation_log(row_index)
-            except Exception as save_error:
-                logger.warning(f"保存对话记录失败: {save_error}")
             return False
+        
+        # 有结果（完全成功或部分成功）
+        logger.info("分析获得结果，更新数据...")
+        
+        # 5. 根据是否有错误决定Verifier字段
+        verifier = "LLM" if not error_msg else ""  # 只有完全成功才设置Verifier为LLM
+        
+        # 6. 如果使用了Notes中的链接且Verifier设置为LLM，需要在Error列中填写"需转换链接"
+        final_error_msg = error_msg
+        if used_notes and verifier == "LLM":
+            if final_error_msg:
+                final_error_msg = f"{final_error_msg}; 需转换链接"
+            else:
+                final_error_msg = "需转换链接"
+            logger.info("使用了Notes中的链接，将在Error列中填写'需转换链接'")
+        
+        # 同时更新结果和错误信息（如果有）
+        with self._data_lock:
+            update_success = self.excel_handler.update_row_data_with_error(row_index, results, final_error_msg, verifier)
+            if not update_success:
+                final_error_msg = f"结果更新失败{'; ' + final_error_msg if final_error_msg else ''}"
+                logger.error("结果更新失败")
+                self.excel_handler.update_row_error(row_index, final_error_msg)
+                return False
+        
+        if final_error_msg:
+            logger.info("第 %s 行部分成功（Verifier未设置，Error列记录失败信息）", row_index)
+        else:
+            logger.info("第 %s 行完全成功（Verifier设置为LLM）", row_index)
+        
+        return True
     
     def _print_final_statistics(self):
         """打印最终统计信息"""
         logger.info("\n" + "=" * 60)
         logger.info("最终处理统计:")
-        logger.info(f"总处理行数: {self.processed_count}")
-        logger.info(f"成功: {self.success_count}")
-        logger.info(f"失败: {self.error_count}")
+        logger.info("总处理行数: %s", self.processed_count)
+        logger.info("成功: %s", self.success_count)
+        logger.info("失败: %s", self.error_count)
         
         if self.processed_count > 0:
             success_rate = self.success_count / self.processed_count * 100
-            logger.info(f"成功率: {success_rate:.1f}%")
+            logger.info("成功率: %.1f%%", success_rate)
         
         # 显示更新后的数据统计
         logger.info("\n更新后的数据统计:")
@@ -280,25 +735,25 @@ class LLMAnalysisSystem:
         # 显示缓存信息
         cache_info = self.content_fetcher.get_cache_info()
         if cache_info:
-            logger.info(f"\nPDF缓存信息:")
-            logger.info(f"缓存文件数: {cache_info['file_count']}")
-            logger.info(f"缓存大小: {cache_info['total_size_mb']} MB")
+            logger.info("\nPDF缓存信息:")
+            logger.info("缓存文件数: %s", cache_info['file_count'])
+            logger.info("缓存大小: %s MB", cache_info['total_size_mb'])
 
-def main():
+def main(workers: int = MAX_WORKERS, batch_size: int = LLM_BATCH_SIZE, pipeline: bool = False):
     """主函数"""
     try:
         # 设置日志
         setup_logging()
         
         # 创建系统实例并运行
-        system = LLMAnalysisSystem()
+        system = LLMAnalysisSystem(workers=workers, batch_size=batch_size, pipeline=pipeline)
         success = system.run()
         
         # 退出码
         sys.exit(0 if success else 1)
         
     except Exception as e:
-        logger.error(f"程序运行失败: {e}")
+        logger.error("程序运行失败: %s", e)
         sys.exit(1)
 
 def test_single_row():
@@ -313,14 +768,13 @@ def test_single_row():
             logger.error("初始化失败")
             return
         
-        # 获取第一个未处理的行进行测试
-        unfilled_rows = system.excel_handler.get_unfilled_rows()
-        if not unfilled_rows:
+        # 获取第一个未处理的行进行测试（找到即停止，不扫描全表）
+        test_row = next(system.excel_handler.iter_unfilled_rows(), None)
+        if test_row is None:
             logger.info("没有未处理的行可以测试")
             return
         
-        test_row = unfilled_rows[0]
-        logger.info(f"测试处理第 {test_row} 行")
+        logger.info("测试处理第 %s 行", test_row)
         
         success = system._process_single_row(test_row)
         
@@ -331,11 +785,27 @@ def test_single_row():
             logger.error("测试失败")
             
     except Exception as e:
-        logger.error(f"测试失败: {e}")
+        logger.error("测试失败: %s", e)
 
 if __name__ == "__main__":
-    # 如果传入参数 "test"，则运行测试模式
-    if len(sys.argv) > 1 and sys.argv[1] == "test":
+    parser = argparse.ArgumentParser(description="基于LLM的文本智能分析与数据字段自动填写系统")
+    parser.add_argument("mode", nargs="?", choices=["test"], help="传入 test 则运行测试模式（只处理第一个未填写的行）")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help=f"并行处理的工作线程数（默认 {MAX_WORKERS}）")
+    parser.add_argument("--batch-size", type=int, default=LLM_BATCH_SIZE,
+                        help=f"每次LLM调用合并分析的行数（默认 {LLM_BATCH_SIZE}，即逐行分析）")
+    parser.add_argument("--pipeline", action="store_true",
+                        help=f"流水线模式：{PIPELINE_FETCH_WORKERS} 个线程获取内容，--workers 个线程进行LLM分析，单独线程保存结果")
+    parser.add_argument("--no-cache", action="store_true", help="不读取也不写入响应缓存（重新获取内容并重新分析）")
+    args = parser.parse_args()
+    
+    if args.pipeline and args.batch_size > 1:
+        # 流水线的LLM阶段逐行分析，不支持批量
+        parser.error("--pipeline 不支持 --batch-size 大于1，请使用 --batch-size 1 或去掉 --pipeline")
+    
+    if args.no_cache:
+        disable_response_cache()
+    
+    if args.mode == "test":
         test_single_row()
     else:
-        main() 
\ No newline at end of file
+        main(workers=args.workers, batch_size=args.batch_size, pipeline=args.pipeline) 
\ No newline at end of file
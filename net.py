@@ -0,0 +1,51 @@
+"""
+网络连接模块 - 进程内共享的HTTP连接池
+
+网页获取、联系人验证和LLM调用共用长连接，同一主机只需一次TCP/TLS握手。
+"""
+import logging
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import HTTP_POOL_MAXSIZE, HTTP_KEEPALIVE_EXPIRY
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+
+def get_shared_session() -> requests.Session:
+    """获取共享的 requests.Session 单例（带连接池，线程间共用）"""
+    global _shared_session
+    with _shared_session_lock:
+        if _shared_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_MAXSIZE, pool_maxsize=HTTP_POOL_MAXSIZE)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'User-Agent': DEFAULT_USER_AGENT})
+            _shared_session = session
+        return _shared_session
+
+def create_openai_http_client():
+    """
+    创建供OpenAI客户端使用的 httpx.Client（长连接池）
+
+    httpx 随 openai 包一起安装；创建失败时返回None，由OpenAI客户端使用默认连接
+    """
+    try:
+        import httpx
+        return httpx.Client(
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=HTTP_POOL_MAXSIZE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+            )
+        )
+    except Exception as e:
+        logger.warning(f"创建httpx连接池失败，使用OpenAI默认连接: {e}")
+        return None
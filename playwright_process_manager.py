@@ -4,17 +4,147 @@ Playwright进程管理器 - 通过独立进程运行Playwright，完全避免异
 import subprocess
 import json
 import logging
+import sys
+import queue
+import atexit
+import threading
 from typing import Optional
 from pathlib import Path
 
+from cache import get_response_cache
+from config import PLAYWRIGHT_PERSISTENT_WORKER, PLAYWRIGHT_WORKER_PROCESSES, SCREENSHOT_CLEANUP_AFTER_USE
+
 logger = logging.getLogger(__name__)
 
+# 可选：orjson直接从UTF-8字节解析worker输出，无需先解码为str
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+def _parse_output(output: bytes) -> Optional[dict]:
+    """解析worker输出的一行JSON（UTF-8字节）"""
+    try:
+        return _loads(output)
+    except ValueError as e:
+        logger.error(f"无法解析Playwright进程输出: {e}")
+        logger.error(f"输出内容: {output[:500].decode('utf-8', errors='replace')}")
+        return None
+
+class _PersistentWorker:
+    """一个常驻worker进程：浏览器只启动一次，通过stdin/stdout的JSON行通信"""
+    
+    def __init__(self, worker_script: Path, name: str):
+        self.worker_script = worker_script
+        self.name = name
+        self._process = None
+        self._responses = None
+        self._lock = threading.Lock()
+    
+    def _start(self):
+        """启动worker进程，并用后台线程读取其输出行"""
+        cmd = [sys.executable, str(self.worker_script), '--serve']
+        # 管道以二进制模式传输UTF-8字节，结果不经过文本解码，直接交给JSON解析
+        self._process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE
+        )
+        
+        # Windows 上管道不支持 select，统一使用读线程 + 队列实现带超时的读取
+        responses = queue.Queue()
+        
+        def _reader(stream, q):
+            for line in stream:
+                q.put(line)
+            q.put(None)  # EOF：进程已退出
+        
+        threading.Thread(target=_reader, args=(self._process.stdout, responses),
+                         daemon=True, name=f"{self.name}-reader").start()
+        self._responses = responses
+        logger.info(f"✅ 常驻Playwright进程已启动 ({self.name}, PID: {self._process.pid})")
+    
+    def _stop(self, kill: bool = False):
+        """终止worker进程（kill=True 时直接强制结束，用于超时的进程）"""
+        process, self._process = self._process, None
+        self._responses = None
+        if process is None:
+            return
+        if kill:
+            process.kill()
+        try:
+            process.stdin.close()
+        except Exception:
+            pass
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        except Exception:
+            pass
+    
+    def close(self):
+        """关闭worker进程"""
+        with self._lock:
+            self._stop()
+    
+    def request(self, request: dict, timeout: int) -> Optional[dict]:
+        """
+        发送一个请求并等待一行JSON响应
+        
+        worker崩溃或超时时将其终止，下一个请求会自动重新启动
+        """
+        with self._lock:
+            if self._process is None or self._process.poll() is not None:
+                if self._process is not None:
+                    logger.warning(f"⚠️ Playwright进程已退出（{self.name}, 返回码: {self._process.returncode}），重新启动")
+                    self._stop()
+                self._start()
+            
+            try:
+                self._process.stdin.write(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+                self._process.stdin.flush()
+            except (BrokenPipeError, OSError) as e:
+                logger.error(f"无法向Playwright进程发送请求: {e}")
+                self._stop()
+                return None
+            
+            try:
+                line = self._responses.get(timeout=timeout)
+            except queue.Empty:
+                logger.error(f"Playwright进程超时 ({timeout}秒)，重启进程")
+                self._stop(kill=True)
+                return None
+            
+            if line is None:
+                self._stop()
+                logger.error("Playwright进程意外退出，将在下一个请求时重新启动")
+                return None
+            
+            return _parse_output(line)
+
 class PlaywrightProcessManager:
     """通过独立进程管理Playwright，完全隔离异步环境"""
     
-    def __init__(self):
+    def __init__(self, persistent: bool = PLAYWRIGHT_PERSISTENT_WORKER,
+                 processes: int = PLAYWRIGHT_WORKER_PROCESSES):
         self.worker_script = Path(__file__).parent / "playwright_worker.py"
         self._check_worker_script()
+        
+        # 常驻worker池：每个进程的浏览器只启动一次，进程在首次使用时才启动；
+        # 并行处理的多个行各自取一个空闲进程，互不阻塞
+        self.persistent = persistent
+        self._workers = [
+            _PersistentWorker(self.worker_script, f"playwright-worker-{i}")
+            for i in range(max(1, processes))
+        ] if persistent else []
+        self._idle_workers = queue.LifoQueue()
+        for worker in reversed(self._workers):
+            self._idle_workers.put(worker)
+        if self.persistent:
+            atexit.register(self.close)
     
     def _check_worker_script(self):
         """检查worker脚本是否存在"""
@@ -22,6 +152,62 @@ class PlaywrightProcessManager:
             logger.error(f"Playwright worker脚本不存在: {self.worker_script}")
             raise FileNotFoundError(f"找不到 {self.worker_script}")
     
+    def close(self):
+        """关闭所有常驻worker进程（程序退出时自动调用）"""
+        for worker in self._workers:
+            worker.close()
+    
+    def _request_persistent(self, request: dict, timeout: int) -> Optional[dict]:
+        """从worker池取一个空闲进程处理请求，完成后放回池中"""
+        worker = self._idle_workers.get()
+        try:
+            return worker.request(request, timeout)
+        finally:
+            self._idle_workers.put(worker)
+    
+    def _run_oneshot(self, url: str, scroll_enabled: bool, screenshot_mode: bool, timeout: int) -> Optional[dict]:
+        """为单个URL启动一次性worker进程（非常驻模式）"""
+        # 构建命令
+        cmd = [
+            sys.executable,
+            str(self.worker_script),
+            url,
+            'true' if scroll_enabled else 'false',
+            'true' if screenshot_mode else 'false'
+        ]
+        
+        # 运行独立进程（输出为UTF-8字节，直接解析）
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            timeout=timeout
+        )
+        
+        # 检查进程是否成功
+        if result.returncode != 0:
+            logger.error(f"Playwright进程失败，返回码: {result.returncode}")
+            # 使用 errors='replace' 处理 Windows 编码问题
+            logger.error(f"错误输出: {result.stderr.decode('utf-8', errors='replace')}")
+            return None
+        
+        # 解析JSON结果
+        return _parse_output(result.stdout)
+    
+    def _read_handoff(self, response: dict) -> Optional[str]:
+        """读取worker通过临时文件传递的页面文本并删除该文件，无文件时返回响应中的内容"""
+        path = response.get('path')
+        if not path:
+            return response.get('content')
+        
+        handoff_file = Path(path)
+        try:
+            return handoff_file.read_text(encoding='utf-8', errors='replace')
+        finally:
+            try:
+                handoff_file.unlink()
+            except OSError as e:
+                logger.warning(f"删除临时文件失败: {e}")
+    
     def get_page_content(self, url: str, scroll_enabled: bool = True, timeout: int = 60) -> Optional[str]:
         """
         通过独立进程获取页面内容
@@ -65,60 +251,44 @@ class PlaywrightProcessManager:
         Returns:
             根据模式返回不同内容：文本模式返回str，截图模式返回dict
         """
+        # 只缓存截图模式的结果：文本由内容缓存在该行分析成功后保存；截图使用后即被清理时缓存不会命中
+        render_cache = get_response_cache() if screenshot_mode and not SCREENSHOT_CLEANUP_AFTER_USE else None
+        cached = render_cache.get_render(url, scroll_enabled, screenshot_mode) if render_cache else None
+        if cached:
+            logger.info(f"✅ 使用缓存的Playwright截图结果: {url}")
+            return cached
+        
         try:
-            logger.info(f"启动独立Playwright进程处理: {url}")
-            
-            # 构建命令
-            import sys
-            python_executable = sys.executable
-            cmd = [
-                python_executable,
-                str(self.worker_script),
-                url,
-                'true' if scroll_enabled else 'false',
-                'true' if screenshot_mode else 'false'
-            ]
-            
-            # 运行独立进程
-            # 使用 errors='replace' 处理 Windows 编码问题
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                encoding='utf-8',
-                errors='replace'  # 替换无法解码的字符，避免 UnicodeDecodeError
-            )
+            if self.persistent:
+                logger.info(f"通过常驻Playwright进程处理: {url}")
+                response = self._request_persistent({
+                    'url': url,
+                    'scroll_enabled': scroll_enabled,
+                    'screenshot_mode': screenshot_mode
+                }, timeout)
+            else:
+                logger.info(f"启动独立Playwright进程处理: {url}")
+                response = self._run_oneshot(url, scroll_enabled, screenshot_mode, timeout)
             
-            # 检查进程是否成功
-            if result.returncode != 0:
-                logger.error(f"Playwright进程失败，返回码: {result.returncode}")
-                logger.error(f"错误输出: {result.stderr}")
+            if response is None:
                 return None
             
-            # 解析JSON结果
-            try:
-                response = json.loads(result.stdout)
-                
-                if response.get('success'):
-                    if screenshot_mode:
-                        # 截图模式返回完整响应
-                        logger.info(f"✅ Playwright进程成功捕获截图，共 {len(response.get('screenshots', []))} 张")
-                        return response
-                    else:
-                        # 文本模式返回内容
-                        content = response.get('content')
-                        length = response.get('length', 0)
-                        logger.info(f"✅ Playwright进程成功获取内容，长度: {length} 字符")
-                        return content
+            if response.get('success'):
+                if screenshot_mode:
+                    # 截图模式返回完整响应
+                    logger.info(f"✅ Playwright进程成功捕获截图，共 {len(response.get('screenshots', []))} 张")
+                    if render_cache:
+                        render_cache.put_render(url, scroll_enabled, screenshot_mode, response)
+                    return response
                 else:
-                    error = response.get('error', 'Unknown error')
-                    logger.error(f"Playwright进程报告失败: {error}")
-                    return None
-                    
-            except json.JSONDecodeError as e:
-                logger.error(f"无法解析Playwright进程输出: {e}")
-                logger.error(f"输出内容: {result.stdout[:500]}")
+                    # 文本模式返回内容（大段文本由worker写入临时文件传递）
+                    content = self._read_handoff(response)
+                    length = response.get('length', 0)
+                    logger.info(f"✅ Playwright进程成功获取内容，长度: {length} 字符")
+                    return content
+            else:
+                error = response.get('error', 'Unknown error')
+                logger.error(f"Playwright进程报告失败: {error}")
                 return None
                 
         except subprocess.TimeoutExpired:
@@ -6,21 +6,97 @@ Playwright独立进程工作器 - 完全避免异步冲突
 """
 import sys
 import json
+import hashlib
 import logging
-from typing import Optional
+from urllib.parse import urlparse
 import io
+import base64
+import tempfile
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 
-# 强制 stdout 使用 UTF-8 编码，避免 Windows 上的 GBK 编码问题
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+# 结果以UTF-8字节直接写入真实stdout（见 write_json_line），其他意外输出重定向到stderr，
+# 避免破坏JSON行，也不受 Windows 上 GBK 编码的影响
+PROTOCOL_OUT = sys.stdout.buffer
+sys.stdout = sys.stderr
 
 # 配置日志 - 降低日志级别，避免在 Windows 上出现编码问题
 # 只在严重错误时输出到 stderr，普通日志不输出（避免干扰 stdout 的 JSON 输出）
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+from utils import extract_visible_text, route_text_request
+
+# 可选：orjson在C中直接把结果编码为UTF-8字节
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 截图格式配置（独立进程中无法导入配置时使用默认值）
+try:
+    from config import SCREENSHOT_FORMAT, SCREENSHOT_QUALITY
+except ImportError:
+    SCREENSHOT_FORMAT = 'jpeg'
+    SCREENSHOT_QUALITY = 90
+SCREENSHOT_EXT = '.jpg' if SCREENSHOT_FORMAT == 'jpeg' else '.png'
+
+# 截图文件写入线程池：写盘与下一次滚动/截图的CDP往返并行
+_WRITE_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix='screenshot-writer')
+
+# 每个页面对应的CDP会话，页面关闭后自动释放
+_cdp_sessions = weakref.WeakKeyDictionary()
+
+# 文本交接文件目录（无法导入配置时使用系统临时目录）
+try:
+    from config import PLAYWRIGHT_HANDOFF_DIR
+except ImportError:
+    PLAYWRIGHT_HANDOFF_DIR = None
+
+# 超过该时长（秒）的交接文件视为遗留文件：主进程读取后会立即删除，
+# 只有工作进程在写出结果前后被强制终止时才会留下
+HANDOFF_STALE_AGE = 600
+
+# 资源拦截配置
+try:
+    from config import PLAYWRIGHT_BLOCK_RESOURCES
+except ImportError:
+    PLAYWRIGHT_BLOCK_RESOURCES = True
+
+# 浏览器启动参数（一次性模式与常驻模式共用）
+BROWSER_LAUNCH_ARGS = [
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--no-first-run',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-web-security',
+    '--disable-features=IsolateOrigins,site-per-process'
+]
+
+# 截图模式使用的视口；只提取文本时使用较小视口，减少Chromium的布局和绘制开销
+SCREENSHOT_VIEWPORT = {'width': 1920, 'height': 1080}
+TEXT_VIEWPORT = {'width': 1280, 'height': 800}
+
+def launch_browser(p):
+    """启动无头Chromium浏览器"""
+    return p.chromium.launch(headless=True, args=BROWSER_LAUNCH_ARGS)
+
+def new_context(browser):
+    """创建浏览器上下文"""
+    return browser.new_context(
+        viewport=SCREENSHOT_VIEWPORT,
+        user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        locale='en-US',
+        timezone_id='America/New_York',
+        java_script_enabled=True
+    )
+
 def run_playwright_task(url: str, scroll_enabled: bool = True, screenshot_mode: bool = False) -> dict:
     """
-    在独立进程中运行Playwright任务
+    在独立进程中运行Playwright任务（一次性模式：启动浏览器、处理单个URL后退出）
     
     Args:
         url: 要访问的URL
@@ -32,37 +108,68 @@ def run_playwright_task(url: str, scroll_enabled: bool = True, screenshot_mode:
     """
     try:
         from playwright.sync_api import sync_playwright
-        from bs4 import BeautifulSoup
         
+        with sync_playwright() as p:
+            browser = launch_browser(p)
+            try:
+                return process_url(browser, url, scroll_enabled, screenshot_mode)
+            finally:
+                browser.close()
+                
+    except Exception as e:
+        error_msg = f"Playwright处理失败: {str(e)}"
+        logger.error(error_msg)
+        return {
+            'success': False,
+            'content': None,
+            'error': error_msg,
+            'length': 0
+        }
+
+def wait_for_settle(page, timeout: int = 5000, settle: int = 200):
+    """
+    等待页面网络空闲（最多timeout毫秒），再短暂等待settle毫秒让渲染和动画完成
+    
+    替代固定时长的等待：大多数页面很快空闲，无需等满；超时则按原时长继续
+    """
+    try:
+        page.wait_for_load_state('networkidle', timeout=timeout)
+    except Exception:
+        pass
+    page.wait_for_timeout(settle)
+
+def process_url(browser, url: str, scroll_enabled: bool = True, screenshot_mode: bool = False) -> dict:
+    """
+    使用已启动的浏览器处理单个URL
+    
+    Args:
+        browser: 已启动的Playwright浏览器实例
+        url: 要访问的URL
+        scroll_enabled: 是否启用滚动加载
+        screenshot_mode: 是否启用截图模式
+        
+    Returns:
+        dict: {'success': bool, 'content': str, 'error': str, 'screenshots': list}
+    """
+    try:
         logger.info(f"Playwright Worker: 开始处理 {url}")
         
-        with sync_playwright() as p:
-            # 启动浏览器
-            browser = p.chromium.launch(
-                headless=True,
-                args=[
-                    '--no-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-gpu',
-                    '--no-first-run',
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-web-security',
-                    '--disable-features=IsolateOrigins,site-per-process'
-                ]
-            )
-            
-            # 创建浏览器上下文
-            context = browser.new_context(
-                viewport={'width': 1920, 'height': 1080},
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                locale='en-US',
-                timezone_id='America/New_York',
-                java_script_enabled=True
-            )
-            
+        # 每个URL使用独立的浏览器上下文（浏览器已启动时创建很快），结束后关闭，
+        # Cookie、localStorage、IndexedDB、Service Worker等状态不会带到其他URL
+        context = new_context(browser)
+        
+        try:
             # 创建新页面
             page = context.new_page()
             
+            # 只提取文本时缩小视口（截图模式保持上下文的默认视口）
+            if not screenshot_mode:
+                page.set_viewport_size(TEXT_VIEWPORT)
+            
+            # 只提取文本时拦截无关资源（截图模式需要加载图片和样式）
+            if PLAYWRIGHT_BLOCK_RESOURCES and not screenshot_mode:
+                page.route("**/*", route_text_request)
+            
             # 设置页面反检测
             page.add_init_script("""
                 Object.defineProperty(navigator, 'webdriver', {
@@ -82,22 +189,15 @@ def run_playwright_task(url: str, scroll_enabled: bool = True, screenshot_mode:
                 });
             """)
             
-            # 访问页面
-            logger.info(f"正在访问页面: {url}")
-            try:
-                page.goto(url, wait_until='domcontentloaded', timeout=30000)
-            except Exception as e:
-                logger.warning(f"初始页面加载超时（尝试继续）: {e}")
-            
-            # 使用智能页面加载检测
+            # 准备智能页面加载检测（在导航前确定等待策略）
+            smart_loader = None
             try:
                 from config import (USE_SMART_PAGE_LOADER, SMART_LOAD_INITIAL_WAIT,
                                   SMART_LOAD_MAX_WAIT, SMART_LOAD_STABILITY_INTERVAL,
                                   SMART_LOAD_STABILITY_THRESHOLD, SMART_LOAD_MIN_CONTENT_LENGTH,
-                                  SMART_LOAD_MAX_RETRIES)
+                                  SMART_LOAD_MAX_RETRIES, SMART_LOAD_IDLE_WINDOW_MS)
                 
                 if USE_SMART_PAGE_LOADER:
-                    logger.info("使用智能页面加载检测...")
                     from smart_page_loader import create_smart_loader
                     
                     smart_loader = create_smart_loader({
@@ -105,9 +205,28 @@ def run_playwright_task(url: str, scroll_enabled: bool = True, screenshot_mode:
                         'initial_wait': SMART_LOAD_INITIAL_WAIT,
                         'stability_check_interval': SMART_LOAD_STABILITY_INTERVAL,
                         'stability_threshold': SMART_LOAD_STABILITY_THRESHOLD,
-                        'min_content_length': SMART_LOAD_MIN_CONTENT_LENGTH
+                        'min_content_length': SMART_LOAD_MIN_CONTENT_LENGTH,
+                        'idle_window_ms': SMART_LOAD_IDLE_WINDOW_MS
                     })
-                    
+                    # 导航前安装网络活动计数脚本，初始等待在请求空闲后即可结束
+                    smart_loader.prepare_page(page)
+            except ImportError as e:
+                logger.warning(f"无法导入智能加载器（使用传统方式）: {e}")
+            
+            # 访问页面：导航只等到DOMContentLoaded，之后由智能加载器或有上限的网络空闲等待接手，
+            # 避免广告/长连接较多的页面在networkidle上卡满整个超时
+            logger.info(f"正在访问页面: {url}")
+            content_type = 'text/html'
+            try:
+                response = page.goto(url, wait_until='domcontentloaded', timeout=15000)
+                if response is not None:
+                    content_type = response.headers.get('content-type', content_type)
+            except Exception as e:
+                logger.warning(f"初始页面加载超时（尝试继续）: {e}")
+            
+            if smart_loader is not None:
+                try:
+                    logger.info("使用智能页面加载检测...")
                     load_result = smart_loader.wait_for_page_with_retry(
                         page, url, max_retries=SMART_LOAD_MAX_RETRIES
                     )
@@ -119,27 +238,17 @@ def run_playwright_task(url: str, scroll_enabled: bool = True, screenshot_mode:
                     if load_result['warnings']:
                         for warning in load_result['warnings']:
                             logger.warning(f"加载警告: {warning}")
-                else:
-                    # 使用传统方式等待
-                    logger.info("使用传统页面加载等待...")
-                    page.wait_for_load_state('networkidle', timeout=30000)
-                    page.wait_for_timeout(3000)
-            except ImportError as e:
-                logger.warning(f"无法导入智能加载器（使用传统方式）: {e}")
-                page.wait_for_load_state('networkidle', timeout=30000)
-                page.wait_for_timeout(3000)
-            except Exception as e:
-                logger.warning(f"智能加载检测失败（继续处理）: {e}")
-                page.wait_for_timeout(3000)
+                except Exception as e:
+                    logger.warning(f"智能加载检测失败（继续处理）: {e}")
+                    wait_for_settle(page)
+            else:
+                logger.info("使用传统页面加载等待...")
+                wait_for_settle(page)
             
-            # 如果是截图模式，执行截图
+            # 如果是截图模式，执行截图（页面已在上面等到稳定，不再额外等待）
             if screenshot_mode:
                 logger.info("进入截图模式...")
                 
-                # 额外等待页面完全加载（特别是动态内容）
-                logger.info("等待页面完全加载...")
-                page.wait_for_timeout(3000)  # 额外等待3秒
-                
                 # 尝试等待body可见（如果失败也继续）
                 try:
                     page.wait_for_selector('body', timeout=5000)
@@ -148,8 +257,6 @@ def run_playwright_task(url: str, scroll_enabled: bool = True, screenshot_mode:
                 
                 screenshot_paths = capture_screenshots(page, url)
                 
-                browser.close()
-                
                 if screenshot_paths:
                     logger.info(f"截图成功，共 {len(screenshot_paths)} 张")
                     return {
@@ -177,22 +284,7 @@ def run_playwright_task(url: str, scroll_enabled: bool = True, screenshot_mode:
             
             # 获取页面源码
             content = page.content()
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # 移除脚本和样式
-            for script in soup(["script", "style", "nav", "footer", "header"]):
-                script.decompose()
-            
-            # 提取主要文本内容
-            text = soup.get_text()
-            
-            # 清理文本
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
-            
-            # 关闭浏览器
-            browser.close()
+            text = extract_visible_text(content, content_type)
             
             logger.info(f"内容获取成功，长度: {len(text)} 字符")
             
@@ -202,7 +294,10 @@ def run_playwright_task(url: str, scroll_enabled: bool = True, screenshot_mode:
                 'error': None,
                 'length': len(text)
             }
-            
+        finally:
+            context.close()
+
+
     except Exception as e:
         error_msg = f"Playwright处理失败: {str(e)}"
         logger.error(error_msg)
@@ -213,64 +308,116 @@ def run_playwright_task(url: str, scroll_enabled: bool = True, screenshot_mode:
             'length': 0
         }
 
+
+# 读取当前滚动位置和页面高度
+SCROLL_STATE_JS = """
+() => ({
+    y: window.pageYOffset || document.documentElement.scrollTop,
+    h: document.documentElement.scrollHeight
+})
+"""
+
+# 读取PDF查看器页码指示器中的当前页码（无则返回null）
+# 指示器元素缓存在window上（页数检测时记住实际匹配的元素和选择器），
+# 只有被移出DOM后才用记住的选择器重新查询
+_READ_CURRENT_PAGE_JS = """
+    let indicator = window.__pageIndicator;
+    if (!indicator || !indicator.isConnected) {
+        indicator = document.querySelector(window.__pageIndicatorSelector || 'input[value*="/"]');
+        window.__pageIndicator = indicator;
+    }
+    const text = indicator ? (indicator.value || indicator.textContent || '') : '';
+    const match = text.match(/(\\d+)\\s*\\/\\s*\\d+/);
+    return match ? parseInt(match[1]) : null;
+"""
+
+CURRENT_PAGE_JS = "() => {" + _READ_CURRENT_PAGE_JS + "}"
+
+# 向下滚动并等待后读取当前页码
+SCROLL_BY_AND_PROBE_PAGE_JS = """
+async ([step, delay]) => {
+    window.scrollBy(0, step);
+    await new Promise(resolve => setTimeout(resolve, delay));
+""" + _READ_CURRENT_PAGE_JS + "}"
+
 def scroll_and_load(page):
     """滚动页面以加载所有动态内容"""
     try:
-        # 滚动参数
-        SCROLL_STEP = 500
-        SCROLL_DELAY = 1000
-        MAX_SCROLLS = 50
-        NO_NEW_CONTENT_THRESHOLD = 3
-        SCROLL_BUFFER = 1000
-        
-        # 获取页面高度
-        page_height = page.evaluate("document.body.scrollHeight")
-        logger.info(f"页面总高度: {page_height}px")
-        
-        current_position = 0
-        scroll_count = 0
-        no_new_content_count = 0
-        last_height = page_height
-        
-        while scroll_count < MAX_SCROLLS:
-            # 滚动到下一个位置
-            current_position += SCROLL_STEP
-            page.evaluate(f"window.scrollTo(0, {current_position})")
-            
-            # 等待内容加载
-            page.wait_for_timeout(SCROLL_DELAY)
-            
-            # 检查是否有新内容加载
-            new_height = page.evaluate("document.body.scrollHeight")
-            
-            if new_height > last_height:
-                logger.info(f"滚动到 {current_position}px，发现新内容 (高度: {last_height} -> {new_height})")
-                last_height = new_height
-                no_new_content_count = 0
-            else:
-                no_new_content_count += 1
-            
-            # 如果连续几次没有新内容，停止滚动
-            if no_new_content_count >= NO_NEW_CONTENT_THRESHOLD:
-                logger.info("连续多次无新内容，停止滚动")
-                break
-            
-            # 如果已经滚动到页面底部
-            if current_position >= new_height - SCROLL_BUFFER:
-                logger.info("已滚动到页面底部")
-                break
-            
-            scroll_count += 1
+        from smart_page_loader import scroll_to_load
         
-        # 滚动回顶部
-        page.evaluate("window.scrollTo(0, 0)")
-        page.wait_for_timeout(1000)
-        
-        logger.info(f"滚动完成，共滚动 {scroll_count} 次，最终页面高度: {last_height}px")
+        try:
+            from config import (SCROLL_STEP, SCROLL_DELAY, SCROLL_IDLE_MS, MAX_SCROLLS,
+                              NO_NEW_CONTENT_THRESHOLD, SCROLL_GROWTH_WINDOW, SCROLL_BUFFER)
+        except ImportError:
+            # 如果无法导入配置，使用默认值
+            SCROLL_STEP = 500
+            SCROLL_DELAY = 1000
+            SCROLL_IDLE_MS = 300
+            MAX_SCROLLS = 50
+            NO_NEW_CONTENT_THRESHOLD = 3
+            SCROLL_GROWTH_WINDOW = 8
+            SCROLL_BUFFER = 1000
+        
+        result = scroll_to_load(
+            page,
+            step=SCROLL_STEP,
+            max_scrolls=MAX_SCROLLS,
+            idle_ms=SCROLL_IDLE_MS,
+            max_wait_ms=SCROLL_DELAY,
+            no_growth_limit=NO_NEW_CONTENT_THRESHOLD,
+            growth_window=SCROLL_GROWTH_WINDOW,
+            buffer=SCROLL_BUFFER
+        )
+        
+        logger.info(f"滚动完成，共滚动 {result['scrolls']} 次，"
+                    f"页面高度: {result['initialHeight']}px -> {result['finalHeight']}px")
         
     except Exception as e:
         logger.warning(f"滚动加载过程中出错: {e}")
 
+def _get_cdp_session(page):
+    """
+    获取（并缓存）页面的CDP会话
+    
+    首次创建时一次性设置白色默认背景（JPEG没有透明通道），
+    之后同一页面的每次截图只需发送 Page.captureScreenshot
+    """
+    session = _cdp_sessions.get(page)
+    if session is None:
+        session = page.context.new_cdp_session(page)
+        try:
+            session.send('Emulation.setDefaultBackgroundColorOverride',
+                         {'color': {'r': 255, 'g': 255, 'b': 255, 'a': 1}})
+        except Exception as e:
+            logger.debug(f"设置截图背景色失败: {e}")
+        _cdp_sessions[page] = session
+    return session
+
+def capture_screenshot_bytes(page, full_page: bool = False) -> bytes:
+    """
+    截取页面并返回编码后的图片数据
+    
+    视口截图直接调用CDP的 Page.captureScreenshot（optimizeForSpeed），
+    省去Playwright封装中额外的布局测量往返；全页截图或CDP不可用时使用 page.screenshot
+    """
+    params = {'format': SCREENSHOT_FORMAT}
+    if SCREENSHOT_FORMAT == 'jpeg':
+        params['quality'] = SCREENSHOT_QUALITY
+    
+    if not full_page:
+        try:
+            cdp_params = dict(params, optimizeForSpeed=True, captureBeyondViewport=False)
+            data = _get_cdp_session(page).send('Page.captureScreenshot', cdp_params)['data']
+            return base64.b64decode(data)
+        except Exception as e:
+            logger.debug(f"CDP截图失败，改用page.screenshot: {e}")
+    
+    return page.screenshot(full_page=full_page, type=params['format'], quality=params.get('quality'))
+
+def save_screenshot(page, path, full_page: bool = False):
+    """截取页面并保存到指定路径"""
+    path.write_bytes(capture_screenshot_bytes(page, full_page))
+
 def capture_screenshots(page, url: str) -> list:
     """
     捕获页面截图（支持长页面分段截图和PDF多页截图）
@@ -283,24 +430,21 @@ def capture_screenshots(page, url: str) -> list:
         list: 截图文件路径列表
     """
     try:
-        import hashlib
         from pathlib import Path
-        from urllib.parse import urlparse
         
         # 获取配置
         try:
-            from config import SCREENSHOT_CACHE_DIR, SCREENSHOT_MAX_PAGES, SCREENSHOT_QUALITY
+            from config import SCREENSHOT_CACHE_DIR, SCREENSHOT_MAX_PAGES
         except ImportError:
             # 如果无法导入配置，使用默认值
             SCREENSHOT_CACHE_DIR = Path(__file__).parent / "cache" / "screenshots"
             SCREENSHOT_MAX_PAGES = 10
-            SCREENSHOT_QUALITY = 90
         
         # 确保截图目录存在
         SCREENSHOT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
         
         # 生成唯一文件名
-        url_hash = hashlib.md5(url.encode()).hexdigest()[:8]
+        url_hash = hashlib.blake2b(url.encode('utf-8'), digest_size=4).hexdigest()
         parsed_url = urlparse(url)
         domain = parsed_url.netloc.replace('.', '_')[:20]
         
@@ -324,9 +468,8 @@ def capture_screenshots(page, url: str) -> list:
         # 如果页面高度小于视口高度的1.5倍，只截一张图
         if page_height <= viewport_height * 1.5:
             logger.info("页面较短，截取单张全页截图")
-            screenshot_path = SCREENSHOT_CACHE_DIR / f"{domain}_{url_hash}_full.png"
-            # PNG格式不支持quality参数，改用type='png'
-            page.screenshot(path=str(screenshot_path), full_page=True, type='png')
+            screenshot_path = SCREENSHOT_CACHE_DIR / f"{domain}_{url_hash}_full{SCREENSHOT_EXT}"
+            save_screenshot(page, screenshot_path, full_page=True)
             screenshot_paths.append(str(screenshot_path))
             logger.info(f"截图已保存: {screenshot_path.name}")
         else:
@@ -337,12 +480,12 @@ def capture_screenshots(page, url: str) -> list:
             for i in range(num_screenshots):
                 # 滚动到对应位置
                 scroll_position = i * viewport_height
-                page.evaluate(f"window.scrollTo(0, {scroll_position})")
+                page.evaluate("y => window.scrollTo(0, y)", scroll_position)
                 page.wait_for_timeout(500)  # 等待内容加载
                 
-                # 截图（PNG格式不支持quality参数）
-                screenshot_path = SCREENSHOT_CACHE_DIR / f"{domain}_{url_hash}_{i:03d}.png"
-                page.screenshot(path=str(screenshot_path), type='png')
+                # 截图
+                screenshot_path = SCREENSHOT_CACHE_DIR / f"{domain}_{url_hash}_{i:03d}{SCREENSHOT_EXT}"
+                save_screenshot(page, screenshot_path)
                 screenshot_paths.append(str(screenshot_path))
                 logger.info(f"已截图第 {i+1}/{num_screenshots} 张: {screenshot_path.name}")
             
@@ -380,7 +523,7 @@ def capture_pdf_viewer_screenshots(page, domain: str, url_hash: str, cache_dir,
         screenshot_paths = []
         
         # 等待PDF查看器加载
-        page.wait_for_timeout(2000)
+        wait_for_settle(page, timeout=2000)
         
         # 尝试查找并切换到iframe（腾讯文档可能使用iframe）
         try:
@@ -464,20 +607,21 @@ def capture_pdf_viewer_screenshots(page, domain: str, url_hash: str, cache_dir,
                         'input[type="text"][value*="/"]'
                     ];
                     
+                    const pattern = /(\\d+)\\s*\\/\\s*(\\d+)/;
+                    
                     for (const selector of selectors) {
                         const element = document.querySelector(selector);
-                        if (element && element.textContent) {
-                            const match = element.textContent.match(/(\\d+)\\s*\\/\\s*(\\d+)/);
-                            if (match) {
-                                return {current: parseInt(match[1]), total: parseInt(match[2])};
-                            }
+                        if (!element) {
+                            continue;
                         }
-                        // 也检查value属性
-                        if (element && element.value) {
-                            const match = element.value.match(/(\\d+)\\s*\\/\\s*(\\d+)/);
-                            if (match) {
-                                return {current: parseInt(match[1]), total: parseInt(match[2])};
-                            }
+                        // 依次检查文本内容和value属性
+                        const match = (element.textContent || '').match(pattern) ||
+                                      (element.value || '').match(pattern);
+                        if (match) {
+                            // 记住匹配的元素和选择器，之后每次滚动只读取该元素
+                            window.__pageIndicator = element;
+                            window.__pageIndicatorSelector = selector;
+                            return {selector, current: parseInt(match[1]), total: parseInt(match[2])};
                         }
                     }
                     return null;
@@ -486,7 +630,7 @@ def capture_pdf_viewer_screenshots(page, domain: str, url_hash: str, cache_dir,
             
             if page_indicator and page_indicator.get('total'):
                 total_pages = min(page_indicator['total'], max_pages)
-                logger.info(f"检测到PDF共 {page_indicator['total']} 页，将截取前 {total_pages} 页")
+                logger.info(f"检测到PDF共 {page_indicator['total']} 页（{page_indicator.get('selector')}），将截取前 {total_pages} 页")
             else:
                 total_pages = 1
                 logger.info("未能检测到页数，默认截取1页")
@@ -555,15 +699,7 @@ def capture_pdf_viewer_screenshots(page, domain: str, url_hash: str, cache_dir,
                         # 验证翻页是否成功
                         if page_turned:
                             try:
-                                current_page = page.evaluate("""
-                                    () => {
-                                        const input = document.querySelector('input[value*="/"]');
-                                        if (input && input.value) {
-                                            return parseInt(input.value.split('/')[0]);
-                                        }
-                                        return null;
-                                    }
-                                """)
+                                current_page = page.evaluate(CURRENT_PAGE_JS)
                                 
                                 next_page_num = page_num + 1
                                 if current_page == next_page_num:
@@ -606,6 +742,7 @@ def scroll_and_capture_page(page, cache_dir, domain: str, url_hash: str, page_nu
         list: 截图文件路径列表
     """
     screenshots = []
+    pending_writes = []
     
     try:
         # 获取视口高度
@@ -619,61 +756,58 @@ def scroll_and_capture_page(page, cache_dir, domain: str, url_hash: str, page_nu
         last_scroll_pos = -1
         
         scroll_count = 0
+        last_digest = None
         
         while scroll_count < max_scrolls:
-            # 截取当前视口
-            screenshot_path = cache_dir / f"{domain}_{url_hash}_page{page_num}_{scroll_count}.png"
-            page.screenshot(path=str(screenshot_path), type='png', full_page=False)
-            screenshots.append(str(screenshot_path))
-            logger.debug(f"第 {page_num} 页截图 {scroll_count}: {screenshot_path.name}")
+            # 截取当前视口；与上一张完全相同时不写入文件
+            data = capture_screenshot_bytes(page)
+            digest = hashlib.blake2b(data, digest_size=8).digest()
+            image_unchanged = digest == last_digest
+            if image_unchanged:
+                logger.debug(f"第 {page_num} 页截图 {scroll_count} 与上一张相同，跳过保存")
+            else:
+                last_digest = digest
+                screenshot_path = cache_dir / f"{domain}_{url_hash}_page{page_num}_{scroll_count}{SCREENSHOT_EXT}"
+                pending_writes.append((str(screenshot_path), _WRITE_POOL.submit(screenshot_path.write_bytes, data)))
+                screenshots.append(str(screenshot_path))
+                logger.debug(f"第 {page_num} 页截图 {scroll_count}: {screenshot_path.name}")
             
-            # 获取当前滚动位置
+            # 获取当前滚动位置和页面高度（一次往返）
             try:
-                current_scroll_pos = page.evaluate("window.pageYOffset || document.documentElement.scrollTop")
-                page_height = page.evaluate("document.documentElement.scrollHeight")
+                state = page.evaluate(SCROLL_STATE_JS)
+                current_scroll_pos = state['y']
+                page_height = state['h']
                 
                 # 检查是否到达底部
                 if current_scroll_pos + viewport_height >= page_height - 50:
                     logger.info(f"第 {page_num} 页已到达底部")
                     break
                 
-                # 检查滚动位置是否变化
-                if current_scroll_pos == last_scroll_pos:
-                    no_change_count += 1
-                    if no_change_count >= no_change_threshold:
-                        logger.info(f"第 {page_num} 页滚动位置连续{no_change_threshold}次未变化，停止滚动")
-                        break
-                else:
-                    no_change_count = 0
-                    last_scroll_pos = current_scroll_pos
+                position_unchanged = current_scroll_pos == last_scroll_pos
+                last_scroll_pos = current_scroll_pos
                 
             except Exception as e:
                 logger.warning(f"获取滚动信息失败: {e}")
+                position_unchanged = False
+            
+            # 检查滚动位置或截图内容是否变化
+            if position_unchanged or image_unchanged:
+                no_change_count += 1
+                if no_change_count >= no_change_threshold:
+                    logger.info(f"第 {page_num} 页滚动位置或截图连续{no_change_threshold}次未变化，停止滚动")
+                    break
+            else:
+                no_change_count = 0
             
-            # 向下滚动
+            # 向下滚动，等待后顺带读取当前页码（一次往返）
             try:
-                page.evaluate(f"window.scrollBy(0, {scroll_step})")
-                page.wait_for_timeout(400)
+                current_page = page.evaluate(SCROLL_BY_AND_PROBE_PAGE_JS, [scroll_step, 400])
                 scroll_count += 1
                 
                 # 检查是否翻页了
-                if page_num < total_pages:
-                    try:
-                        current_page = page.evaluate("""
-                            () => {
-                                const input = document.querySelector('input[value*="/"]');
-                                if (input && input.value) {
-                                    return parseInt(input.value.split('/')[0]);
-                                }
-                                return null;
-                            }
-                        """)
-                        
-                        if current_page and current_page > page_num:
-                            logger.info(f"滚动时翻到第{current_page}页，停止当前页截图")
-                            break
-                    except Exception:
-                        pass
+                if page_num < total_pages and current_page and current_page > page_num:
+                    logger.info(f"滚动时翻到第{current_page}页，停止当前页截图")
+                    break
                         
             except Exception as e:
                 logger.warning(f"滚动失败: {e}")
@@ -687,15 +821,124 @@ def scroll_and_capture_page(page, cache_dir, domain: str, url_hash: str, page_nu
         # 至少返回一张截图
         if not screenshots:
             try:
-                screenshot_path = cache_dir / f"{domain}_{url_hash}_page{page_num}_0.png"
-                page.screenshot(path=str(screenshot_path), type='png', full_page=False)
+                screenshot_path = cache_dir / f"{domain}_{url_hash}_page{page_num}_0{SCREENSHOT_EXT}"
+                save_screenshot(page, screenshot_path)
                 screenshots.append(str(screenshot_path))
             except Exception:
                 pass
         return screenshots
+    
+    finally:
+        # 返回前等待后台写入完成，并从结果中去掉写入失败的截图
+        for path, future in pending_writes:
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning(f"保存截图失败: {path}: {e}")
+                screenshots.remove(path)
+
+def handoff_content(result: dict) -> dict:
+    """
+    将页面文本写入交接目录中的临时文件，结果中只保留文件路径和长度
+    
+    避免大段文本经过管道传输和JSON转义，由主进程读取后删除该文件
+    """
+    content = result.get('content')
+    if not result.get('success') or not content:
+        return result
+    try:
+        if PLAYWRIGHT_HANDOFF_DIR is not None:
+            PLAYWRIGHT_HANDOFF_DIR.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.txt', prefix='playwright_',
+                                         dir=PLAYWRIGHT_HANDOFF_DIR, delete=False) as f:
+            f.write(content)
+        result = dict(result, content=None, path=f.name)
+    except Exception as e:
+        logger.error(f"写入临时文件失败，改为直接输出内容: {e}")
+    return result
+
+def cleanup_stale_handoff_files():
+    """
+    删除交接目录中遗留的 playwright_*.txt 文件（工作进程启动时调用）
+    
+    多个工作进程共用该目录，只删除超过 HANDOFF_STALE_AGE 的文件，不影响其他进程正在交接的文件
+    """
+    if PLAYWRIGHT_HANDOFF_DIR is None or not PLAYWRIGHT_HANDOFF_DIR.exists():
+        return
+    cutoff = time.time() - HANDOFF_STALE_AGE
+    for path in PLAYWRIGHT_HANDOFF_DIR.glob('playwright_*.txt'):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+def write_json_line(stream, result: dict):
+    """向二进制输出流写出一行JSON结果"""
+    data = None
+    if ORJSON_AVAILABLE:
+        try:
+            data = orjson.dumps(result)
+        except TypeError:
+            pass
+    if data is None:
+        data = json.dumps(result, ensure_ascii=False).encode('utf-8')
+    stream.write(data + b'\n')
+    stream.flush()
+
+def serve():
+    """
+    常驻模式：浏览器只启动一次，从stdin逐行读取JSON请求，向stdout逐行写出JSON结果
+    
+    请求格式: {"url": str, "scroll_enabled": bool, "screenshot_mode": bool}
+    """
+    from playwright.sync_api import sync_playwright
+    
+    protocol_in = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    cleanup_stale_handoff_files()
+    
+    with sync_playwright() as p:
+        browser = launch_browser(p)
+        try:
+            for line in protocol_in:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    request = json.loads(line)
+                    result = process_url(
+                        browser,
+                        request['url'],
+                        request.get('scroll_enabled', True),
+                        request.get('screenshot_mode', False)
+                    )
+                except Exception as e:
+                    result = {
+                        'success': False,
+                        'content': None,
+                        'error': f"无效请求: {str(e)}",
+                        'length': 0
+                    }
+                
+                # 浏览器意外断开时重新启动，保证后续请求可用
+                if not browser.is_connected():
+                    logger.error("浏览器连接已断开，重新启动")
+                    browser = launch_browser(p)
+                
+                write_json_line(PROTOCOL_OUT, handoff_content(result))
+        finally:
+            try:
+                browser.close()
+            except Exception:
+                pass
 
 if __name__ == "__main__":
-    # 从命令行参数获取URL
+    # 常驻模式：由 PlaywrightProcessManager 启动并通过 stdin/stdout 通信
+    if len(sys.argv) > 1 and sys.argv[1] == '--serve':
+        serve()
+        sys.exit(0)
+    
+    # 一次性模式：从命令行参数获取URL
     if len(sys.argv) < 2:
         result = {
             'success': False,
@@ -710,5 +953,5 @@ if __name__ == "__main__":
         result = run_playwright_task(url, scroll_enabled, screenshot_mode)
     
     # 输出JSON结果
-    print(json.dumps(result, ensure_ascii=False))
+    write_json_line(PROTOCOL_OUT, handoff_content(result))
 
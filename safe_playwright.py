@@ -1,235 +1,355 @@
 """
 安全的Playwright包装器 - 避免异步冲突，支持滚动加载
 """
+import os
 import logging
+import queue
 import threading
-import time
+import itertools
+import multiprocessing
 from typing import Optional
-from bs4 import BeautifulSoup
+
+from utils import extract_visible_text, route_text_request
 
 logger = logging.getLogger(__name__)
 
+# 页面反检测脚本（每个上下文安装一次，对其中所有页面生效）
+STEALTH_INIT_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined,
+    });
+    
+    delete navigator.__proto__.webdriver;
+"""
+
+# 浏览器进程通过结果队列发送的消息：(事件, request_id, 进程pid, 内容)
+# ready: 启动完成；error: 启动或运行出错（内容为错误信息）；done: 请求完成（内容为页面文本）
+_EVENT_READY = 'ready'
+_EVENT_ERROR = 'error'
+_EVENT_DONE = 'done'
+
+# 结果分发线程检查浏览器进程存活状态的间隔（秒）
+_PROCESS_CHECK_INTERVAL = 1.0
+# 浏览器进程意外退出后最多重新启动的次数（防止浏览器无法启动时反复重启）
+_MAX_RESTARTS = 3
+
+def _scroll_and_load_content(page):
+    """滚动页面以加载所有动态内容"""
+    try:
+        from smart_page_loader import scroll_to_load
+        
+        # 导入配置参数
+        try:
+            from config import (SCROLL_STEP, SCROLL_DELAY, SCROLL_IDLE_MS, MAX_SCROLLS,
+                              NO_NEW_CONTENT_THRESHOLD, SCROLL_GROWTH_WINDOW, SCROLL_BUFFER)
+        except ImportError:
+            # 如果无法导入配置，使用默认值
+            SCROLL_STEP = 500
+            SCROLL_DELAY = 1000
+            SCROLL_IDLE_MS = 300
+            MAX_SCROLLS = 50
+            NO_NEW_CONTENT_THRESHOLD = 3
+            SCROLL_GROWTH_WINDOW = 8
+            SCROLL_BUFFER = 1000
+        
+        logger.info(f"滚动参数: 步长={SCROLL_STEP}px, 最长等待={SCROLL_DELAY}ms, 最大次数={MAX_SCROLLS}")
+        
+        # 整个滚动循环在浏览器内执行，只需一次往返
+        result = scroll_to_load(
+            page,
+            step=SCROLL_STEP,
+            max_scrolls=MAX_SCROLLS,
+            idle_ms=SCROLL_IDLE_MS,
+            max_wait_ms=SCROLL_DELAY,
+            no_growth_limit=NO_NEW_CONTENT_THRESHOLD,
+            growth_window=SCROLL_GROWTH_WINDOW,
+            buffer=SCROLL_BUFFER
+        )
+        
+        logger.info(f"滚动完成，共滚动 {result['scrolls']} 次，"
+                    f"页面高度: {result['initialHeight']}px -> {result['finalHeight']}px")
+    
+    except Exception as e:
+        logger.warning(f"滚动加载过程中出错: {e}")
+        # 即使滚动失败，也继续获取内容
+
+def _fetch_page_text(context, url: str) -> Optional[str]:
+    """在给定上下文中打开页面，滚动加载后提取正文文本"""
+    page = None
+    try:
+        logger.info(f"使用Playwright获取页面内容: {url}")
+        page = context.new_page()
+        
+        # 访问页面：只等到DOMContentLoaded，再最多等待5秒网络空闲（超时则直接继续）
+        page.goto(url, wait_until='domcontentloaded', timeout=15000)
+        try:
+            page.wait_for_load_state('networkidle', timeout=5000)
+        except Exception:
+            pass
+        
+        # 执行滚动加载策略
+        logger.info("开始滚动页面以加载所有动态内容...")
+        _scroll_and_load_content(page)
+        
+        # 获取页面源码
+        content = page.content()
+        
+        # 移除脚本、样式等标签并提取主要文本内容
+        text = extract_visible_text(content)
+        
+        logger.info(f"Playwright页面内容获取成功，长度: {len(text)} 字符")
+        return text
+    
+    except Exception as e:
+        logger.warning(f"Playwright获取页面内容失败 {url}: {e}")
+        return None
+    finally:
+        if page is not None:
+            try:
+                page.close()
+            except Exception:
+                pass
+
+def _browser_worker(req_q, res_q):
+    """
+    浏览器进程：独占Playwright同步API（只在创建它的线程中使用），
+    从 req_q 逐个读取 (request_id, url)，把处理进度和结果写入 res_q；读到None时退出
+    """
+    pid = os.getpid()
+    try:
+        from playwright.sync_api import sync_playwright
+        from config import PLAYWRIGHT_BLOCK_RESOURCES
+        
+        playwright = sync_playwright().start()
+    except Exception as e:
+        res_q.put((_EVENT_ERROR, None, pid, str(e)))
+        return
+    
+    browser = None
+    try:
+        browser = playwright.chromium.launch(
+            headless=True,
+            args=[
+                '--no-sandbox',
+                '--disable-dev-shm-usage',
+                '--disable-gpu',
+                '--no-first-run',
+                '--disable-blink-features=AutomationControlled'
+            ]
+        )
+        
+        # 反检测脚本和请求拦截在上下文上只设置一次
+        context = browser.new_context(
+            viewport={'width': 1920, 'height': 1080},
+            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            locale='en-US',
+            timezone_id='America/New_York'
+        )
+        context.add_init_script(STEALTH_INIT_SCRIPT)
+        
+        # 只提取文本：拦截图片、媒体、字体、样式表和广告追踪请求
+        if PLAYWRIGHT_BLOCK_RESOURCES:
+            context.route("**/*", route_text_request)
+        
+        res_q.put((_EVENT_READY, None, pid, None))
+        
+        for request_id, url in iter(req_q.get, None):
+            res_q.put((_EVENT_DONE, request_id, pid, _fetch_page_text(context, url)))
+    
+    except Exception as e:
+        res_q.put((_EVENT_ERROR, None, pid, str(e)))
+    finally:
+        if browser is not None:
+            try:
+                browser.close()
+            except Exception:
+                pass
+        playwright.stop()
+
 class SafePlaywrightWrapper:
-    """安全的Playwright包装器，避免异步冲突"""
+    """
+    安全的Playwright包装器，避免异步冲突
+    
+    浏览器运行在独立进程中（Playwright同步API不能跨线程使用），
+    任意线程都可以并发提交URL，由后台线程按请求ID分发结果，并替换意外退出的浏览器进程。
+    进程使用spawn方式启动：本进程已运行日志和工作线程，fork出的子进程可能卡在fork时被占用的锁上
+    """
     
     def __init__(self):
-        self.playwright = None
-        self.browser = None
-        self.context = None
+        self._ctx = multiprocessing.get_context('spawn')
+        self._processes = []
+        self._req_queues = {}  # 浏览器进程pid -> 该进程的请求队列
+        self._assigned = {}  # 浏览器进程pid -> 已分配给该进程、尚未完成的request_id集合
+        self._restarts = 0
+        self._broken = False  # 所有浏览器进程均已退出且不再重启
+        self._res_q = None
+        self._dispatcher = None
+        self._pending = {}  # request_id -> 等待结果的队列
+        self._pending_lock = threading.Lock()  # 同时保护进程列表及各进程的分配记录
+        self._request_ids = itertools.count()
         self._lock = threading.Lock()
         self._initialized = False
-        
+    
     def _safe_init(self):
-        """在独立线程中安全初始化Playwright"""
+        """启动浏览器进程并等待其就绪"""
         if self._initialized:
             return True
-            
+        
         with self._lock:
             if self._initialized:
                 return True
-                
+            
             try:
-                logger.info("尝试在独立线程中初始化Playwright...")
+                from config import PLAYWRIGHT_WORKER_PROCESSES
                 
-                # 用于存储初始化结果的容器
-                result_container = {'playwright': None, 'browser': None, 'context': None, 'error': None}
+                logger.info("尝试在独立进程中初始化Playwright...")
                 
-                # 在独立线程中初始化，避免异步冲突
-                def init_playwright_in_thread():
-                    try:
-                        from playwright.sync_api import sync_playwright
-                        
-                        playwright = sync_playwright().start()
-                        browser = playwright.chromium.launch(
-                            headless=True,
-                            args=[
-                                '--no-sandbox',
-                                '--disable-dev-shm-usage',
-                                '--disable-gpu',
-                                '--no-first-run',
-                                '--disable-blink-features=AutomationControlled'
-                            ]
-                        )
-                        
-                        context = browser.new_context(
-                            viewport={'width': 1920, 'height': 1080},
-                            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                            locale='en-US',
-                            timezone_id='America/New_York'
-                        )
-                        
-                        result_container['playwright'] = playwright
-                        result_container['browser'] = browser
-                        result_container['context'] = context
-                        
-                    except Exception as e:
-                        result_container['error'] = str(e)
-                        logger.error(f"Playwright初始化失败: {e}")
+                self._res_q = self._ctx.Queue()
+                for _ in range(max(1, PLAYWRIGHT_WORKER_PROCESSES)):
+                    self._start_process()
                 
-                # 创建并启动独立线程
-                init_thread = threading.Thread(target=init_playwright_in_thread, daemon=True)
-                init_thread.start()
-                
-                # 等待线程完成（最多等待10秒）
-                init_thread.join(timeout=10)
-                
-                if init_thread.is_alive():
-                    logger.error("Playwright初始化超时")
-                    return False
-                
-                if result_container['error']:
-                    logger.warning(f"Playwright初始化失败: {result_container['error']}")
-                    logger.info("将使用基础HTTP请求作为备选方案")
-                    return False
-                
-                if result_container['playwright'] is not None:
-                    self.playwright = result_container['playwright']
-                    self.browser = result_container['browser']
-                    self.context = result_container['context']
-                    self._initialized = True
-                    logger.info("✅ Playwright在独立线程中初始化成功")
-                    return True
-                else:
-                    logger.warning("Playwright初始化失败，将使用基础HTTP请求")
-                    return False
+                # 等待每个浏览器进程报告启动结果（最多等待30秒）
+                for _ in self._processes:
+                    try:
+                        _, _, _, error = self._res_q.get(timeout=30)
+                    except queue.Empty:
+                        logger.error("Playwright初始化超时")
+                        self._shutdown()
+                        return False
                     
+                    if error:
+                        logger.warning(f"Playwright初始化失败: {error}")
+                        logger.info("将使用基础HTTP请求作为备选方案")
+                        self._shutdown()
+                        return False
+                
+                self._dispatcher = threading.Thread(target=self._dispatch_results, daemon=True,
+                                                    name="safe-playwright-results")
+                self._dispatcher.start()
+                self._initialized = True
+                logger.info(f"✅ Playwright在独立进程中初始化成功（{len(self._processes)} 个浏览器进程）")
+                return True
+            
             except Exception as e:
                 logger.error(f"Playwright安全初始化失败: {e}")
+                self._shutdown()
                 return False
     
-    def get_page_content(self, url: str) -> Optional[str]:
-        """获取页面内容（带滚动加载）"""
+    def _start_process(self):
+        """启动一个浏览器进程（每个进程使用独立的请求队列，进程退出时可知道哪些请求已丢失）"""
+        req_q = self._ctx.Queue()
+        process = self._ctx.Process(target=_browser_worker, args=(req_q, self._res_q),
+                                    daemon=True, name="safe-playwright-browser")
+        process.start()
+        with self._pending_lock:
+            self._processes.append(process)
+            self._req_queues[process.pid] = req_q
+            self._assigned[process.pid] = set()
+    
+    def _dispatch_results(self):
+        """后台线程：把浏览器进程返回的结果交给对应请求（已超时的请求直接丢弃），并检查进程存活"""
+        while True:
+            try:
+                message = self._res_q.get(timeout=_PROCESS_CHECK_INTERVAL)
+            except queue.Empty:
+                message = ()
+            if message is None:
+                break
+            if message:
+                event, request_id, pid, payload = message
+                if event == _EVENT_DONE:
+                    with self._pending_lock:
+                        self._assigned.get(pid, set()).discard(request_id)
+                    self._resolve(request_id, payload)
+                elif event == _EVENT_ERROR:
+                    logger.error(f"Playwright浏览器进程 {pid} 出错: {payload}")
+                elif event == _EVENT_READY:
+                    logger.info(f"Playwright浏览器进程 {pid} 已就绪")
+            self._check_processes()
+    
+    def _resolve(self, request_id, text):
+        """把结果交给等待中的请求"""
+        with self._pending_lock:
+            waiter = self._pending.pop(request_id, None)
+        if waiter is not None:
+            waiter.put(text)
+    
+    def _check_processes(self):
+        """意外退出的浏览器进程：让分配给它的请求立即失败，并在重启次数内启动新进程替换"""
+        for process in [p for p in self._processes if not p.is_alive()]:
+            logger.error(f"Playwright浏览器进程 {process.pid} 意外退出（退出码 {process.exitcode}）")
+            with self._pending_lock:
+                self._processes.remove(process)
+                self._req_queues.pop(process.pid, None)
+                lost = self._assigned.pop(process.pid, set())
+            for request_id in lost:
+                self._resolve(request_id, None)
+            if self._restarts < _MAX_RESTARTS:
+                self._restarts += 1
+                self._start_process()
+                logger.info(f"已启动新的Playwright浏览器进程（第 {self._restarts} 次重启）")
+        
+        if not self._processes and not self._broken:
+            # 没有可用的浏览器进程：等待中和之后的请求都立即失败，不再等到超时
+            logger.error("没有可用的Playwright浏览器进程，后续请求将直接返回失败")
+            with self._pending_lock:
+                self._broken = True
+                waiters = list(self._pending.values())
+                self._pending.clear()
+            for waiter in waiters:
+                waiter.put(None)
+    
+    def get_page_content(self, url: str, timeout: int = 60) -> Optional[str]:
+        """获取页面内容（带滚动加载），请求分配给未完成请求最少的浏览器进程"""
         if not self._safe_init():
             return None
-            
+        
+        request_id = next(self._request_ids)
+        waiter = queue.Queue(maxsize=1)
+        with self._pending_lock:
+            if self._broken or not self._processes:
+                return None
+            process = min(self._processes, key=lambda p: len(self._assigned[p.pid]))
+            self._assigned[process.pid].add(request_id)
+            req_q = self._req_queues[process.pid]
+            self._pending[request_id] = waiter
+        
         try:
-            logger.info(f"使用Playwright获取页面内容: {url}")
-            page = self.context.new_page()
-            
-            # 设置页面反检测
-            page.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined,
-                });
-                
-                delete navigator.__proto__.webdriver;
-            """)
-            
-            # 访问页面
-            page.goto(url, wait_until='networkidle', timeout=30000)
-            
-            # 等待页面完全加载
-            page.wait_for_timeout(3000)
-            
-            # 执行滚动加载策略
-            logger.info("开始滚动页面以加载所有动态内容...")
-            self._scroll_and_load_content(page)
-            
-            # 获取页面源码
-            content = page.content()
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # 移除脚本和样式
-            for script in soup(["script", "style", "nav", "footer", "header"]):
-                script.decompose()
-            
-            # 提取主要文本内容
-            text = soup.get_text()
-            
-            # 清理文本
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = ' '.join(chunk for chunk in chunks if chunk)
-            
-            page.close()
-            logger.info(f"Playwright页面内容获取成功，长度: {len(text)} 字符")
-            return text
-            
-        except Exception as e:
-            logger.warning(f"Playwright获取页面内容失败 {url}: {e}")
+            req_q.put((request_id, url))
+            return waiter.get(timeout=timeout)
+        except queue.Empty:
+            logger.warning(f"Playwright获取页面内容超时 ({timeout}秒): {url}")
             return None
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
     
-    def _scroll_and_load_content(self, page):
-        """滚动页面以加载所有动态内容"""
-        try:
-            # 导入配置参数
-            try:
-                from config import (SCROLL_STEP, SCROLL_DELAY, MAX_SCROLLS, 
-                                  NO_NEW_CONTENT_THRESHOLD, SCROLL_BUFFER)
-            except ImportError:
-                # 如果无法导入配置，使用默认值
-                SCROLL_STEP = 500
-                SCROLL_DELAY = 1000
-                MAX_SCROLLS = 50
-                NO_NEW_CONTENT_THRESHOLD = 3
-                SCROLL_BUFFER = 1000
-            
-            # 获取页面高度
-            page_height = page.evaluate("document.body.scrollHeight")
-            logger.info(f"页面总高度: {page_height}px")
-            logger.info(f"滚动参数: 步长={SCROLL_STEP}px, 延迟={SCROLL_DELAY}ms, 最大次数={MAX_SCROLLS}")
-            
-            current_position = 0
-            scroll_count = 0
-            no_new_content_count = 0
-            last_height = page_height
-            
-            while scroll_count < MAX_SCROLLS:
-                # 滚动到下一个位置
-                current_position += SCROLL_STEP
-                page.evaluate(f"window.scrollTo(0, {current_position})")
-                
-                # 等待内容加载
-                page.wait_for_timeout(SCROLL_DELAY)
-                
-                # 检查是否有新内容加载
-                new_height = page.evaluate("document.body.scrollHeight")
-                
-                if new_height > last_height:
-                    logger.info(f"滚动到 {current_position}px，发现新内容 (高度: {last_height} -> {new_height})")
-                    last_height = new_height
-                    no_new_content_count = 0
-                else:
-                    no_new_content_count += 1
-                    logger.info(f"滚动到 {current_position}px，无新内容 ({no_new_content_count}/{NO_NEW_CONTENT_THRESHOLD})")
-                
-                # 如果连续几次没有新内容，停止滚动
-                if no_new_content_count >= NO_NEW_CONTENT_THRESHOLD:
-                    logger.info("连续多次无新内容，停止滚动")
-                    break
-                
-                # 如果已经滚动到页面底部
-                if current_position >= new_height - SCROLL_BUFFER:
-                    logger.info("已滚动到页面底部")
-                    break
-                
-                scroll_count += 1
-            
-            # 滚动回顶部
-            page.evaluate("window.scrollTo(0, 0)")
-            page.wait_for_timeout(1000)
-            
-            logger.info(f"滚动完成，共滚动 {scroll_count} 次，最终页面高度: {last_height}px")
-            
-        except Exception as e:
-            logger.warning(f"滚动加载过程中出错: {e}")
-            # 即使滚动失败，也继续获取内容
+    def _shutdown(self):
+        """通知浏览器进程退出并等待结束，超时则强制终止"""
+        if self._dispatcher is not None:
+            # 先结束结果分发线程，避免把正常退出的进程当作意外退出而重启
+            self._res_q.put(None)
+            self._dispatcher.join(timeout=5)
+            self._dispatcher = None
+        for req_q in self._req_queues.values():
+            req_q.put(None)
+        for process in self._processes:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+        self._req_queues = {}
+        self._assigned = {}
+        self._restarts = 0
+        self._broken = False
+        self._initialized = False
     
     def close(self):
         """关闭浏览器"""
-        if self.browser:
-            try:
-                self.browser.close()
+        with self._lock:
+            if self._processes:
+                self._shutdown()
                 logger.info("Playwright浏览器已关闭")
-            except Exception as e:
-                logger.warning(f"关闭Playwright浏览器时出错: {e}")
-        
-        if self.playwright:
-            try:
-                self.playwright.stop()
-                logger.info("Playwright已停止")
-            except Exception as e:
-                logger.warning(f"停止Playwright时出错: {e}")
 
 # 全局实例
 _safe_playwright = None
@@ -1,13 +1,226 @@
 """
 截图OCR提取器 - 从截图图像中提取文本内容
 """
+import os
+import re
 import logging
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
 from typing import Optional, List
 import io
 
+import numpy as np
+
+from config import (OCR_LANGUAGE, OCR_TESSERACT_CONFIG, OCR_WORKERS, OCR_TIMEOUT, OCR_DOWNSCALE_WIDTH,
+                    OCR_BLANK_VARIANCE, SCREENSHOT_CLEANUP_AFTER_USE)
+from utils import normalize_text
+
 logger = logging.getLogger(__name__)
 
+# OCR依赖（未安装时由 ScreenshotOCRFetcher 报告OCR不可用）
+try:
+    import pytesseract
+    from PIL import Image, ImageEnhance, ImageStat
+    OCR_LIBS_AVAILABLE = True
+    _OCR_IMPORT_ERROR = None
+except ImportError as e:
+    OCR_LIBS_AVAILABLE = False
+    _OCR_IMPORT_ERROR = e
+
+# 可选：OpenCV预处理（二值化），未安装时退回PIL
+try:
+    import cv2
+    CV2_AVAILABLE = True
+except ImportError:
+    CV2_AVAILABLE = False
+
+_IS_WINDOWS = platform.system() == 'Windows'
+
+# Windows上Tesseract的常见安装位置
+WINDOWS_TESSERACT_PATHS = (
+    r'C:\Program Files\Tesseract-OCR\tesseract.exe',
+    r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
+    r'C:\Tesseract-OCR\tesseract.exe',
+)
+
+def _find_tesseract() -> Optional[str]:
+    """在Windows常见安装位置查找Tesseract，未找到时返回None（使用PATH中的tesseract）"""
+    if not _IS_WINDOWS:
+        return None
+    for path in WINDOWS_TESSERACT_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+# 模块导入时查找一次并设置
+_TESSERACT_CMD = _find_tesseract()
+if OCR_LIBS_AVAILABLE and _TESSERACT_CMD:
+    pytesseract.pytesseract.tesseract_cmd = _TESSERACT_CMD
+
+# 要过滤的UI元素关键词（常见的PDF查看器/编辑器UI文本），按子串匹配
+UI_KEYWORDS = (
+    'view only', 'scroll', 'rotate', 'edit', 'split', 'merge', 'extract text',
+    'pdf to word', 'pdf to image', 'ai podcast', 'all translate', 'adjust page',
+    'file compress', 'shortcut tools', 'print', 'thumbnail', 'outline',
+    'zoom in', 'zoom out', 'next page', 'previous page', 'download', 'share',
+    'annotation', 'highlight', 'comment', 'save', 'export', 'upload'
+)
+
+# 短行中出现时仍保留的关键词
+KEEP_KEYWORDS = ('phd', 'university', 'email', 'deadline', 'position', 'research', 'doctor')
+
+# OCR质量验证使用的学术相关关键词
+QUALITY_KEYWORDS = ('phd', 'university', 'position', 'research', 'student', 'application',
+                    'deadline', 'email', 'contact', 'degree', 'master', 'doctoral')
+
+def _keyword_regex(keywords) -> re.Pattern:
+    """把关键词列表编译成一个子串匹配的正则（一次扫描代替逐个关键词查找）"""
+    return re.compile('|'.join(re.escape(keyword) for keyword in keywords))
+
+_KEEP_RE = re.compile(_keyword_regex(KEEP_KEYWORDS).pattern, re.IGNORECASE)
+_QUALITY_RE = _keyword_regex(QUALITY_KEYWORDS)
+
+# 需要整行移除的UI文本：包含UI关键词的行（不区分大小写），或去掉首尾空白后
+# 不超过2个字符、不超过5个字符且不含数字的行（单个图标字符或很短的UI文本）
+_UI_LINE_RE = re.compile(
+    r'^(?:.*(?:%s).*|[^\S\n]*(?:[^\n]{0,2}|[^\d\n]{0,5})[^\S\n]*)(?:\n|$)'
+    % _keyword_regex(UI_KEYWORDS).pattern,
+    re.IGNORECASE | re.MULTILINE
+)
+
+# OCR常见的错误字符
+_OCR_STRIP_RE = re.compile(r'[^\w\s\u4e00-\u9fff.,;:!?()\[\]{}\-—–\'"\/@#$%&*+=<>]')
+
+# 中文字符之间的空格
+_CJK_SPACE_RE = re.compile(r'([\u4e00-\u9fff])\s+([\u4e00-\u9fff])')
+
+# 非字母字符（[^\W\d_] 即Unicode字母，与str.isalpha()一致，包括中文）
+_NON_ALPHA_RE = re.compile(r'[\W\d_]+')
+
+# 图像锐化卷积核（OpenCV预处理使用）
+_SHARPEN_KERNEL = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], dtype=np.float32)
+
+def _is_blank(variance: float, path: str) -> bool:
+    """灰度方差低于阈值的截图几乎是纯色（如页面末尾的空白区域），无需交给Tesseract"""
+    if variance < OCR_BLANK_VARIANCE:
+        logger.info(f"截图接近空白（灰度方差 {variance:.1f}），跳过OCR: {Path(path).name}")
+        return True
+    return False
+
+def _preprocess_image(path: str):
+    """
+    图像预处理，提高OCR识别率
+    
+    安装了opencv-python时整个流程在OpenCV中完成（灰度读取 → 缩放 → 对比度/亮度 → 锐化 → 自适应阈值二值化），
+    不经过PIL；否则退回PIL增强且不做二值化
+    
+    Args:
+        path: 截图文件路径
+        
+    Returns:
+        numpy数组（OpenCV）或PIL Image对象；截图接近空白（灰度方差过低）时返回None
+    """
+    if not CV2_AVAILABLE:
+        logger.debug("opencv-python未安装，跳过二值化处理")
+        return _preprocess_image_pil(path)
+    
+    # np.fromfile + imdecode 可读取Windows上cv2.imread不支持的非ASCII路径
+    img_array = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if img_array is None:
+        logger.warning(f"OpenCV无法解码图像，使用PIL预处理: {path}")
+        return _preprocess_image_pil(path)
+    
+    if _is_blank(float(img_array.var()), path):
+        return None
+    
+    try:
+        # 超宽截图缩小一半：Tesseract耗时约与像素数成正比，屏幕渲染的文字缩小后仍足够清晰
+        if OCR_DOWNSCALE_WIDTH and img_array.shape[1] > OCR_DOWNSCALE_WIDTH:
+            img_array = cv2.resize(img_array, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)
+        
+        # 对比度×2.0（以灰度均值为中心，与PIL ImageEnhance.Contrast一致）再亮度×1.1，
+        # 合并为一次查表变换: 1.1 * (mean + 2.0 * (x - mean)) = 2.2x - 1.1mean
+        mean = float(img_array.mean())
+        lut = np.clip(np.arange(256) * 2.2 - 1.1 * mean, 0, 255).astype(np.uint8)
+        img_array = cv2.LUT(img_array, lut)
+        
+        # 锐化
+        img_array = cv2.filter2D(img_array, -1, _SHARPEN_KERNEL)
+        
+        # 自适应阈值二值化（将图像转为黑白，提高文字识别率）
+        img_array = cv2.adaptiveThreshold(
+            img_array, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.THRESH_BINARY, 11, 2
+        )
+    except Exception as e:
+        logger.warning(f"图像预处理失败，使用灰度原图: {e}")
+    
+    return img_array
+
+
+def _preprocess_image_pil(path: str):
+    """
+    未安装opencv-python时的PIL预处理
+    
+    Args:
+        path: 截图文件路径
+        
+    Returns:
+        Image.Image: 处理后的图像；截图接近空白时返回None
+    """
+    with Image.open(path) as img:
+        img.load()
+    
+    try:
+        # 转换为灰度图
+        img = img.convert('L')
+        
+        if _is_blank(ImageStat.Stat(img).var[0], path):
+            return None
+        
+        # 超宽截图缩小一半
+        if OCR_DOWNSCALE_WIDTH and img.width > OCR_DOWNSCALE_WIDTH:
+            img = img.reduce(2)
+        
+        # 增强对比度（更激进）
+        img = ImageEnhance.Contrast(img).enhance(2.0)
+        
+        # 增强亮度（确保文字清晰）
+        img = ImageEnhance.Brightness(img).enhance(1.1)
+        
+        # 增强锐度
+        img = ImageEnhance.Sharpness(img).enhance(1.5)
+        
+        return img
+        
+    except Exception as e:
+        logger.warning(f"图像预处理失败，使用原图: {e}")
+        return img
+
+
+def _ocr_one(path: str, lang: str, config: str) -> str:
+    """
+    对单张截图执行预处理和OCR（模块级函数，可在线程池中调用）
+    
+    Args:
+        path: 截图文件路径
+        lang: Tesseract语言设置
+        config: Tesseract参数
+        
+    Returns:
+        str: 识别出的原始文本
+    """
+    # pytesseract同时接受numpy数组和PIL图像
+    processed_img = _preprocess_image(path)
+    if processed_img is None:
+        return ''
+    
+    # 超时后pytesseract终止tesseract子进程并抛出RuntimeError
+    return pytesseract.image_to_string(processed_img, lang=lang, config=config, timeout=OCR_TIMEOUT)
+
+
 class ScreenshotOCRFetcher:
     """从截图图像中提取文本的OCR提取器"""
     
@@ -18,48 +231,31 @@ class ScreenshotOCRFetcher:
     
     def _check_ocr_availability(self) -> bool:
         """检查OCR依赖是否可用"""
-        try:
-            import pytesseract
-            from PIL import Image
-            import os
-            import platform
-            
-            # Windows系统：尝试自动查找并设置Tesseract路径
-            if platform.system() == 'Windows':
-                possible_paths = [
-                    r'C:\Program Files\Tesseract-OCR\tesseract.exe',
-                    r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
-                    r'C:\Tesseract-OCR\tesseract.exe',
-                ]
-                
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        pytesseract.pytesseract.tesseract_cmd = path
-                        logger.info(f"✅ 已设置Tesseract路径: {path}")
-                        break
-            
-            # 检查Tesseract是否已安装
-            try:
-                # 尝试获取Tesseract版本
-                version = pytesseract.get_tesseract_version()
-                logger.info(f"✅ Tesseract OCR 已安装，版本: {version}")
-                return True
-            except pytesseract.TesseractNotFoundError:
-                logger.error("❌ Tesseract OCR 未安装或不在 PATH 中")
-                logger.error("请安装 Tesseract OCR:")
-                logger.error("  Windows: 下载并安装 https://github.com/UB-Mannheim/tesseract/wiki")
-                logger.error("           安装后添加到系统 PATH，或设置 TESSDATA_PREFIX 环境变量")
-                logger.error("  Linux: sudo apt-get install tesseract-ocr tesseract-ocr-chi-sim")
-                logger.error("  macOS: brew install tesseract tesseract-lang")
-                return False
-            except Exception as e:
-                logger.warning(f"Tesseract 检查失败: {e}")
-                return False
-                
-        except ImportError as e:
-            logger.error(f"❌ OCR依赖库未安装: {e}")
+        if not OCR_LIBS_AVAILABLE:
+            logger.error(f"❌ OCR依赖库未安装: {_OCR_IMPORT_ERROR}")
             logger.error("请运行: pip install pytesseract Pillow")
             return False
+        
+        if _TESSERACT_CMD:
+            logger.info(f"✅ 已设置Tesseract路径: {_TESSERACT_CMD}")
+        
+        # 检查Tesseract是否已安装
+        try:
+            # 尝试获取Tesseract版本
+            version = pytesseract.get_tesseract_version()
+            logger.info(f"✅ Tesseract OCR 已安装，版本: {version}")
+            return True
+        except pytesseract.TesseractNotFoundError:
+            logger.error("❌ Tesseract OCR 未安装或不在 PATH 中")
+            logger.error("请安装 Tesseract OCR:")
+            logger.error("  Windows: 下载并安装 https://github.com/UB-Mannheim/tesseract/wiki")
+            logger.error("           安装后添加到系统 PATH，或设置 TESSDATA_PREFIX 环境变量")
+            logger.error("  Linux: sudo apt-get install tesseract-ocr tesseract-ocr-chi-sim")
+            logger.error("  macOS: brew install tesseract tesseract-lang")
+            return False
+        except Exception as e:
+            logger.warning(f"Tesseract 检查失败: {e}")
+            return False
     
     def extract_text_from_screenshots(self, screenshot_paths: List[str]) -> Optional[str]:
         """
@@ -80,73 +276,66 @@ class ScreenshotOCRFetcher:
             return None
         
         try:
-            import pytesseract
-            from PIL import Image
-            from config import OCR_LANGUAGE, SCREENSHOT_CLEANUP_AFTER_USE
-            import os
-            import platform
-            
-            # Windows系统：确保Tesseract路径已设置
-            if platform.system() == 'Windows':
-                possible_paths = [
-                    r'C:\Program Files\Tesseract-OCR\tesseract.exe',
-                    r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe',
-                    r'C:\Tesseract-OCR\tesseract.exe',
-                ]
-                
-                for path in possible_paths:
-                    if os.path.exists(path):
-                        pytesseract.pytesseract.tesseract_cmd = path
-                        break
-            
             logger.info(f"开始OCR处理 {len(screenshot_paths)} 张截图...")
             
-            all_texts = []
+            screenshot_files = []
+            for screenshot_path in screenshot_paths:
+                screenshot_file = Path(screenshot_path)
+                if screenshot_file.exists():
+                    screenshot_files.append(screenshot_file)
+                else:
+                    logger.warning(f"截图文件不存在: {screenshot_path}")
             
-            for i, screenshot_path in enumerate(screenshot_paths, 1):
-                try:
-                    screenshot_file = Path(screenshot_path)
-                    if not screenshot_file.exists():
-                        logger.warning(f"截图文件不存在: {screenshot_path}")
-                        continue
-                    
-                    logger.info(f"处理第 {i}/{len(screenshot_paths)} 张截图: {screenshot_file.name}")
-                    
-                    # 加载图像
-                    img = Image.open(screenshot_file)
-                    
-                    # 图像预处理
-                    processed_img = self._preprocess_image(img)
-                    
-                    # OCR识别 - 使用更好的配置
-                    # PSM 3 = 全自动页面分割，无OSD（最适合文档）
-                    # PSM 6 = 假设统一文本块
-                    # PSM 11 = 稀疏文本，尽可能多地查找文字
-                    custom_config = r'--oem 3 --psm 3'
-                    
-                    text = pytesseract.image_to_string(
-                        processed_img,
-                        lang=OCR_LANGUAGE,
-                        config=custom_config
-                    )
-                    
-                    if text and text.strip():
-                        all_texts.append(text.strip())
-                        logger.info(f"第 {i} 张截图识别成功，提取 {len(text.strip())} 字符")
-                    else:
-                        logger.warning(f"第 {i} 张截图未识别到文本")
-                    
-                    # 如果配置了自动清理，删除截图文件
-                    if SCREENSHOT_CLEANUP_AFTER_USE:
+            workers = min(OCR_WORKERS, os.cpu_count() or 1, len(screenshot_files))
+            
+            # 每张截图的预处理+OCR相互独立，多张时分发到线程池并行执行：
+            # Tesseract本身运行在pytesseract启动的子进程中，线程池即可并行，且不会在多线程进程中fork
+            if workers > 1:
+                # 整批的截止时间：每个线程依次处理 ceil(n/workers) 张截图，每张最多 OCR_TIMEOUT 秒
+                rounds = -(-len(screenshot_files) // workers)
+                deadline = time.monotonic() + OCR_TIMEOUT * rounds
+                with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr") as executor:
+                    futures = [
+                        executor.submit(_ocr_one, str(screenshot_file), OCR_LANGUAGE, OCR_TESSERACT_CONFIG)
+                        for screenshot_file in screenshot_files
+                    ]
+                    outcomes = []
+                    for future in futures:
                         try:
-                            screenshot_file.unlink()
-                            logger.debug(f"已删除截图文件: {screenshot_file.name}")
+                            outcomes.append((future.result(timeout=max(0.0, deadline - time.monotonic())), None))
+                        except FutureTimeoutError:
+                            future.cancel()
+                            outcomes.append((None, TimeoutError(f"OCR超时（>{OCR_TIMEOUT}秒）")))
                         except Exception as e:
-                            logger.warning(f"删除截图文件失败: {e}")
-                    
-                except Exception as e:
-                    logger.error(f"处理截图 {screenshot_path} 失败: {e}")
+                            outcomes.append((None, e))
+            else:
+                outcomes = []
+                for screenshot_file in screenshot_files:
+                    try:
+                        outcomes.append((_ocr_one(str(screenshot_file), OCR_LANGUAGE, OCR_TESSERACT_CONFIG), None))
+                    except Exception as e:
+                        outcomes.append((None, e))
+            
+            all_texts = []
+            
+            for i, (screenshot_file, (text, error)) in enumerate(zip(screenshot_files, outcomes), 1):
+                if error is not None:
+                    logger.error(f"处理截图 {screenshot_file} 失败: {error}")
                     continue
+                
+                if text and text.strip():
+                    all_texts.append(text.strip())
+                    logger.info(f"第 {i} 张截图识别成功，提取 {len(text.strip())} 字符")
+                else:
+                    logger.warning(f"第 {i} 张截图未识别到文本")
+                
+                # 如果配置了自动清理，删除截图文件
+                if SCREENSHOT_CLEANUP_AFTER_USE:
+                    try:
+                        screenshot_file.unlink()
+                        logger.debug(f"已删除截图文件: {screenshot_file.name}")
+                    except Exception as e:
+                        logger.warning(f"删除截图文件失败: {e}")
             
             if all_texts:
                 # 合并所有文本
@@ -164,62 +353,6 @@ class ScreenshotOCRFetcher:
             logger.error(f"OCR处理过程发生异常: {e}")
             return None
     
-    def _preprocess_image(self, img):
-        """
-        图像预处理，提高OCR识别率
-        
-        Args:
-            img: PIL Image对象
-            
-        Returns:
-            Image.Image: 处理后的图像
-        """
-        try:
-            from PIL import Image, ImageEnhance, ImageFilter
-            import numpy as np
-            
-            # 转换为RGB模式（如果不是）
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # 转换为灰度图
-            img = img.convert('L')
-            
-            # 增强对比度（更激进）
-            enhancer = ImageEnhance.Contrast(img)
-            img = enhancer.enhance(2.0)  # 从1.5增加到2.0
-            
-            # 增强亮度（确保文字清晰）
-            enhancer = ImageEnhance.Brightness(img)
-            img = enhancer.enhance(1.1)
-            
-            # 增强锐度
-            enhancer = ImageEnhance.Sharpness(img)
-            img = enhancer.enhance(1.5)  # 从1.2增加到1.5
-            
-            # 二值化处理（将图像转为黑白，提高文字识别率）
-            # 使用自适应阈值
-            try:
-                import cv2
-                img_array = np.array(img)
-                # 使用自适应阈值二值化
-                img_array = cv2.adaptiveThreshold(
-                    img_array, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                    cv2.THRESH_BINARY, 11, 2
-                )
-                img = Image.fromarray(img_array)
-                logger.debug("应用了自适应阈值二值化")
-            except ImportError:
-                logger.debug("opencv-python未安装，跳过二值化处理")
-            except Exception as e:
-                logger.debug(f"二值化处理失败: {e}")
-            
-            return img
-            
-        except Exception as e:
-            logger.warning(f"图像预处理失败，使用原图: {e}")
-            return img
-    
     def _clean_ocr_text(self, text: str) -> str:
         """
         清理OCR识别的文本
@@ -233,36 +366,11 @@ class ScreenshotOCRFetcher:
         if not text:
             return ""
         
-        # 移除多余空白
-        import re
-        from utils import normalize_text
-        
-        # 定义要过滤的UI元素关键词（常见的PDF查看器/编辑器UI文本）
-        ui_keywords = [
-            'view only', 'scroll', 'rotate', 'edit', 'split', 'merge', 'extract text',
-            'pdf to word', 'pdf to image', 'ai podcast', 'all translate', 'adjust page',
-            'file compress', 'shortcut tools', 'print', 'thumbnail', 'outline',
-            'zoom in', 'zoom out', 'next page', 'previous page', 'download', 'share',
-            'annotation', 'highlight', 'comment', 'save', 'export', 'upload'
-        ]
-        
-        # 移除包含UI关键词的行
-        lines = text.split('\n')
-        filtered_lines = []
-        for line in lines:
-            line_lower = line.lower().strip()
-            # 检查是否包含UI关键词
-            is_ui_text = any(keyword in line_lower for keyword in ui_keywords)
-            # 检查是否是单个图标字符或很短的UI文本
-            is_short_ui = len(line_lower) <= 2 or (len(line_lower) <= 5 and not any(c.isdigit() for c in line))
-            
-            if not is_ui_text and not is_short_ui:
-                filtered_lines.append(line)
-        
-        text = '\n'.join(filtered_lines)
+        # 移除包含UI关键词的行和很短的UI文本行（整篇文本一次正则替换）
+        text = _UI_LINE_RE.sub('', text)
         
         # 移除OCR常见的错误字符
-        text = re.sub(r'[^\w\s\u4e00-\u9fff.,;:!?()\[\]{}\-—–\'"\/@#$%&*+=<>]', ' ', text)
+        text = _OCR_STRIP_RE.sub(' ', text)
         
         # 标准化文本
         text = normalize_text(text)
@@ -273,13 +381,13 @@ class ScreenshotOCRFetcher:
         for line in lines:
             line = line.strip()
             # 保留长度大于5的行，或者包含常见关键词的行
-            if len(line) > 5 or any(keyword in line.lower() for keyword in ['phd', 'university', 'email', 'deadline', 'position', 'research', 'doctor']):
+            if len(line) > 5 or _KEEP_RE.search(line):
                 cleaned_lines.append(line)
         
         # 移除中文字符之间的多余空格
         result = '\n'.join(cleaned_lines)
         # 移除中文字符间的空格（如 "美 国" -> "美国"）
-        result = re.sub(r'([\u4e00-\u9fff])\s+([\u4e00-\u9fff])', r'\1\2', result)
+        result = _CJK_SPACE_RE.sub(r'\1\2', result)
         
         return result
     
@@ -302,18 +410,15 @@ class ScreenshotOCRFetcher:
             return False
         
         # 检查是否包含常见关键词（学术相关）
-        keywords = ['phd', 'university', 'position', 'research', 'student', 'application', 
-                   'deadline', 'email', 'contact', 'degree', 'master', 'doctoral']
-        text_lower = text.lower()
-        keyword_count = sum(1 for keyword in keywords if keyword in text_lower)
+        keyword_count = len(set(_QUALITY_RE.findall(text.lower())))
         
         if keyword_count < 2:
             logger.warning(f"OCR文本中关键词过少: {keyword_count} 个")
             # 不强制要求，因为有些内容可能不包含这些关键词
         
-        # 检查字符分布
-        alpha_chars = sum(1 for c in text if c.isalpha())
-        total_chars = len(text.replace(' ', '').replace('\n', ''))
+        # 检查字符分布（在正则引擎和str.count的C实现中计数，不逐字符调用isalpha）
+        alpha_chars = len(_NON_ALPHA_RE.sub('', text))
+        total_chars = len(text) - text.count(' ') - text.count('\n')
         
         if total_chars > 0:
             alpha_ratio = alpha_chars / total_chars
@@ -6,11 +6,224 @@
 """
 import logging
 from typing import Optional, Dict, List
-from playwright.sync_api import Page
+from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
 import time
+import random
 
 logger = logging.getLogger(__name__)
 
+# 在页面内完成整个滚动加载循环，只需一次 page.evaluate 往返：
+# 每次滚动后等待一帧，再等到DOM连续 idleMs 毫秒无变化（最多 maxWaitMs 毫秒）；
+# 每次滚动是否增长记录在位掩码中（1=高度增长）；连续 noGrowthLimit 次不增长、
+# 最近 growthWindow 次都未增长（掩码内全为0）或接近底部时停止，
+# 最后滚回顶部
+SCROLL_AND_LOAD_JS = """
+async ({step, maxScrolls, idleMs, maxWaitMs, noGrowthLimit, growthWindow, buffer}) => {
+    const root = document.body || document.documentElement;
+    const nextFrame = () => new Promise(resolve => {
+        requestAnimationFrame(() => resolve());
+        setTimeout(resolve, 100);
+    });
+    const waitForIdle = () => new Promise(resolve => {
+        let idleTimer = null;
+        let deadline = null;
+        let observer = null;
+        const done = () => {
+            observer.disconnect();
+            clearTimeout(idleTimer);
+            clearTimeout(deadline);
+            resolve();
+        };
+        observer = new MutationObserver(() => {
+            clearTimeout(idleTimer);
+            idleTimer = setTimeout(done, idleMs);
+        });
+        observer.observe(root, {childList: true, subtree: true, characterData: true});
+        idleTimer = setTimeout(done, idleMs);
+        deadline = setTimeout(done, maxWaitMs);
+    });
+
+    const initialHeight = root.scrollHeight;
+    let lastHeight = initialHeight;
+    let position = 0;
+    let scrolls = 0;
+    let history = 0;
+    const windowMask = (1 << growthWindow) - 1;
+    const noGrowthMask = (1 << noGrowthLimit) - 1;
+    const historyMask = windowMask | noGrowthMask;
+    while (scrolls < maxScrolls) {
+        position += step;
+        window.scrollTo(0, position);
+        await nextFrame();
+        await waitForIdle();
+        scrolls++;
+
+        const height = root.scrollHeight;
+        const grew = height > lastHeight ? 1 : 0;
+        if (grew) {
+            lastHeight = height;
+        }
+        history = ((history << 1) | grew) & historyMask;
+        if (position >= height - buffer
+            || (scrolls >= noGrowthLimit && (history & noGrowthMask) === 0)
+            || (scrolls >= growthWindow && (history & windowMask) === 0)) {
+            break;
+        }
+    }
+
+    window.scrollTo(0, 0);
+    await nextFrame();
+    return {scrolls, initialHeight, finalHeight: lastHeight};
+}
+"""
+
+def scroll_to_load(page: Page, step: int = 500, max_scrolls: int = 50, idle_ms: int = 300,
+                   max_wait_ms: int = 1000, no_growth_limit: int = 3, growth_window: int = 8,
+                   buffer: int = 1000) -> Dict:
+    """
+    滚动页面以触发懒加载内容（整个循环在浏览器内执行）
+    
+    Returns:
+        dict: {'scrolls': 滚动次数, 'initialHeight': 初始高度, 'finalHeight': 最终高度}
+    """
+    return page.evaluate(SCROLL_AND_LOAD_JS, {
+        'step': step,
+        'maxScrolls': max_scrolls,
+        'idleMs': idle_ms,
+        'maxWaitMs': max_wait_ms,
+        'noGrowthLimit': no_growth_limit,
+        'growthWindow': growth_window,
+        'buffer': buffer
+    })
+
+# 网络活动计数脚本：包装 fetch 和 XMLHttpRequest，维护进行中的请求数 window.__pending，
+# 计数归零时记录 window.__lastIdle；重复注入时不会重复包装
+NETWORK_HOOK_JS = """
+(() => {
+    if (window.__pending !== undefined) return;
+    window.__pending = 0;
+    window.__lastIdle = Date.now();
+    const begin = () => { window.__pending++; };
+    const end = () => {
+        window.__pending = Math.max(0, window.__pending - 1);
+        if (window.__pending === 0) window.__lastIdle = Date.now();
+    };
+
+    if (window.fetch) {
+        const originalFetch = window.fetch;
+        window.fetch = function (...args) {
+            begin();
+            try {
+                return originalFetch.apply(this, args).finally(end);
+            } catch (e) {
+                end();
+                throw e;
+            }
+        };
+    }
+
+    const originalOpen = XMLHttpRequest.prototype.open;
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.open = function (...args) {
+        this.__tracked = false;
+        return originalOpen.apply(this, args);
+    };
+    XMLHttpRequest.prototype.send = function (...args) {
+        if (!this.__tracked) {
+            this.__tracked = true;
+            begin();
+            this.addEventListener('loadend', end, {once: true});
+        }
+        try {
+            return originalSend.apply(this, args);
+        } catch (e) {
+            this.__tracked = false;
+            end();
+            throw e;
+        }
+    };
+})();
+"""
+
+# 网络空闲条件：没有进行中的请求，且已持续空闲 idleWindow 毫秒
+NETWORK_IDLE_JS = """
+(idleWindow) => window.__pending === 0 && (Date.now() - window.__lastIdle) >= idleWindow
+"""
+
+# 定义 window.__getMain()：缓存解析出的主要内容区域（WeakRef，不阻止节点回收），
+# 节点脱离文档后才重新查询；退回到 body 时不缓存，以便稍后渲染出的 main 等元素能被找到
+MAIN_ELEMENT_JS = """
+(() => {
+    if (window.__getMain) return;
+    let cached = null;
+    window.__getMain = () => {
+        const el = cached && cached.deref();
+        if (el && el.isConnected) return el;
+        const found = document.querySelector('main')
+            || document.querySelector('article')
+            || document.querySelector('[role="main"]')
+            || document.querySelector('#content');
+        cached = found ? new WeakRef(found) : null;
+        return found || document.body;
+    };
+})();
+"""
+
+# 定义 window.__probe()：一次调用获取主要内容区域的文本哈希（抽样）、文本长度和页面高度；
+# 上次检测的长度、末尾文本和哈希保存在 window.__lastProbe 中。
+# 作为初始化脚本安装后，每次检测只需发送 PROBE_CALL_JS，页面内复用已编译的函数
+PROBE_INSTALL_JS = MAIN_ELEMENT_JS + """
+(() => {
+    if (window.__probe) return;
+    window.__probe = () => {
+        const mainElement = window.__getMain();
+        const text = (mainElement && mainElement.innerText) || '';
+
+        const height = document.body ? document.body.scrollHeight : 0;
+
+        // 页面更新大多追加在末尾：长度和末尾4KB都与上次相同时直接沿用上次的哈希
+        const length = text.length;
+        const W = 4096;
+        const tail = text.substr(Math.max(0, length - W), W);
+        const last = window.__lastProbe;
+        if (last && last.length === length && last.tail === tail) {
+            return {hash: last.hash, length: length, height: height};
+        }
+
+        // 只对开头、中间、结尾三段（各4KB）计算FNV-1a哈希，并混入总长度，
+        // 每次检测的计算量与页面大小无关
+        const chunks = [
+            text.substr(0, W),
+            text.substr(Math.max(0, (length >> 1) - W / 2), W),
+            tail
+        ];
+        let hash = (0x811c9dc5 ^ length) >>> 0;
+        for (const chunk of chunks) {
+            for (let i = 0; i < chunk.length; i++) {
+                hash ^= chunk.charCodeAt(i);
+                hash = Math.imul(hash, 0x01000193) >>> 0;
+            }
+        }
+        window.__lastProbe = {length: length, tail: tail, hash: hash};
+        return {hash: hash, length: length, height: height};
+    };
+})();
+"""
+
+# 调用页面内的检测函数；页面尚未安装时返回null
+PROBE_CALL_JS = "() => window.__probe ? window.__probe() : null"
+
+# 等到下一帧绘制完成（requestAnimationFrame 之后再等1ms）；页面不绘制时最多等待100ms
+NEXT_PAINT_JS = """
+() => new Promise(resolve => {
+    requestAnimationFrame(() => setTimeout(resolve, 1));
+    setTimeout(resolve, 100);
+})
+"""
+
+# 稳定性轮询的最短间隔（毫秒）；页面变化时间隔翻倍，稳定时减半
+POLL_MIN_INTERVAL_MS = 200
+
 class SmartPageLoader:
     """智能页面加载器 - 检测页面是否真正加载完成"""
     
@@ -19,23 +232,87 @@ class SmartPageLoader:
                  initial_wait: float = 15.0,
                  stability_check_interval: float = 1.0,
                  stability_threshold: int = 3,
-                 min_content_length: int = 500):
+                 min_content_length: int = 500,
+                 idle_window_ms: int = 500):
         """
         初始化智能页面加载器
-        
+
         Args:
             max_wait_time: 最大等待时间（秒）
-            initial_wait: 智能检测前的初始等待时间（秒），给页面足够时间加载
-            stability_check_interval: 内容稳定性检查间隔（秒）
+            initial_wait: 等待网络请求空闲的最长时间（秒），页面空闲后立即继续
+            stability_check_interval: 稳定性检查基准间隔（秒），轮询间隔在200毫秒到其3倍之间自适应
             stability_threshold: 内容稳定次数阈值
             min_content_length: 最小内容长度阈值
+            idle_window_ms: 无进行中请求持续多久（毫秒）视为网络空闲
         """
         self.max_wait_time = max_wait_time
         self.initial_wait = initial_wait
         self.stability_check_interval = stability_check_interval
         self.stability_threshold = stability_threshold
         self.min_content_length = min_content_length
-    
+        self.idle_window_ms = idle_window_ms
+        self.max_poll_interval_ms = max(POLL_MIN_INTERVAL_MS, int(stability_check_interval * 3000))
+
+    def _next_poll_interval(self, interval_ms: int, stable: bool) -> int:
+        """稳定时缩短轮询间隔以尽快确认，仍在变化时指数退避"""
+        if stable:
+            return max(POLL_MIN_INTERVAL_MS, interval_ms // 2)
+        return min(self.max_poll_interval_ms, interval_ms * 2)
+
+    def _poll_sleep(self, page: Page, interval_ms: int):
+        """等待一个轮询间隔，加入±20%抖动避免与页面定时器同步"""
+        page.wait_for_timeout(int(interval_ms * random.uniform(0.8, 1.2)))
+
+    def prepare_page(self, page: Page):
+        """
+        在导航前调用：安装网络活动计数脚本，使页面发出的第一个请求起就被统计，
+        并安装主要内容区域的查询缓存和检测函数
+
+        Args:
+            page: Playwright页面对象
+        """
+        try:
+            self._install_network_hook(page)
+            self._install_probe_script(page)
+        except Exception as e:
+            logger.debug(f"安装页面检测脚本失败: {e}")
+
+    def _install_probe_script(self, page: Page):
+        """为之后的每次导航注入主要内容区域的查询缓存和检测函数"""
+        page.add_init_script(PROBE_INSTALL_JS)
+
+    def _install_network_hook(self, page: Page):
+        """为之后的每次导航注入网络活动计数脚本"""
+        page.add_init_script(NETWORK_HOOK_JS)
+
+    def _wait_for_network_quiet(self, page: Page, start_time: float) -> bool:
+        """
+        等待页面内 fetch/XHR 请求全部结束并持续空闲 idle_window_ms 毫秒
+
+        最长等待 initial_wait 秒（不超过剩余的总等待时间），超时后直接继续后续检测
+
+        Args:
+            page: Playwright页面对象
+            start_time: 开始时间
+
+        Returns:
+            bool: 是否达到网络空闲
+        """
+        remaining_time = self.max_wait_time - (time.time() - start_time)
+        timeout = min(self.initial_wait, remaining_time) if self.initial_wait > 0 else remaining_time
+        if timeout <= 0:
+            return False
+
+        try:
+            # 导航前未安装计数脚本时（或页面已在安装前加载），直接注入当前页面
+            page.evaluate(NETWORK_HOOK_JS)
+            page.wait_for_function(NETWORK_IDLE_JS, arg=self.idle_window_ms,
+                                   timeout=int(timeout * 1000))
+            return True
+        except Exception as e:
+            logger.debug(f"等待请求空闲未完成: {e}")
+            return False
+
     def wait_for_page_load(self, page: Page, url: str, 
                           custom_selectors: Optional[List[str]] = None) -> Dict[str, any]:
         """
@@ -44,8 +321,7 @@ class SmartPageLoader:
         使用多种策略检测页面是否真正加载完成：
         1. 基础网络空闲检测
         2. 关键元素出现检测
-        3. DOM内容稳定性检测
-        4. 页面高度稳定性检测
+        3. DOM内容与页面高度稳定性检测
         
         Args:
             page: Playwright页面对象
@@ -73,12 +349,13 @@ class SmartPageLoader:
         try:
             logger.info(f"开始智能页面加载检测: {url}")
             
-            # 初始等待：给页面足够的时间进行初始加载
-            if self.initial_wait > 0:
-                logger.info(f"初始等待 {self.initial_wait} 秒，让页面有足够时间加载...")
-                page.wait_for_timeout(int(self.initial_wait * 1000))
-                logger.info(f"✓ 初始等待完成")
-            
+            # 初始等待：等到页面内请求空闲即继续，initial_wait 只作为等待上限
+            network_idle = self._wait_for_network_quiet(page, start_time)
+            if network_idle:
+                logger.info(f"✓ 请求已空闲 {self.idle_window_ms}ms")
+            else:
+                logger.info("请求未在初始等待上限内空闲，继续检测")
+
             # 策略1: 基础网络空闲等待（作为初始等待）
             try:
                 logger.info("策略1: 等待网络空闲...")
@@ -87,6 +364,7 @@ class SmartPageLoader:
                     page.wait_for_load_state('networkidle', timeout=min(30000, int(remaining_timeout * 1000)))
                     logger.info("✓ 网络空闲状态达到")
                     result['strategy'] = 'networkidle'
+                    network_idle = True
                 else:
                     logger.warning("剩余时间不足，跳过网络空闲检测")
             except Exception as e:
@@ -98,18 +376,21 @@ class SmartPageLoader:
             if key_element_found:
                 result['strategy'] = 'key_element'
                 logger.info(f"✓ 关键元素检测成功，策略: {result['strategy']}")
+                
+                # 快速通道：网络已空闲且内容明显充足时，跳过稳定性检测
+                if network_idle:
+                    early_length = self._get_content_length(page)
+                    if early_length >= 2 * self.min_content_length:
+                        result.update(success=True, content_length=early_length,
+                                      strategy='key_element_fast')
+                        logger.info(f"✅ 页面已加载完成（快速通道），内容长度: {early_length}")
+                        return result
             
-            # 策略3: DOM内容稳定性检测
-            if self._wait_for_content_stability(page, start_time):
+            # 策略3: DOM内容与页面高度稳定性检测（每次轮询只需一次 page.evaluate）
+            if self._wait_for_stability(page, start_time):
                 result['strategy'] = 'content_stability'
                 logger.info("✓ 内容稳定性检测通过")
             
-            # 策略4: 页面高度稳定性检测
-            if self._wait_for_height_stability(page, start_time):
-                if result['strategy'] != 'content_stability':
-                    result['strategy'] = 'height_stability'
-                logger.info("✓ 页面高度稳定")
-            
             # 最终内容检查
             content_length = self._get_content_length(page)
             result['content_length'] = content_length
@@ -168,6 +449,30 @@ class SmartPageLoader:
         
         logger.info(f"策略2: 等待关键元素出现（检测 {len(selectors)} 个选择器）...")
         
+        # 任一选择器出现即可：合并为一个选择器列表只等待一次
+        remaining_time = self.max_wait_time - (time.time() - start_time)
+        if remaining_time <= 0:
+            logger.warning("关键元素检测超时")
+            return False
+        
+        combined = ", ".join(selectors)
+        try:
+            page.wait_for_selector(f"{combined} >> visible=true",
+                                   timeout=min(30000, int(remaining_time * 1000)))
+            matched = page.evaluate(
+                "(selectors) => selectors.find(s => document.querySelector(s)) || null", selectors)
+            logger.info(f"✓ 找到关键元素: {matched or combined}")
+            
+            # 找到元素后，等到下一帧绘制完成再继续
+            page.evaluate(NEXT_PAINT_JS)
+            return True
+        except PlaywrightTimeoutError:
+            logger.warning("未找到任何关键元素")
+            return False
+        except Exception as e:
+            # 自定义选择器无法合并（如XPath等非CSS语法）时逐个等待
+            logger.debug(f"合并选择器等待失败，改为逐个检测: {e}")
+        
         for selector in selectors:
             try:
                 remaining_time = self.max_wait_time - (time.time() - start_time)
@@ -179,132 +484,86 @@ class SmartPageLoader:
                 page.wait_for_selector(selector, timeout=timeout, state='visible')
                 logger.info(f"✓ 找到关键元素: {selector}")
                 
-                # 找到元素后，额外等待一小段时间让内容完全渲染
-                page.wait_for_timeout(1000)
+                # 找到元素后，等到下一帧绘制完成再继续
+                page.evaluate(NEXT_PAINT_JS)
                 return True
                 
             except Exception as e:
-                logger.debug(f"未找到元素 {selector}: {e}")
+                logger.debug("未找到元素 %s: %s", selector, e)
                 continue
         
         logger.warning("未找到任何关键元素")
         return False
     
-    def _wait_for_content_stability(self, page: Page, start_time: float) -> bool:
+    def _probe_page(self, page: Page) -> Dict[str, int]:
         """
-        等待DOM内容稳定（不再变化）
-        
+        一次往返获取主要内容的文本哈希、文本长度和页面高度
+
         Args:
             page: Playwright页面对象
-            start_time: 开始时间
-            
+
         Returns:
-            bool: 内容是否稳定
+            dict: {'hash': int, 'length': int, 'height': int}
         """
-        logger.info("策略3: 检测DOM内容稳定性...")
-        
-        stable_count = 0
-        last_content_hash = None
-        
-        while stable_count < self.stability_threshold:
-            elapsed = time.time() - start_time
-            if elapsed >= self.max_wait_time:
-                logger.warning("内容稳定性检测超时")
-                return stable_count >= 2  # 至少稳定2次也算部分成功
-            
-            try:
-                # 获取主要内容区域的文本内容哈希
-                current_content_hash = page.evaluate("""
-                    () => {
-                        // 获取主要内容区域
-                        const mainElements = [
-                            document.querySelector('main'),
-                            document.querySelector('article'),
-                            document.querySelector('[role="main"]'),
-                            document.querySelector('#content'),
-                            document.body
-                        ];
-                        
-                        const mainElement = mainElements.find(el => el !== null) || document.body;
-                        const text = mainElement.innerText || '';
-                        
-                        // 简单哈希
-                        let hash = 0;
-                        for (let i = 0; i < text.length; i++) {
-                            const char = text.charCodeAt(i);
-                            hash = ((hash << 5) - hash) + char;
-                            hash = hash & hash;
-                        }
-                        return {hash: hash, length: text.length};
-                    }
-                """)
-                
-                current_hash = current_content_hash.get('hash', 0)
-                content_length = current_content_hash.get('length', 0)
-                
-                if last_content_hash is not None:
-                    if current_hash == last_content_hash:
-                        stable_count += 1
-                        logger.debug(f"内容稳定次数: {stable_count}/{self.stability_threshold} (长度: {content_length})")
-                    else:
-                        stable_count = 0  # 内容变化，重置计数
-                        logger.debug(f"内容仍在变化 (长度: {content_length})")
-                
-                last_content_hash = current_hash
-                
-                # 等待一段时间再检查
-                page.wait_for_timeout(int(self.stability_check_interval * 1000))
-                
-            except Exception as e:
-                logger.warning(f"内容稳定性检测出错: {e}")
-                return False
-        
-        logger.info(f"✓ 内容已稳定（连续 {stable_count} 次检测无变化）")
-        return True
+        probe = page.evaluate(PROBE_CALL_JS)
+        if probe is None:
+            # 导航前未安装检测函数时，先在当前页面定义
+            page.evaluate(PROBE_INSTALL_JS)
+            probe = page.evaluate(PROBE_CALL_JS)
+        return probe
     
-    def _wait_for_height_stability(self, page: Page, start_time: float) -> bool:
+    def _wait_for_stability(self, page: Page, start_time: float) -> bool:
         """
-        等待页面高度稳定
+        等待DOM内容和页面高度都稳定（连续多次检测均无变化）
         
         Args:
             page: Playwright页面对象
             start_time: 开始时间
             
         Returns:
-            bool: 页面高度是否稳定
+            bool: 内容和高度是否稳定
         """
-        logger.info("策略4: 检测页面高度稳定性...")
+        logger.info("策略3: 检测DOM内容与页面高度稳定性...")
         
         stable_count = 0
+        last_hash = None
         last_height = None
+        interval_ms = POLL_MIN_INTERVAL_MS
         
         while stable_count < self.stability_threshold:
             elapsed = time.time() - start_time
             if elapsed >= self.max_wait_time:
-                logger.warning("页面高度稳定性检测超时")
-                return stable_count >= 2
+                logger.warning("稳定性检测超时")
+                return stable_count >= 2  # 至少稳定2次也算部分成功
             
             try:
-                current_height = page.evaluate("document.body.scrollHeight")
+                probe = self._probe_page(page)
+                current_hash = probe.get('hash', 0)
+                content_length = probe.get('length', 0)
+                current_height = probe.get('height', 0)
                 
-                if last_height is not None:
-                    if current_height == last_height:
+                if last_hash is not None:
+                    if current_hash == last_hash and current_height == last_height:
                         stable_count += 1
-                        logger.debug(f"高度稳定次数: {stable_count}/{self.stability_threshold} (高度: {current_height}px)")
+                        logger.debug("稳定次数: %d/%d (长度: %d, 高度: %dpx)",
+                                     stable_count, self.stability_threshold, content_length, current_height)
                     else:
-                        stable_count = 0
-                        logger.debug(f"页面高度仍在变化: {last_height}px -> {current_height}px")
+                        stable_count = 0  # 内容或高度变化，重置计数
+                        logger.debug("页面仍在变化 (长度: %d, 高度: %spx -> %dpx)",
+                                     content_length, last_height, current_height)
+                    interval_ms = self._next_poll_interval(interval_ms, stable_count > 0)
                 
+                last_hash = current_hash
                 last_height = current_height
                 
-                # 等待一段时间再检查
-                page.wait_for_timeout(int(self.stability_check_interval * 1000))
+                # 按自适应间隔等待后再检查
+                self._poll_sleep(page, interval_ms)
                 
             except Exception as e:
-                logger.warning(f"页面高度检测出错: {e}")
+                logger.warning(f"稳定性检测出错: {e}")
                 return False
         
-        logger.info(f"✓ 页面高度已稳定: {last_height}px")
+        logger.info(f"✓ 内容与高度已稳定（连续 {stable_count} 次检测无变化，高度: {last_height}px）")
         return True
     
     def _get_content_length(self, page: Page) -> int:
@@ -318,21 +577,7 @@ class SmartPageLoader:
             int: 内容长度
         """
         try:
-            content_length = page.evaluate("""
-                () => {
-                    const mainElements = [
-                        document.querySelector('main'),
-                        document.querySelector('article'),
-                        document.querySelector('[role="main"]'),
-                        document.querySelector('#content'),
-                        document.body
-                    ];
-                    
-                    const mainElement = mainElements.find(el => el !== null) || document.body;
-                    return (mainElement.innerText || '').length;
-                }
-            """)
-            return content_length
+            return self._probe_page(page).get('length', 0)
         except Exception as e:
             logger.warning(f"获取内容长度失败: {e}")
             return 0
@@ -384,11 +629,12 @@ def create_smart_loader(config: Optional[Dict] = None) -> SmartPageLoader:
     Args:
         config: 配置字典，支持的键：
             - max_wait_time: 最大等待时间（秒）
-            - initial_wait: 智能检测前的初始等待时间（秒）
-            - stability_check_interval: 稳定性检查间隔（秒）
+            - initial_wait: 等待网络请求空闲的最长时间（秒）
+            - stability_check_interval: 稳定性检查基准间隔（秒）
             - stability_threshold: 稳定性阈值（次）
             - min_content_length: 最小内容长度
-            
+            - idle_window_ms: 网络空闲判定窗口（毫秒）
+
     Returns:
         SmartPageLoader实例
     """
@@ -398,6 +644,7 @@ def create_smart_loader(config: Optional[Dict] = None) -> SmartPageLoader:
         initial_wait=config.get('initial_wait', 15.0),
         stability_check_interval=config.get('stability_check_interval', 1.0),
         stability_threshold=config.get('stability_threshold', 3),
-        min_content_length=config.get('min_content_length', 500)
+        min_content_length=config.get('min_content_length', 500),
+        idle_window_ms=config.get('idle_window_ms', 500)
     )
 
@@ -2,17 +2,104 @@
 工具函数模块
 """
 import re
+import functools
 import sys
+import html as html_lib
 import subprocess
-import importlib
+import importlib.util
 import logging
 import json
+import queue
+import atexit
+import threading
+import time
 from pathlib import Path
 from datetime import datetime
 from urllib.parse import urlparse
 
 logger = logging.getLogger(__name__)
 
+# HTML解析器：优先使用C实现的lxml，未安装时退回纯Python的html.parser
+try:
+    import lxml.html
+    from lxml import etree
+    HTML_PARSER = 'lxml'
+    LXML_AVAILABLE = True
+except ImportError:
+    HTML_PARSER = 'html.parser'
+    LXML_AVAILABLE = False
+
+# 可选：selectolax（Lexbor）直接从C解析树中提取文本，比BeautifulSoup快一个数量级
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    SELECTOLAX_AVAILABLE = True
+except ImportError:
+    SELECTOLAX_AVAILABLE = False
+
+# 提取正文前移除的标签
+STRIP_TAGS = ["script", "style", "nav", "footer", "header"]
+STRIP_SELECTOR = ','.join(STRIP_TAGS)
+# 静态HTTP获取的网页额外移除侧边栏（相关链接、推荐内容等）
+WEB_STRIP_TAGS = STRIP_TAGS + ["aside"]
+
+# 连续空白字符
+_WS_RE = re.compile(r'\s+')
+
+# 简单页面快速通道：需移除的标签块及其余标签
+_STRIP_BLOCK_RE = re.compile(r'<(%s)\b.*?</\1\s*>' % '|'.join(STRIP_TAGS), re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+# 文本中的URL
+_URL_RE = re.compile(r'https?://[^\s<>"{}|\\^`\[\]]+')
+
+# Google Drive 文件ID（/file/d/ID 或 ?id=ID、/uc?id=ID）和 Google Docs 文档ID
+_DRIVE_FILE_ID_RE = re.compile(r'/file/d/([a-zA-Z0-9_-]+)')
+_DRIVE_ID_PARAM_RE = re.compile(r'[?&]id=([a-zA-Z0-9_-]+)')
+_DOCS_ID_RE = re.compile(r'/document/d/([a-zA-Z0-9_-]+)')
+
+# 邮箱混淆写法：[at]、(at)、" at " 及对应的 dot 写法（不区分大小写）
+_EMAIL_AT_RE = re.compile(r'\[at\]|\(at\)|\s+at\s+', re.IGNORECASE)
+_EMAIL_DOT_RE = re.compile(r'\[dot\]|\(dot\)|\s+dot\s+', re.IGNORECASE)
+
+# URL中的.pdf（不区分大小写）
+_PDF_EXT_RE = re.compile(r'\.pdf', re.IGNORECASE)
+
+# 文件名中的不安全字符统一替换为下划线（str.translate 逐字符查表，无需正则）
+_FILENAME_TRANS = str.maketrans({c: '_' for c in '<>:"/\\|?*'})
+
+# 小于该长度的HTML不构建解析树，直接用正则去除标签
+TRIVIAL_PAGE_LENGTH = 2048
+
+# lxml解析器不能跨线程共享，每个线程各自创建一个
+_lxml_parsers = threading.local()
+
+def _get_lxml_parser():
+    """
+    获取当前线程的lxml HTML解析器
+    
+    解析时直接丢弃注释和纯空白文本节点，减小后续遍历的树
+    """
+    parser = getattr(_lxml_parsers, 'parser', None)
+    if parser is None:
+        parser = lxml.html.HTMLParser(encoding='utf-8', recover=True, remove_blank_text=True,
+                                      remove_comments=True)
+        _lxml_parsers.parser = parser
+    return parser
+
+# Playwright提取文本时不需要加载的资源类型
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'media', 'font', 'stylesheet'})
+
+# 广告/追踪域名（同时匹配其子域名）
+BLOCKED_DOMAINS = frozenset({
+    'doubleclick.net',
+    'google-analytics.com',
+    'googletagmanager.com',
+    'googlesyndication.com',
+    'facebook.net',
+    'hotjar.com',
+    'scorecardresearch.com',
+})
+
 def check_dependencies():
     """检查依赖包是否已安装"""
     # 包名映射：pip包名 -> 导入名
@@ -30,13 +117,13 @@ def check_dependencies():
     
     missing_packages = []
     
+    # 只查找模块位置，不执行模块代码（避免导入pandas等重量级包）
     for pip_name, import_name in package_mapping.items():
-        try:
-            importlib.import_module(import_name)
-            logger.info(f"✅ {pip_name} 已安装")
-        except ImportError:
+        if importlib.util.find_spec(import_name) is None:
             missing_packages.append(pip_name)
             logger.warning(f"❌ {pip_name} 未安装")
+        else:
+            logger.info(f"✅ {pip_name} 已安装")
     
     if missing_packages:
         logger.error(f"缺少依赖包: {', '.join(missing_packages)}")
@@ -53,8 +140,8 @@ def is_valid_url(text):
     
     text = text.strip()
     
-    # 检查是否以http或https开头
-    if not text.startswith(('http://', 'https://')):
+    # 检查是否以http或https开头；含空白字符的一定不是URL，无需再解析
+    if not text.startswith(('http://', 'https://')) or _WS_RE.search(text):
         return False
     
     try:
@@ -68,30 +155,31 @@ def extract_url_from_text(text):
     if not text or not isinstance(text, str):
         return None
     
-    # 如果整个文本就是一个URL
-    if is_valid_url(text.strip()):
-        return text.strip()
-    
-    # 使用正则表达式查找URL
-    url_pattern = r'https?://[^\s<>"{}|\\^`\[\]]+'
-    matches = re.findall(url_pattern, text)
-    
-    if matches:
-        # 返回第一个找到的URL
-        return matches[0]
-    
-    return None
+    # 整个文本就是一个URL（不含空白）时原样返回，保留 [ ] | 等正则不匹配的字符；
+    # 否则一次扫描找到第一个URL
+    url = text.strip()
+    if not url.startswith(('http://', 'https://')) or _WS_RE.search(url):
+        match = _URL_RE.search(text)
+        if not match:
+            return None
+        url = match.group(0)
+    
+    # 简单校验：协议后必须有主机名
+    host = url.split('://', 1)[1].split('/', 1)[0]
+    return url if host else None
 
 def is_pdf_url(url):
     """检查URL是否指向PDF文件"""
     if not url:
         return False
     
-    # 检查URL是否以.pdf结尾
-    if url.lower().endswith('.pdf'):
+    # 检查URL是否以.pdf结尾（只需转换最后4个字符的大小写）
+    if url[-4:].lower() == '.pdf':
         return True
     
-    # 检查URL路径中是否包含.pdf
+    # 检查URL路径中是否包含.pdf；整个URL中都没有.pdf时无需解析
+    if not _PDF_EXT_RE.search(url):
+        return False
     try:
         parsed = urlparse(url)
         return '.pdf' in parsed.path.lower()
@@ -124,17 +212,13 @@ def extract_google_drive_file_id(url):
         # 匹配格式: https://drive.google.com/file/d/FILE_ID/view
         # 或: https://drive.google.com/file/d/FILE_ID/edit
         # 或: https://drive.google.com/open?id=FILE_ID
-        match = re.search(r'/file/d/([a-zA-Z0-9_-]+)', url)
+        match = _DRIVE_FILE_ID_RE.search(url)
         if match:
             return match.group(1)
         
         # 匹配格式: https://drive.google.com/open?id=FILE_ID
-        match = re.search(r'[?&]id=([a-zA-Z0-9_-]+)', url)
-        if match:
-            return match.group(1)
-        
-        # 匹配格式: https://drive.google.com/uc?id=FILE_ID
-        match = re.search(r'/uc[?&]id=([a-zA-Z0-9_-]+)', url)
+        # 或: https://drive.google.com/uc?id=FILE_ID
+        match = _DRIVE_ID_PARAM_RE.search(url)
         if match:
             return match.group(1)
             
@@ -178,7 +262,7 @@ def extract_google_docs_document_id(url):
     try:
         # 匹配格式: https://docs.google.com/document/d/DOCUMENT_ID/edit
         # 或: https://docs.google.com/document/d/DOCUMENT_ID/view
-        match = re.search(r'/document/d/([a-zA-Z0-9_-]+)', url)
+        match = _DOCS_ID_RE.search(url)
         if match:
             return match.group(1)
     except Exception as e:
@@ -213,66 +297,257 @@ def convert_google_docs_to_export(url, format='txt'):
 def sanitize_filename(filename):
     """清理文件名，移除不安全字符"""
     # 移除不安全字符
-    filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
+    filename = filename.translate(_FILENAME_TRANS)
     # 限制长度
     if len(filename) > 100:
-        name, ext = filename.rsplit('.', 1) if '.' in filename else (filename, '')
+        name, dot, ext = filename.rpartition('.')
+        if not dot:
+            name, ext = filename, ''
         filename = name[:95] + ('.' + ext if ext else '')
     return filename
 
-def save_llm_conversation(row_index, conversation_data):
-    """保存LLM对话记录"""
-    from config import LLM_LOG_DIR
-    import datetime as dt
+@functools.lru_cache(maxsize=None)
+def _strip_patterns(strip_tags: tuple):
+    """自定义移除标签集合对应的CSS选择器和正则（每种集合只编译一次）"""
+    block_re = re.compile(r'<(%s)\b.*?</\1\s*>' % '|'.join(strip_tags), re.IGNORECASE | re.DOTALL)
+    return ','.join(strip_tags), block_re
+
+def extract_visible_text(html: str, content_type: str = 'text/html', strip_tags=None) -> str:
+    """
+    从页面HTML中提取正文文本（移除脚本、样式和导航等标签）
     
-    # 使用英国时间(UTC)生成文件名，精确到秒
-    utc_now = dt.datetime.now(dt.timezone.utc)
-    timestamp_str = utc_now.strftime('%Y%m%d_%H%M%S')
+    非HTML响应或很短的页面直接用正则去除标签，不构建解析树；
+    其余依次尝试selectolax（Lexbor）、lxml，都不可用时使用BeautifulSoup，
+    前两者都在C层一次遍历中移除全部无关标签
     
-    log_file = LLM_LOG_DIR / f"row_{row_index:04d}_{timestamp_str}_UTC.txt"
+    Args:
+        html: 页面HTML
+        content_type: 响应的Content-Type
+        strip_tags: 需移除的标签列表，为None时使用 STRIP_TAGS
+    """
+    if strip_tags is None:
+        strip_tags, strip_selector, strip_block_re = STRIP_TAGS, STRIP_SELECTOR, _STRIP_BLOCK_RE
+    else:
+        strip_selector, strip_block_re = _strip_patterns(tuple(strip_tags))
+    
+    if 'html' not in content_type.lower() or len(html) < TRIVIAL_PAGE_LENGTH:
+        text = html_lib.unescape(_TAG_RE.sub(' ', strip_block_re.sub(' ', html)))
+    elif SELECTOLAX_AVAILABLE:
+        tree = LexborHTMLParser(html)
+        for node in tree.css(strip_selector):
+            node.decompose()
+        text = tree.body.text(separator=' ') if tree.body else ''
+    elif LXML_AVAILABLE and html.strip():
+        # 以UTF-8字节配合显式编码的解析器输入，lxml无需再检测编码
+        root = lxml.html.document_fromstring(html.encode('utf-8'), parser=_get_lxml_parser())
+        etree.strip_elements(root, *strip_tags, with_tail=False)
+        text = ' '.join(root.itertext())
+    else:
+        from bs4 import BeautifulSoup
+        
+        soup = BeautifulSoup(html, HTML_PARSER)
+        for script in soup(list(strip_tags)):
+            script.decompose()
+        text = soup.get_text(' ')
     
-    try:
-        with open(log_file, 'w', encoding='utf-8') as f:
-            f.write("=" * 80 + "\n")
-            f.write(f"LLM对话记录 - 行 {row_index}\n")
-            f.write(f"生成时间(UTC): {utc_now.strftime('%Y-%m-%d %H:%M:%S')} UTC\n")
-            f.write(f"生成时间(本地): {dt.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write("=" * 80 + "\n\n")
-            
-            for i, conv in enumerate(conversation_data, 1):
-                stage = conv.get('stage', f'对话{i}')
-                model = conv.get('model', '未知模型')
-                timestamp = conv.get('timestamp', 0)
-                prompt = conv.get('prompt', '')
-                response = conv.get('response', '')
-                original_text = conv.get('original_text', '')
-                
-                # 格式化时间戳
-                if timestamp:
-                    time_str = dt.datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')
-                else:
-                    time_str = '未知时间'
-                
-                f.write(f"阶段: {stage} | 模型: {model} | 时间: {time_str}\n")
-                f.write("-" * 80 + "\n")
-                
-                # 添加原始文本内容部分
-                if original_text:
-                    f.write("原始文本内容:\n")
-                    f.write("-" * 40 + "\n")
-                    f.write(original_text + "\n\n")
-                    f.write("-" * 40 + "\n")
-                
-                f.write("输入提示词:\n")
-                f.write(prompt + "\n\n")
-                f.write("模型响应:\n")
-                f.write(response + "\n\n")
-                f.write("=" * 80 + "\n\n")
+    # 清理文本：所有连续空白合并为单个空格
+    return _WS_RE.sub(' ', text).strip()
+
+def _is_blocked_host(host: str) -> bool:
+    """域名或其任一上级域名在拦截列表中"""
+    parts = host.split('.')
+    return any('.'.join(parts[i:]) in BLOCKED_DOMAINS for i in range(len(parts) - 1))
+
+def route_text_request(route):
+    """Playwright路由处理函数：拦截与文本提取无关的请求，其余请求正常放行"""
+    request = route.request
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or _is_blocked_host(urlparse(request.url).hostname or ''):
+        route.abort()
+    else:
+        route.continue_()
+
+class LogSink:
+    """
+    后台日志写入线程：按提交顺序在单独线程中执行文件写入，磁盘I/O不阻塞处理流程
+    
+    程序退出时（atexit）等待队列中的写入全部完成
+    """
+    
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="log-sink")
+        self._thread.start()
+        atexit.register(self.drain)
+    
+    def submit(self, func, *args):
+        """提交一个写入操作"""
+        self._queue.put((func, args))
+    
+    def _run(self):
+        while True:
+            func, args = self._queue.get()
+            try:
+                func(*args)
+            except Exception as e:
+                logger.error(f"后台写入日志失败: {e}")
+            finally:
+                self._queue.task_done()
+    
+    def drain(self):
+        """等待已提交的写入全部完成"""
+        self._queue.join()
+
+_log_sink = None
+_log_sink_lock = threading.Lock()
+
+def get_log_sink() -> LogSink:
+    """获取后台日志写入线程单例"""
+    global _log_sink
+    with _log_sink_lock:
+        if _log_sink is None:
+            _log_sink = LogSink()
+        return _log_sink
+
+# 对话记录中的分隔线
+_SEP80 = "=" * 80 + "\n"
+_DASH80 = "-" * 80 + "\n"
+_SEP40 = "-" * 40 + "\n"
+
+class LLMConversationLog:
+    """
+    LLM对话记录文件，每轮对话完成后立即追加写入，避免在内存中缓存整行的对话
+    
+    写入过程中使用 .part 临时文件，close() 时重命名为最终文件名；
+    实际的文件操作都提交给后台 LogSink 线程按顺序执行
+    """
+    
+    def __init__(self, row_index, row_text=None):
+        from config import LLM_LOG_DIR
+        import datetime as dt
+        
+        self.row_index = row_index
+        self.turn_count = 0
+        self._log_dir = LLM_LOG_DIR
+        self._file = None
+        self._sink = get_log_sink()
+        
+        # 使用英国时间(UTC)生成文件名，精确到秒；本地时间由同一时刻换算，只读取一次时钟
+        utc_now = dt.datetime.now(dt.timezone.utc)
+        self._timestamp_str = utc_now.strftime('%Y%m%d_%H%M%S')
+        self.temp_file = LLM_LOG_DIR / f"row_{self._row_label(row_index)}_{self._timestamp_str}_UTC.txt.part"
+        
+        self._sink.submit(self._open, row_text, utc_now)
+    
+    def _open(self, row_text, utc_now):
+        """（后台线程）创建临时文件并写入文件头"""
+        row_label = self.row_index if self.row_index is not None else '未知'
+        parts = [
+            _SEP80,
+            f"LLM对话记录 - 行 {row_label}\n",
+            f"生成时间(UTC): {utc_now.strftime('%Y-%m-%d %H:%M:%S')} UTC\n",
+            f"生成时间(本地): {utc_now.astimezone().strftime('%Y-%m-%d %H:%M:%S')}\n",
+            _SEP80, "\n",
+        ]
+        
+        # 原始文本内容（每行只写一次，各阶段共用）
+        if row_text:
+            parts += ["原始文本内容:\n", _SEP40, row_text, "\n\n", _SEP40, "\n"]
         
+        self._file = open(self.temp_file, 'w', encoding='utf-8')
+        self._file.write("".join(parts))
+        self._file.flush()
+    
+    @staticmethod
+    def _row_label(row_index):
+        return f"{row_index:04d}" if row_index is not None else "unknown"
+    
+    def append_turn(self, conv):
+        """追加一轮对话"""
+        self.turn_count += 1
+        self._sink.submit(self._write_turn, dict(conv), self.turn_count)
+    
+    def _write_turn(self, conv, turn_number):
+        """（后台线程）写入一轮对话"""
+        import datetime as dt
+        
+        if self._file is None:
+            return
+        stage = conv.get('stage', f'对话{turn_number}')
+        model = conv.get('model', '未知模型')
+        timestamp = conv.get('timestamp', 0)
+        prompt = conv.get('prompt', '')
+        response = conv.get('response', '')
+        
+        # 格式化时间戳
+        if timestamp:
+            time_str = dt.datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')
+        else:
+            time_str = '未知时间'
+        
+        self._file.write("".join([
+            f"阶段: {stage} | 模型: {model} | 时间: {time_str}\n",
+            _DASH80,
+            "输入提示词:\n", prompt, "\n\n",
+            "模型响应:\n", response, "\n\n",
+            _SEP80, "\n",
+        ]))
+        self._file.flush()
+    
+    def close(self, row_index=None) -> Path:
+        """关闭文件并重命名为最终文件名，返回最终路径（重命名在后台线程中完成）"""
+        if row_index is None:
+            row_index = self.row_index
+        log_file = self._log_dir / f"row_{self._row_label(row_index)}_{self._timestamp_str}_UTC.txt"
+        self._sink.submit(self._close, log_file)
+        return log_file
+    
+    def _close(self, log_file: Path):
+        """（后台线程）关闭文件并重命名"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        self.temp_file.replace(log_file)
+
+def save_llm_conversation(row_index, conversation_data):
+    """
+    一次性保存LLM对话记录
+    
+    Args:
+        row_index: 行索引
+        conversation_data: {"row_text": 原始文本, "turns": 对话列表}，也兼容直接传入对话列表
+    """
+    if isinstance(conversation_data, dict):
+        row_text = conversation_data.get('row_text')
+        turns = conversation_data.get('turns', [])
+    else:
+        row_text = None
+        turns = conversation_data
+    
+    try:
+        conversation_log = LLMConversationLog(row_index, row_text)
+        for conv in turns:
+            conversation_log.append_turn(conv)
+        log_file = conversation_log.close()
         logger.info(f"LLM对话记录已保存: {log_file}")
     except Exception as e:
         logger.error(f"保存LLM对话记录失败: {e}")
 
+_json_decoder = json.JSONDecoder()
+
+def _find_json_object(text):
+    """从文本中找到第一个可以完整解码的非空JSON对象，找不到返回None"""
+    pos = text.find('{')
+    while pos != -1:
+        try:
+            obj, _ = _json_decoder.raw_decode(text, pos)
+            if isinstance(obj, dict) and obj:
+                return obj
+        except json.JSONDecodeError:
+            pass
+        pos = text.find('{', pos + 1)
+    return None
+
 def validate_json_response(response_text):
     """验证并解析JSON响应，专门处理qwen3等带思考步骤的模型输出"""
     try:
@@ -311,20 +586,11 @@ def validate_json_response(response_text):
             except json.JSONDecodeError:
                 pass
         
-        # 方法4: 使用正则表达式查找JSON对象
-        # 匹配最完整的JSON对象
-        json_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-        matches = re.findall(json_pattern, response_text, re.DOTALL)
-        
-        for match in matches:
-            try:
-                # 尝试解析匹配到的JSON
-                parsed = json.loads(match)
-                # 验证是否包含期望的字段（简单检查）
-                if isinstance(parsed, dict) and len(parsed) > 0:
-                    return parsed
-            except json.JSONDecodeError:
-                continue
+        # 方法4: 从每个{开始尝试解码，返回第一个完整的非空JSON对象
+        # （也覆盖了"最终答案："等标记之后的JSON）
+        parsed = _find_json_object(response_text)
+        if parsed is not None:
+            return parsed
         
         # 方法5: 如果上述方法都失败，尝试直接解析整个响应
         try:
@@ -332,28 +598,6 @@ def validate_json_response(response_text):
         except json.JSONDecodeError:
             pass
         
-        # 方法6: 特殊处理思考型模型的输出格式
-        # 查找可能的最终答案部分
-        final_answer_markers = [
-            "最终答案：", "Final Answer:", "答案：", "Answer:", 
-            "结果：", "Result:", "输出：", "Output:"
-        ]
-        
-        for marker in final_answer_markers:
-            if marker in response_text:
-                start_idx = response_text.find(marker) + len(marker)
-                remaining_text = response_text[start_idx:].strip()
-                
-                # 在标记后查找JSON
-                start_pos = remaining_text.find('{')
-                end_pos = remaining_text.rfind('}')
-                if start_pos != -1 and end_pos != -1 and start_pos < end_pos:
-                    json_text = remaining_text[start_pos:end_pos + 1]
-                    try:
-                        return json.loads(json_text)
-                    except json.JSONDecodeError:
-                        continue
-        
         logger.error(f"所有JSON提取方法都失败")
         logger.error(f"响应内容: {response_text[:500]}...")  # 只显示前500字符
         return None
@@ -363,17 +607,41 @@ def validate_json_response(response_text):
         logger.error(f"响应内容: {response_text[:500]}...")
         return None
 
+# Ollama可用性检测：复用同一个HTTP连接，并在 OLLAMA_AVAILABILITY_TTL 秒内直接返回上次结果
+_ollama_session = None
+_ollama_cache = {'ts': 0.0, 'ok': False}
+_ollama_lock = threading.Lock()
+
+def _get_ollama_session():
+    """获取检测Ollama用的长连接会话（调用方持有 _ollama_lock）"""
+    global _ollama_session
+    if _ollama_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        _ollama_session = requests.Session()
+        _ollama_session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        _ollama_session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+    return _ollama_session
+
 def check_ollama_availability():
     """检查Ollama是否可用"""
-    try:
-        import requests
-        from config import OLLAMA_BASE_URL
+    from config import OLLAMA_BASE_URL, OLLAMA_AVAILABILITY_TTL
+    
+    with _ollama_lock:
+        now = time.monotonic()
+        if _ollama_cache['ts'] and now - _ollama_cache['ts'] < OLLAMA_AVAILABILITY_TTL:
+            return _ollama_cache['ok']
         
-        response = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5)
-        return response.status_code == 200
-    except Exception as e:
-        logger.warning(f"Ollama连接失败: {e}")
-        return False
+        try:
+            response = _get_ollama_session().get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5)
+            ok = response.status_code == 200
+        except Exception as e:
+            logger.warning(f"Ollama连接失败: {e}")
+            ok = False
+        
+        _ollama_cache.update(ts=now, ok=ok)
+        return ok
 
 def clean_email_format(email):
     """
@@ -397,31 +665,13 @@ def clean_email_format(email):
     cleaned = email.strip().lower()
     
     # 替换 [at], (at), " at " 等为 @
-    at_patterns = [
-        r'\[at\]',
-        r'\(at\)',
-        r'\s+at\s+',
-        r'\s+AT\s+',
-        r'\[AT\]',
-        r'\(AT\)',
-    ]
-    for pattern in at_patterns:
-        cleaned = re.sub(pattern, '@', cleaned, flags=re.IGNORECASE)
+    cleaned = _EMAIL_AT_RE.sub('@', cleaned)
     
     # 替换 [dot], (dot), " dot " 等为 .
-    dot_patterns = [
-        r'\[dot\]',
-        r'\(dot\)',
-        r'\s+dot\s+',
-        r'\s+DOT\s+',
-        r'\[DOT\]',
-        r'\(DOT\)',
-    ]
-    for pattern in dot_patterns:
-        cleaned = re.sub(pattern, '.', cleaned, flags=re.IGNORECASE)
+    cleaned = _EMAIL_DOT_RE.sub('.', cleaned)
     
     # 移除多余的空格
-    cleaned = re.sub(r'\s+', '', cleaned)
+    cleaned = _WS_RE.sub('', cleaned)
     
     # 验证是否看起来像邮箱（基本格式检查）
     if '@' in cleaned and '.' in cleaned.split('@')[-1]:
@@ -436,7 +686,4 @@ def normalize_text(text):
         return ""
     
     # 移除多余的空白字符
-    text = re.sub(r'\s+', ' ', text)
-    text = text.strip()
-    
-    return text 
\ No newline at end of file
+    return _WS_RE.sub(' ', text).strip() 
\ No newline at end of file